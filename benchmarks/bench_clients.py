@@ -0,0 +1,169 @@
+"""
+多客户端内存基准：对比"每个客户端一个 stdio 进程"与"所有客户端共享一个 streamable-http 进程"的内存占用。
+
+每个客户端完成 initialize、tools/list，并调用一次 tripo3d_get_task_status（上游为本地模拟服务器），
+使连接池、任务缓存等按实际使用路径初始化后再采样。
+内存按 PSS（/proc/<pid>/smaps_rollup，共享页按进程数均摊）与 RSS 统计，仅支持 Linux。
+共享模式另外给出每增加一个客户端的边际内存：(N 个客户端时的 PSS - 单客户端时的 PSS) / (N - 1)。
+
+用法：
+    python benchmarks/bench_clients.py --clients 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_startup import SRC_DIR, _read_response, _send
+from load_test import MOCK_SERVER, free_port, wait_ready
+
+
+def memory_kb(pid: int):
+    """返回进程的 (PSS, RSS)，单位 KB。"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Pss", "Rss"):
+                values[key] = int(rest.split()[0])
+    return values.get("Pss", 0), values.get("Rss", 0)
+
+
+def start_stdio_client(src_dir: str, env: dict) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, os.path.join(src_dir, "main.py")], cwd=src_dir, env=env,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    _send(proc, {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+        "protocolVersion": "2025-03-26", "capabilities": {},
+        "clientInfo": {"name": "bench-clients", "version": "0"},
+    }})
+    _read_response(proc, 1)
+    _send(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+    _send(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+    _read_response(proc, 2)
+    _send(proc, {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {
+        "name": "tripo3d_get_task_status", "arguments": {"request": {"task_id": "bench-task"}},
+    }})
+    _read_response(proc, 3)
+    return proc
+
+
+def stop_process(proc: subprocess.Popen) -> None:
+    if proc.stdin:
+        proc.stdin.close()
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def measure_stdio(args, env):
+    procs = []
+    try:
+        for _ in range(args.clients):
+            procs.append(start_stdio_client(args.src, env))
+        time.sleep(args.settle)
+        samples = [memory_kb(proc.pid) for proc in procs]
+    finally:
+        for proc in procs:
+            stop_process(proc)
+    return {"processes": len(procs), "pss_kb": sum(s[0] for s in samples), "rss_kb": sum(s[1] for s in samples)}
+
+
+async def http_client(url: str, index: int, ready: asyncio.Event, release: asyncio.Event) -> None:
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            await session.list_tools()
+            await session.call_tool("tripo3d_get_task_status", {"request": {"task_id": f"bench-task-{index}"}})
+            ready.set()
+            # 保持会话打开，直到采样完成
+            await release.wait()
+
+
+async def measure_shared(args, env):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/mcp"
+    proc = subprocess.Popen([sys.executable, os.path.join(args.src, "main.py"), "--transport", "streamable-http",
+                             "--port", str(port)], cwd=args.src, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    release = asyncio.Event()
+    clients = []
+    try:
+        async with httpx.AsyncClient() as probe:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    await probe.get(url)
+                    break
+                except httpx.TransportError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError("HTTP server did not start")
+                    await asyncio.sleep(0.1)
+        samples = {}
+        for count in range(1, args.clients + 1):
+            ready = asyncio.Event()
+            clients.append(asyncio.ensure_future(http_client(url, count, ready, release)))
+            await asyncio.wait({clients[-1], asyncio.ensure_future(ready.wait())}, return_when=asyncio.FIRST_COMPLETED)
+            if clients[-1].done():
+                clients[-1].result()
+            if count in (1, args.clients):
+                await asyncio.sleep(args.settle)
+                samples[count] = memory_kb(proc.pid)
+    finally:
+        release.set()
+        await asyncio.gather(*clients, return_exceptions=True)
+        stop_process(proc)
+    one, total = samples[1], samples[args.clients]
+    marginal = (total[0] - one[0]) / (args.clients - 1) if args.clients > 1 else 0.0
+    return {"processes": 1, "pss_kb": total[0], "rss_kb": total[1], "single_client_pss_kb": one[0],
+            "marginal_pss_kb": marginal}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多客户端内存占用对比：每客户端一个 stdio 进程 vs 共享 HTTP 进程")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--src", default=SRC_DIR, help="被测的 src 目录")
+    parser.add_argument("--settle", type=float, default=1.0, help="采样前等待的秒数")
+    parser.add_argument("--json", dest="json_path", default=None, help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    mock_port = free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock = subprocess.Popen([sys.executable, MOCK_SERVER, "--port", str(mock_port), "--latency-ms", "5"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    cache_dir = tempfile.mkdtemp(prefix="tripo-clients-")
+    env = {**os.environ, "TRIPO_API_KEY": os.environ.get("TRIPO_API_KEY", "bench"),
+           "TRIPO_API_BASE_URL": mock_url, "TRIPO_CACHE_DIR": cache_dir}
+    try:
+        asyncio.run(wait_ready(mock_url))
+        results = {"clients": args.clients, "stdio": measure_stdio(args, env),
+                   "streamable-http": asyncio.run(measure_shared(args, env))}
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    print(f"{'mode':<16} {'procs':>5} {'total PSS MiB':>14} {'total RSS MiB':>14} {'PSS/client MiB':>15}")
+    for mode in ("stdio", "streamable-http"):
+        r = results[mode]
+        print(f"{mode:<16} {r['processes']:>5} {r['pss_kb'] / 1024:>14.1f} {r['rss_kb'] / 1024:>14.1f} "
+              f"{r['pss_kb'] / 1024 / args.clients:>15.2f}")
+    shared = results["streamable-http"]
+    print(f"shared mode: single client {shared['single_client_pss_kb'] / 1024:.1f} MiB, "
+          f"+{shared['marginal_pss_kb']:.0f} KB per additional client")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+共享连接池基准测试：对比"每次请求新建 AsyncClient"与"模块级共享 AsyncClient"。
+
+在本地启动一个最小 HTTP/1.1 桩服务器（模拟 GET /task/{id}），统计服务端接受的
+TCP 连接数（即线上每次都要付出的 TCP+TLS 握手次数），并输出 p50/p99 调用延迟。
+桩服务器在每个新连接的首个响应前额外等待 --handshake-ms 毫秒，用来模拟 TLS 握手开销。
+
+用法：
+    python benchmarks/bench_http_client.py --requests 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+class StubServer:
+    def __init__(self, handshake_ms: float):
+        self.handshake_s = handshake_ms / 1000.0
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+        self.port = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        first = True
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                # 读完请求头；桩服务器只处理无请求体的 GET
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                if first:
+                    await asyncio.sleep(self.handshake_s)
+                    first = False
+                self.requests += 1
+                path = request_line.split()[1].decode()
+                task_id = path.rsplit("/", 1)[-1]
+                body = json.dumps({"code": 0, "data": {"task_id": task_id, "status": "running", "progress": 50}}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(mode, base_url, total, concurrency):
+    import httpx
+    import tripo_api
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            if mode == "per-request":
+                async with httpx.AsyncClient() as client:
+                    resp = await client.get(f"{base_url}/task/t{i}", headers=tripo_api.HEADERS)
+            else:
+                resp = await tripo_api.get_client().get(f"{base_url}/task/t{i}", headers=tripo_api.HEADERS)
+            resp.json()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    await tripo_api.close_client()
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Tripo API 共享连接池基准测试")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("TRIPO_API_KEY", "bench")
+    sys.path.insert(0, SRC_DIR)
+
+    print(f"{'mode':<12} {'requests':>8} {'handshakes':>10} {'hs/req':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in ("per-request", "shared"):
+        server = StubServer(args.handshake_ms)
+        await server.start()
+        base_url = f"http://127.0.0.1:{server.port}"
+        latencies = await run_mode(mode, base_url, args.requests, args.concurrency)
+        await server.stop()
+        print(
+            f"{mode:<12} {server.requests:>8} {server.connections:>10} "
+            f"{server.connections / max(server.requests, 1):>7.3f} "
+            f"{statistics.median(latencies):>8.2f} {percentile(latencies, 99):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+冷启动基准：测量从启动 stdio MCP 服务进程到收到首个 tools/list 响应的耗时。
+
+Cursor 等客户端每个会话都会新起一个 stdio 服务进程，这段时间用户直接可感知。
+每轮启动一个新进程，依次发送 initialize、notifications/initialized、tools/list，
+分别统计"空 schema 缓存"（每轮前删除缓存文件）与"已有 schema 缓存"两种情况。
+--src 可指向旧版本的 src 目录（例如 git worktree），用来对比改动前后的启动耗时。
+
+用法：
+    python benchmarks/bench_startup.py --runs 10
+    git worktree add /tmp/tripo-old HEAD~1 && python benchmarks/bench_startup.py --src /tmp/tripo-old/src
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+
+def _send(proc, message):
+    proc.stdin.write((json.dumps(message) + "\n").encode())
+    proc.stdin.flush()
+
+
+def _read_response(proc, request_id):
+    # 跳过非 JSON-RPC 输出（如启动提示）与通知，直到读到对应 id 的响应
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError("Server exited before responding")
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(message, dict) and message.get("id") == request_id:
+            return message
+
+
+def time_to_tools_list(src_dir, env):
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(src_dir, "main.py")], cwd=src_dir, env=env,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        _send(proc, {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2025-03-26", "capabilities": {},
+            "clientInfo": {"name": "bench-startup", "version": "0"},
+        }})
+        _read_response(proc, 1)
+        _send(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        tools = _read_response(proc, 2)["result"]["tools"]
+        return time.perf_counter() - started, len(tools)
+    finally:
+        proc.stdin.close()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="stdio MCP 服务冷启动基准")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--src", default=SRC_DIR, help="被测的 src 目录")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="tripo-startup-")
+    env = {**os.environ, "TRIPO_API_KEY": os.environ.get("TRIPO_API_KEY", "bench"), "TRIPO_CACHE_DIR": cache_dir}
+    schema_path = os.path.join(cache_dir, "tool_schemas.json")
+
+    print(f"{'mode':<14} {'runs':>5} {'tools':>6} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for mode in ("cold-schema", "warm-schema"):
+        samples = []
+        tools = 0
+        if mode == "warm-schema":
+            time_to_tools_list(args.src, env)
+        for _ in range(args.runs):
+            if mode == "cold-schema" and os.path.exists(schema_path):
+                os.remove(schema_path)
+            elapsed, tools = time_to_tools_list(args.src, env)
+            samples.append(elapsed * 1000)
+        print(f"{mode:<14} {args.runs:>5} {tools:>6} {statistics.median(samples):>10.1f} "
+              f"{min(samples):>8.1f} {max(samples):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
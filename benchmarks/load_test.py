@@ -0,0 +1,424 @@
+"""
+MCP 工具压测：以指定并发直接调用 src/main.py 中注册的工具，上游指向本地模拟服务器，不消耗真实额度。
+
+默认在子进程中启动 benchmarks/mock_tripo_server.py（也可用 --base-url 指向已运行的模拟器），
+统计吞吐（req/s）、延迟分位数、返回码分布、峰值 RSS 与 Python 堆、打开的 socket 数，
+以及模拟器侧实际收到的上游请求数（用来观察缓存、合并与去重的效果）。
+
+场景：
+    status    查询固定任务池的状态（tripo3d_get_task_status）
+    submit    提交文生模型任务（tripo3d_text_to_model），种子不固定，不会命中幂等去重
+    upload    上传内容各不相同的图片（tripo3d_upload_image）
+    balance   查询余额（tripo3d_get_balance）
+    wait      提交后等待任务完成（tripo3d_text_to_model + tripo3d_wait_for_task）
+    download  下载已完成任务的产物（tripo3d_download_result）
+    mixed     status/submit/balance/upload 按 6:2:1:1 混合
+
+--callbacks 启用服务内嵌的任务回调接收端，并让模拟器在任务完成时推送回调，对比 wait 场景下的上游轮询次数；
+--callback-drop-rate 丢弃部分回调，验证超过 --callback-grace 后的稀疏轮询兜底。
+
+客户端令牌桶默认放宽到 1000 req/s，测的是服务本身而非限流配置；需要按线上限流压测时加 --keep-rate-limits。
+--json 保存结果，--baseline 与之前保存的结果比较，吞吐下降或 p99 上升超过 --tolerance 时以非零状态码退出，
+可作为每次性能改动的回归门禁。
+
+用法：
+    python benchmarks/load_test.py --scenario status --requests 2000 --concurrency 50
+    python benchmarks/load_test.py --scenario mixed --json results/mixed.json
+    python benchmarks/load_test.py --scenario mixed --baseline results/mixed.json --tolerance 0.1
+    python benchmarks/load_test.py --scenario wait --requests 200 --callbacks --callback-drop-rate 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+MOCK_SERVER = os.path.join(BENCH_DIR, "mock_tripo_server.py")
+
+MIXED_WEIGHTS = (("status", 6), ("submit", 2), ("balance", 1), ("upload", 1))
+RATE_LIMIT_ENV = ("TRIPO_RATE_CREATE", "TRIPO_RATE_POLL", "TRIPO_RATE_UPLOAD", "TRIPO_RATE_ACCOUNT")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def open_sockets():
+    # 仅 Linux 可用；其它平台返回 None
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss() -> int:
+    # Linux 上 ru_maxrss 以 KB 计，macOS 上以字节计
+    value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return value if sys.platform == "darwin" else value * 1024
+
+
+def start_mock(args, port: int, callback_url=None) -> subprocess.Popen:
+    command = [
+        sys.executable, MOCK_SERVER, "--port", str(port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--task-seconds", str(args.task_seconds), "--queue-seconds", str(args.queue_seconds),
+        "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate),
+        "--fail-rate", str(args.fail_rate), "--max-running", str(args.max_running),
+        "--artifact-kb", str(args.artifact_kb), "--seed", str(args.seed),
+    ]
+    if callback_url:
+        command += ["--callback-url", callback_url, "--callback-drop-rate", str(args.callback_drop_rate)]
+    return subprocess.Popen(command)
+
+
+async def wait_ready(base_url: str, timeout: float = 15.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                resp = await client.get(f"{base_url}/__stats")
+                if resp.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Mock server at {base_url} did not become ready")
+            await asyncio.sleep(0.1)
+
+
+async def mock_stats(base_url: str):
+    import httpx
+
+    try:
+        async with httpx.AsyncClient() as client:
+            return (await client.get(f"{base_url}/__stats")).json()
+    except httpx.HTTPError:
+        return None
+
+
+def result_code(result):
+    """从 call_tool 的返回值中取出工具返回字典的 code。"""
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, dict):
+        return result.get("code", 0)
+    for block in result or []:
+        text = getattr(block, "text", None)
+        if text is None:
+            continue
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            return "invalid_json"
+        return payload.get("code", 0) if isinstance(payload, dict) else 0
+    return "empty"
+
+
+def extract_task_id(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, dict):
+        return (result.get("data") or {}).get("task_id")
+    for block in result or []:
+        text = getattr(block, "text", None)
+        if text:
+            try:
+                data = json.loads(text).get("data")
+            except (ValueError, AttributeError):
+                return None
+            return data.get("task_id") if isinstance(data, dict) else None
+    return None
+
+
+def make_upload_files(directory: str, count: int, size_kb: int):
+    # PNG 文件头 + 随机内容，每个文件内容不同，不会命中上传去重
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"bench_{i}.png")
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n" + os.urandom(max(size_kb * 1024 - 8, 0)))
+        paths.append(path)
+    return paths
+
+
+class Scenario:
+    def __init__(self, args, upload_files):
+        self.args = args
+        self.upload_files = upload_files
+        self.rng = random.Random(args.seed)
+        self.mixed = [name for name, weight in MIXED_WEIGHTS for _ in range(weight)]
+
+    def calls(self, name: str, i: int):
+        """返回第 i 次迭代依次执行的 (工具名, 参数) 列表。"""
+        args = self.args
+        if name == "mixed":
+            name = self.rng.choice(self.mixed)
+        if name == "status":
+            return [("tripo3d_get_task_status", {"request": {"task_id": f"bench-{i % args.task_pool}"}})]
+        if name == "submit":
+            return [("tripo3d_text_to_model", {"request": {"prompt": f"benchmark object {i}"}})]
+        if name == "upload":
+            path = self.upload_files[i % len(self.upload_files)]
+            return [("tripo3d_upload_image", {"request": {"file_path": path}})]
+        if name == "balance":
+            return [("tripo3d_get_balance", {})]
+        if name == "download":
+            return [("tripo3d_download_result", {"request": {"task_id": f"bench-{i % args.task_pool}"}})]
+        if name == "wait":
+            return [("tripo3d_text_to_model", {"request": {"prompt": f"benchmark object {i}"}}), "wait"]
+        raise ValueError(f"Unknown scenario: {name}")
+
+
+async def run_load(mcp, scenario: Scenario, args):
+    latencies = []
+    codes = Counter()
+    samples = {"sockets": 0, "rss": 0}
+    stop = asyncio.Event()
+
+    async def sampler():
+        while not stop.is_set():
+            sockets, rss = open_sockets(), current_rss()
+            if sockets is not None:
+                samples["sockets"] = max(samples["sockets"], sockets)
+            if rss is not None:
+                samples["rss"] = max(samples["rss"], rss)
+            try:
+                await asyncio.wait_for(stop.wait(), 0.05)
+            except asyncio.TimeoutError:
+                pass
+
+    async def iteration(i: int):
+        start = time.perf_counter()
+        code = 0
+        task_id = None
+        for call in scenario.calls(args.scenario, i):
+            if call == "wait":
+                # wait 场景：等待上一步提交的任务
+                if task_id is None:
+                    break
+                call = ("tripo3d_wait_for_task", {"request": {"task_id": task_id, "timeout": args.wait_timeout}})
+            tool, arguments = call
+            result = await mcp.call_tool(tool, arguments)
+            code = result_code(result)
+            if code != 0:
+                break
+            task_id = extract_task_id(result)
+        latencies.append((time.perf_counter() - start) * 1000)
+        codes[str(code)] += 1
+
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    async def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await iteration(i)
+            except Exception as e:
+                codes[type(e).__name__] += 1
+
+    sampler_task = asyncio.ensure_future(sampler())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler_task
+    return latencies, codes, elapsed, samples
+
+
+def compare(result, baseline, tolerance):
+    """与基线比较，返回回归描述列表；为空表示通过。"""
+    regressions = []
+    if result["rps"] < baseline["rps"] * (1 - tolerance):
+        regressions.append(f"throughput {result['rps']:.1f} req/s < baseline {baseline['rps']:.1f} req/s")
+    if result["latency_ms"]["p99"] > baseline["latency_ms"]["p99"] * (1 + tolerance):
+        regressions.append(
+            f"p99 {result['latency_ms']['p99']:.1f} ms > baseline {baseline['latency_ms']['p99']:.1f} ms"
+        )
+    return regressions
+
+
+def report(result):
+    latency = result["latency_ms"]
+    print(f"scenario      {result['scenario']}  (requests={result['requests']}, concurrency={result['concurrency']})")
+    print(f"throughput    {result['rps']:.1f} req/s over {result['elapsed_s']:.2f} s")
+    print(f"latency ms    p50={latency['p50']:.1f}  p90={latency['p90']:.1f}  p99={latency['p99']:.1f}  max={latency['max']:.1f}")
+    print(f"codes         {result['codes']}")
+    memory = result["memory"]
+    print(f"memory        peak_rss={memory['peak_rss'] / 2**20:.1f} MiB  sampled_rss={memory['sampled_rss'] / 2**20:.1f} MiB"
+          + (f"  py_heap_peak={memory['py_heap_peak'] / 2**20:.1f} MiB" if memory.get("py_heap_peak") else ""))
+    print(f"sockets       peak_open={result['peak_sockets']}")
+    if result.get("upstream"):
+        print(f"upstream      {result['upstream']}")
+    received = result["client"].get("callbacks", {})
+    if received.get("enabled"):
+        print(f"callbacks     received={received['received']}  rejected={received['rejected']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Tripo MCP 工具压测")
+    parser.add_argument("--scenario", default="status",
+                        choices=("status", "submit", "upload", "balance", "wait", "download", "mixed"))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=20, help="正式计时前的预热请求数")
+    parser.add_argument("--task-pool", type=int, default=100, help="status/download 场景轮转的任务ID数")
+    parser.add_argument("--upload-files", type=int, default=50)
+    parser.add_argument("--upload-kb", type=int, default=256)
+    parser.add_argument("--wait-timeout", type=float, default=120)
+    parser.add_argument("--base-url", default=None, help="使用已运行的模拟服务器，不再自动启动")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="保留 TRIPO_RATE_* 的默认客户端限流")
+    parser.add_argument("--tracemalloc", action="store_true", help="统计 Python 堆峰值（有额外开销）")
+    parser.add_argument("--json", dest="json_path", default=None, help="将结果写入 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="与之前 --json 保存的结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="允许的相对退化幅度")
+    # 以下参数传给自动启动的模拟服务器
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--task-seconds", type=float, default=5.0)
+    parser.add_argument("--queue-seconds", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--max-running", type=int, default=0)
+    parser.add_argument("--artifact-kb", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--callbacks", action="store_true", help="启用任务回调接收端，由模拟器推送任务完成回调")
+    parser.add_argument("--callback-drop-rate", type=float, default=0.0)
+    parser.add_argument("--callback-grace", type=float, default=10.0, help="未收到回调时退回轮询前的等待秒数")
+    args = parser.parse_args()
+    if args.scenario == "download":
+        # 下载场景需要任务一经查询即为成功
+        args.task_seconds = args.queue_seconds = 0
+
+    mock = None
+    base_url = args.base_url
+    callback_url = None
+    if args.callbacks:
+        callback_port = free_port()
+        callback_url = f"http://127.0.0.1:{callback_port}/tripo/callback"
+        os.environ["TRIPO_CALLBACK_HOST"] = "127.0.0.1"
+        os.environ["TRIPO_CALLBACK_PORT"] = str(callback_port)
+        os.environ["TRIPO_CALLBACK_GRACE"] = str(args.callback_grace)
+    if base_url is None:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        mock = start_mock(args, port, callback_url)
+    workdir = tempfile.mkdtemp(prefix="tripo-bench-")
+    try:
+        await wait_ready(base_url)
+        # 必须在导入 main/tripo_api 之前设置，模块导入时读取这些配置
+        os.environ["TRIPO_API_BASE_URL"] = base_url
+        os.environ.setdefault("TRIPO_API_KEY", "bench")
+        os.environ["TRIPO_CACHE_DIR"] = os.path.join(workdir, "cache")
+        os.environ["TRIPO_DOWNLOAD_DIR"] = os.path.join(workdir, "downloads")
+        if not args.keep_rate_limits:
+            for name in RATE_LIMIT_ENV:
+                os.environ.setdefault(name, "1000")
+                os.environ.setdefault(f"{name}_BURST", "1000")
+        sys.path.insert(0, SRC_DIR)
+        import main as server
+        import tripo_api
+
+        upload_files = make_upload_files(workdir, args.upload_files, args.upload_kb) \
+            if args.scenario in ("upload", "mixed") else []
+        scenario = Scenario(args, upload_files)
+        async with server.lifespan(server.mcp):
+            if args.callbacks:
+                # 接收端在后台启动，开始计时前确认已在监听
+                while not server.callbacks.receiver.running:
+                    await asyncio.sleep(0.05)
+            if args.warmup:
+                warmup = argparse.Namespace(**{**vars(args), "requests": args.warmup})
+                await run_load(server.mcp, Scenario(warmup, upload_files), warmup)
+            if args.tracemalloc:
+                tracemalloc.start()
+            latencies, codes, elapsed, samples = await run_load(server.mcp, scenario, args)
+            heap_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+            if args.tracemalloc:
+                tracemalloc.stop()
+            result = {
+                "scenario": args.scenario,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "elapsed_s": elapsed,
+                "rps": len(latencies) / elapsed if elapsed else 0.0,
+                "latency_ms": {
+                    "p50": percentile(latencies, 50) if latencies else 0.0,
+                    "p90": percentile(latencies, 90) if latencies else 0.0,
+                    "p99": percentile(latencies, 99) if latencies else 0.0,
+                    "max": max(latencies) if latencies else 0.0,
+                    "mean": statistics.fmean(latencies) if latencies else 0.0,
+                },
+                "codes": dict(codes),
+                "memory": {"peak_rss": peak_rss(), "sampled_rss": samples["rss"], "py_heap_peak": heap_peak},
+                "peak_sockets": samples["sockets"],
+                "upstream": await mock_stats(base_url),
+                "client": {
+                    "cache": tripo_api.get_cache_stats()["data"],
+                    "rate_limit": tripo_api.get_rate_limit_stats()["data"],
+                    "callbacks": server.callbacks.receiver.stats(),
+                },
+            }
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait()
+
+    report(result)
+    if args.json_path:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json_path)), exist_ok=True)
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION    {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,306 @@
+"""
+本地 Tripo API 模拟服务器：在不消耗真实额度的前提下为基准测试与压测提供上游。
+
+实现 tripo_api.py 用到的全部接口，响应结构与线上一致：
+    POST /task            创建任务，返回 task_id
+    GET  /task/{task_id}  查询任务，按进度曲线推进 queued -> running -> success/failed
+    POST /upload          接收 multipart 图片，返回 image_token
+    GET  /user/balance    查询余额
+    GET  /files/{task_id}/{name}  任务产物，支持 Range（供 tripo3d_download_result 使用）
+    GET  /__stats         模拟器自身统计（各接口调用次数、注入的错误数），不属于 Tripo API
+
+可配置每个请求的延迟与抖动、任务耗时与进度曲线、随机 5xx 与 429 注入、同时运行任务数上限。
+未见过的任务ID在首次查询时视为刚创建，压测可直接轮询任意ID。
+指定 --callback-url 时，经 POST /task 创建的任务进入终态后向该地址推送回调（请求体为 {"event": ..., "data": 任务对象}），
+--callback-drop-rate 按比例丢弃回调，用于验证接收端的稀疏轮询兜底。
+
+用法：
+    python benchmarks/mock_tripo_server.py --port 8765 --latency-ms 80 --task-seconds 20 --throttle-rate 0.02
+    TRIPO_API_BASE_URL=http://127.0.0.1:8765 python src/main.py
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import random
+import time
+import uuid
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+class MockConfig:
+    def __init__(self, latency_ms=50.0, jitter_ms=20.0, task_seconds=10.0, queue_seconds=1.0,
+                 curve="linear", error_rate=0.0, throttle_rate=0.0, retry_after=1.0,
+                 fail_rate=0.0, max_running=0, artifact_kb=512, balance=10000.0, seed=None,
+                 callback_url=None, callback_drop_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.task_seconds = task_seconds
+        self.queue_seconds = queue_seconds
+        self.curve = curve
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.fail_rate = fail_rate
+        self.max_running = max_running
+        self.artifact_kb = artifact_kb
+        self.balance = balance
+        self.callback_url = callback_url
+        self.callback_drop_rate = callback_drop_rate
+        self.random = random.Random(seed)
+
+
+def progress_at(fraction: float, curve: str) -> float:
+    """运行阶段的进度曲线：linear 匀速，ease-out 前快后慢（与线上观测接近），step 每 25% 跳变一次。"""
+    fraction = min(max(fraction, 0.0), 1.0)
+    if curve == "ease-out":
+        return 1 - (1 - fraction) ** 2
+    if curve == "step":
+        return int(fraction * 4) / 4
+    return fraction
+
+
+class MockTripo:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.tasks = {}
+        self.calls = Counter()
+        self.injected = Counter()
+        self.uploaded_bytes = 0
+        self._artifacts = {}
+        self._callbacks = set()
+        self._callback_client = None
+
+    async def _delay(self) -> None:
+        config = self.config
+        delay = config.latency_ms + config.random.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+    def _inject(self):
+        # 先判定 429 再判定 5xx，两者互斥
+        roll = self.config.random.random()
+        if roll < self.config.throttle_rate:
+            self.injected["429"] += 1
+            # 普通限速使用网关式的错误码，与并发任务数超限（2000）区分
+            return JSONResponse({"code": 429, "message": "Rate limit exceeded"}, status_code=429,
+                                headers={"Retry-After": str(self.config.retry_after)})
+        if roll < self.config.throttle_rate + self.config.error_rate:
+            self.injected["5xx"] += 1
+            return JSONResponse({"code": 1001, "message": "Injected server error"},
+                                status_code=self.config.random.choice([500, 502, 503]))
+        return None
+
+    def _new_task(self, task_id: str, task_type: str, created: float) -> dict:
+        task = {
+            "task_id": task_id,
+            "type": task_type,
+            "created": created,
+            "fails": self.config.random.random() < self.config.fail_rate,
+        }
+        self.tasks[task_id] = task
+        return task
+
+    def _running_count(self, now: float) -> int:
+        total = self.config.queue_seconds + self.config.task_seconds
+        return sum(1 for task in self.tasks.values() if now - task["created"] < total)
+
+    def _snapshot(self, task: dict, base_url: str) -> dict:
+        config = self.config
+        elapsed = time.time() - task["created"]
+        data = {"task_id": task["task_id"], "type": task["type"], "create_time": int(task["created"]), "input": {}}
+        if elapsed < config.queue_seconds:
+            data.update(status="queued", progress=0)
+            return data
+        running = elapsed - config.queue_seconds
+        if running < config.task_seconds:
+            progress = progress_at(running / config.task_seconds if config.task_seconds else 1.0, config.curve)
+            data.update(status="running", progress=min(99, int(progress * 100)),
+                        running_left_time=round(config.task_seconds - running, 1))
+            return data
+        if task["fails"]:
+            data.update(status="failed", progress=100)
+            return data
+        files = f"{base_url}/files/{task['task_id']}"
+        data.update(status="success", progress=100, output={
+            "model": f"{files}/model.glb",
+            "base_model": f"{files}/base_model.glb",
+            "rendered_image": f"{files}/rendered_image.webp",
+        })
+        return data
+
+    def schedule_callback(self, task: dict, base_url: str) -> None:
+        if not self.config.callback_url:
+            return
+        callback = asyncio.ensure_future(self._send_callback(task, base_url))
+        self._callbacks.add(callback)
+        callback.add_done_callback(self._callbacks.discard)
+
+    async def _send_callback(self, task: dict, base_url: str) -> None:
+        # 任务进入终态时推送一次回调；按比例丢弃以模拟回调丢失
+        await asyncio.sleep(self.config.queue_seconds + self.config.task_seconds)
+        if self.config.random.random() < self.config.callback_drop_rate:
+            self.injected["callback_dropped"] += 1
+            return
+        if self._callback_client is None:
+            self._callback_client = httpx.AsyncClient(timeout=10)
+        data = self._snapshot(task, base_url)
+        self.calls["callback"] += 1
+        try:
+            resp = await self._callback_client.post(self.config.callback_url, json={"event": f"task.{data['status']}", "data": data})
+            if resp.status_code >= 400:
+                self.injected["callback_rejected"] += 1
+        except httpx.HTTPError:
+            self.injected["callback_failed"] += 1
+
+    async def close(self) -> None:
+        for callback in list(self._callbacks):
+            callback.cancel()
+        if self._callback_client is not None:
+            await self._callback_client.aclose()
+
+    def artifact(self, task_id: str, name: str) -> bytes:
+        # 按 (task_id, name) 生成确定性内容，重复下载得到相同字节
+        key = f"{task_id}/{name}"
+        if key not in self._artifacts:
+            block = hashlib.sha256(key.encode()).digest()
+            size = self.config.artifact_kb * 1024
+            self._artifacts[key] = (block * (size // len(block) + 1))[:size]
+        return self._artifacts[key]
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    mock = MockTripo(config)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await mock.close()
+
+    app = FastAPI(title="Mock Tripo API", lifespan=lifespan)
+    app.state.mock = mock
+
+    def base_url(request: Request) -> str:
+        return str(request.base_url).rstrip("/")
+
+    @app.post("/task")
+    async def create_task(request: Request):
+        mock.calls["create"] += 1
+        await mock._delay()
+        injected = mock._inject()
+        if injected is not None:
+            return injected
+        payload = await request.json()
+        if not isinstance(payload, dict) or not payload.get("type"):
+            return JSONResponse({"code": 2002, "message": "Invalid task type"}, status_code=400)
+        now = time.time()
+        if config.max_running and mock._running_count(now) >= config.max_running:
+            mock.injected["running_cap"] += 1
+            return JSONResponse({"code": 2000, "message": "Too many running tasks"}, status_code=429,
+                                headers={"Retry-After": str(config.retry_after)})
+        task = mock._new_task(str(uuid.uuid4()), payload["type"], now)
+        mock.schedule_callback(task, base_url(request))
+        return {"code": 0, "data": {"task_id": task["task_id"]}}
+
+    @app.get("/task/{task_id}")
+    async def get_task(task_id: str, request: Request):
+        mock.calls["poll"] += 1
+        await mock._delay()
+        injected = mock._inject()
+        if injected is not None:
+            return injected
+        task = mock.tasks.get(task_id) or mock._new_task(task_id, "text_to_model", time.time())
+        return {"code": 0, "data": mock._snapshot(task, base_url(request))}
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        mock.calls["upload"] += 1
+        await mock._delay()
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+        mock.uploaded_bytes += received
+        injected = mock._inject()
+        if injected is not None:
+            return injected
+        return {"code": 0, "data": {"image_token": str(uuid.uuid4())}}
+
+    @app.get("/user/balance")
+    async def balance():
+        mock.calls["balance"] += 1
+        await mock._delay()
+        injected = mock._inject()
+        if injected is not None:
+            return injected
+        return {"code": 0, "data": {"balance": config.balance, "frozen": 0}}
+
+    @app.get("/files/{task_id}/{name}")
+    async def files(task_id: str, name: str, request: Request):
+        mock.calls["download"] += 1
+        body = mock.artifact(task_id, name)
+        total = len(body)
+        range_header = request.headers.get("range", "")
+        if range_header.startswith("bytes="):
+            start_text, _, end_text = range_header[6:].partition("-")
+            start = int(start_text or 0)
+            end = min(int(end_text) if end_text else total - 1, total - 1)
+            return Response(body[start:end + 1], status_code=206, media_type="application/octet-stream",
+                            headers={"Content-Range": f"bytes {start}-{end}/{total}", "Accept-Ranges": "bytes"})
+        return Response(body, media_type="application/octet-stream", headers={"Accept-Ranges": "bytes"})
+
+    @app.get("/__stats")
+    async def stats():
+        return {
+            "calls": dict(mock.calls),
+            "injected": dict(mock.injected),
+            "tasks": len(mock.tasks),
+            "uploaded_bytes": mock.uploaded_bytes,
+        }
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="每个请求的平均服务端延迟")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="延迟的均匀抖动幅度")
+    parser.add_argument("--task-seconds", type=float, default=10.0, help="任务 running 阶段耗时")
+    parser.add_argument("--queue-seconds", type=float, default=1.0, help="任务 queued 阶段耗时")
+    parser.add_argument("--curve", choices=("linear", "ease-out", "step"), default="linear", help="进度曲线")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 5xx 的比例")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="随机返回 429 的比例")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After 秒数")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="任务最终失败的比例")
+    parser.add_argument("--max-running", type=int, default=0, help="同时运行任务数上限，超出时创建返回 429；0 为不限")
+    parser.add_argument("--artifact-kb", type=int, default=512, help="每个产物文件的大小")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现错误注入")
+    parser.add_argument("--callback-url", default=None, help="任务进入终态时推送回调的地址")
+    parser.add_argument("--callback-drop-rate", type=float, default=0.0, help="随机丢弃回调的比例")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, task_seconds=args.task_seconds,
+        queue_seconds=args.queue_seconds, curve=args.curve, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after, fail_rate=args.fail_rate,
+        max_running=args.max_running, artifact_kb=args.artifact_kb, seed=args.seed,
+        callback_url=args.callback_url, callback_drop_rate=args.callback_drop_rate,
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地 Tripo API 模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
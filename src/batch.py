@@ -0,0 +1,51 @@
+import os
+import asyncio
+from typing import Dict, Any, List, Optional
+from pydantic import ValidationError
+from models import BatchSubmitItem
+import tripo_api
+
+BATCH_CONCURRENCY = int(os.getenv("TRIPO_BATCH_CONCURRENCY", "8"))
+
+async def submit_one(item: BatchSubmitItem) -> Dict[str, Any]:
+    creator = tripo_api.TASK_CREATORS.get(item.type)
+    if creator is None:
+        return {"code": 2002, "msg": f"The task type {item.type} is unsupported."}
+    model_cls, create = creator
+    try:
+        request = model_cls(**item.params)
+    except ValidationError as e:
+        return {"code": 2002, "msg": f"Invalid params: {e.errors(include_url=False)}"}
+    try:
+        return await create(request)
+    except Exception as e:
+        return {"code": 1001, "msg": f"Fatal error: {str(e)}"}
+
+async def submit_batch(items: List[BatchSubmitItem], max_concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """以固定大小的工作协程池并发提交任务；单项失败只记录在对应结果中，不影响其它任务。"""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for index in range(len(items)):
+        queue.put_nowait(index)
+
+    async def worker():
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            item = items[index]
+            response = await submit_one(item)
+            entry = {"index": index, "type": item.type, "code": response.get("code", 1001)}
+            data = response.get("data")
+            task_id = data.get("task_id") if isinstance(data, dict) else None
+            if task_id:
+                entry["task_id"] = task_id
+            if entry["code"] != 0:
+                entry["msg"] = response.get("msg") or response.get("message")
+            results[index] = entry
+
+    workers = max(1, min(max_concurrency or BATCH_CONCURRENCY, len(items)))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    submitted = sum(1 for r in results if r and r["code"] == 0)
+    return {"code": 0, "data": {"submitted": submitted, "failed": len(items) - submitted, "results": results}}
@@ -0,0 +1,196 @@
+import os
+import hmac
+import time
+import socket
+import asyncio
+import ipaddress
+import logging
+import contextlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable
+import metrics
+
+CALLBACK_HOST = os.getenv("TRIPO_CALLBACK_HOST", "127.0.0.1")
+CALLBACK_PORT = int(os.getenv("TRIPO_CALLBACK_PORT", "0"))
+CALLBACK_PATH = os.getenv("TRIPO_CALLBACK_PATH", "/tripo/callback")
+CALLBACK_SECRET = os.getenv("TRIPO_CALLBACK_SECRET", "")
+# 等待回调的期限：超过该时间仍未收到任务回调时退回稀疏轮询
+CALLBACK_GRACE = float(os.getenv("TRIPO_CALLBACK_GRACE", "120"))
+CALLBACK_POLL_INTERVAL = float(os.getenv("TRIPO_CALLBACK_POLL_INTERVAL", "30"))
+CALLBACK_MAX_TASKS = int(os.getenv("TRIPO_CALLBACK_MAX_TASKS", "10000"))
+
+logger = logging.getLogger(__name__)
+
+def parse_task(payload: Any) -> Optional[Dict[str, Any]]:
+    """从回调请求体中取出任务对象，兼容 {"data": {...}}、{"task": {...}} 与直接推送任务对象三种形式。"""
+    if not isinstance(payload, dict):
+        return None
+    for key in ("data", "task"):
+        if isinstance(payload.get(key), dict):
+            payload = payload[key]
+            break
+    if not isinstance(payload.get("task_id"), str) or not payload.get("status"):
+        return None
+    return payload
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+class CallbackReceiver:
+    """内嵌的任务回调接收端：记录各任务最近一次收到回调的时间，并通过 on_update 唤醒等待中的任务，代替高频轮询。
+
+    回调只作为状态变化的通知，其内容不作为任务结果，任务状态始终以随后向上游查询的结果为准。
+    """
+
+    def __init__(self, host: str = CALLBACK_HOST, port: int = CALLBACK_PORT, path: str = CALLBACK_PATH,
+                 secret: str = CALLBACK_SECRET, max_tasks: int = CALLBACK_MAX_TASKS):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret = secret
+        self.max_tasks = max_tasks
+        # 任务ID -> 最近一次收到回调的时间，按接收顺序淘汰
+        self.tasks: "OrderedDict[str, float]" = OrderedDict()
+        self.on_update: Optional[Callable[[str], None]] = None
+        self.running = False
+        self.received = 0
+        self.rejected = 0
+        self._server = None
+        self._serving: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.port)
+
+    def last_received(self, task_id: str) -> Optional[float]:
+        return self.tasks.get(task_id)
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return not self.secret or (token is not None and hmac.compare_digest(token, self.secret))
+
+    def handle(self, payload: Any) -> Optional[str]:
+        """处理一次回调，返回任务ID；请求体无法识别时返回 None。"""
+        task = parse_task(payload)
+        if task is None:
+            self.rejected += 1
+            return None
+        task_id = task["task_id"]
+        self.received += 1
+        self.tasks.pop(task_id, None)
+        self.tasks[task_id] = time.monotonic()
+        while len(self.tasks) > self.max_tasks:
+            self.tasks.popitem(last=False)
+        if self.on_update is not None:
+            try:
+                self.on_update(task_id)
+            except Exception:
+                logger.exception("Failed to apply callback for task %s", task_id)
+        return task_id
+
+    def _build_app(self):
+        # fastapi 只在启用回调时导入，不影响默认的冷启动耗时
+        from fastapi import FastAPI, Request
+        from fastapi.responses import JSONResponse
+
+        app = FastAPI(title="Tripo MCP callback receiver", docs_url=None, redoc_url=None, openapi_url=None)
+
+        @app.post(self.path)
+        async def receive(request: Request):
+            token = request.headers.get("X-Tripo-Callback-Token") or request.query_params.get("token")
+            if not self.authorized(token):
+                self.rejected += 1
+                return JSONResponse({"code": 1002, "msg": "Invalid callback token"}, status_code=401)
+            try:
+                payload = await request.json()
+            except ValueError:
+                payload = None
+            task_id = self.handle(payload)
+            if task_id is None:
+                return JSONResponse({"code": 2002, "msg": "Callback body has no task_id/status"}, status_code=400)
+            return {"code": 0, "data": {"task_id": task_id}}
+
+        @app.get("/healthz")
+        async def healthz():
+            return {"code": 0, "data": self.stats()}
+
+        return app
+
+    async def _serve(self) -> None:
+        import uvicorn
+
+        class EmbeddedServer(uvicorn.Server):
+            # 与 MCP 服务共用事件循环，信号交给宿主进程处理
+            def install_signal_handlers(self) -> None:
+                pass
+
+            @contextlib.contextmanager
+            def capture_signals(self):
+                yield
+
+        app = await asyncio.to_thread(self._build_app)
+        # 自行绑定端口：端口被占用时只记录错误并保持轮询模式，不让 uvicorn 退出整个进程
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.host, self.port))
+        except OSError as e:
+            sock.close()
+            logger.error("Callback receiver disabled, cannot bind %s:%s: %s", self.host, self.port, e)
+            return
+        self._server = EmbeddedServer(uvicorn.Config(app, log_level="warning", log_config=None, lifespan="off"))
+        self.running = True
+        try:
+            await self._server.serve(sockets=[sock])
+        finally:
+            self.running = False
+            sock.close()
+
+    def start(self) -> None:
+        """在后台启动回调接收端；未配置 TRIPO_CALLBACK_PORT 时不启动，等待任务完全依赖轮询。
+
+        监听非回环地址时必须设置 TRIPO_CALLBACK_SECRET，否则拒绝启动，避免任何人都能伪造回调。
+        """
+        if not self.enabled or self._serving is not None:
+            return
+        if not self.secret and not is_loopback(self.host):
+            logger.error("Callback receiver disabled: TRIPO_CALLBACK_SECRET is required to listen on %s", self.host)
+            return
+        self._serving = asyncio.ensure_future(self._serve())
+
+    async def stop(self) -> None:
+        if self._serving is None:
+            return
+        if self._server is not None:
+            self._server.should_exit = True
+        try:
+            await asyncio.wait_for(asyncio.shield(self._serving), 5)
+        except Exception:
+            self._serving.cancel()
+            await asyncio.gather(self._serving, return_exceptions=True)
+        self._serving = None
+        self._server = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "authenticated": bool(self.secret),
+            "endpoint": f"http://{self.host}:{self.port}{self.path}" if self.enabled else None,
+            "received": self.received,
+            "rejected": self.rejected,
+            "tracked_tasks": len(self.tasks),
+            "grace_seconds": CALLBACK_GRACE,
+            "fallback_poll_interval": CALLBACK_POLL_INTERVAL,
+        }
+
+receiver = CallbackReceiver()
+
+metrics.registry.register(
+    "tripo_callbacks_received", "counter", "Task callbacks accepted by the embedded receiver.",
+    lambda: {(): receiver.received},
+)
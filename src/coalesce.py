@@ -0,0 +1,19 @@
+import asyncio
+from typing import Dict, Any, Callable, Awaitable, Hashable, Tuple
+
+async def coalesce(pending: Dict[Hashable, "asyncio.Future"], key: Hashable,
+                   factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+    """同一 key 的并发调用共享一次执行，返回 (结果, 是否加入了已在进行中的执行)。
+
+    执行放在独立的 future 中并以 shield 等待，单个调用者被取消不会中断其他等待者；
+    执行结束后自动从 pending 中移除，之后的调用重新执行。
+    """
+    future = pending.get(key)
+    joined = future is not None
+    if future is None:
+        future = asyncio.ensure_future(factory())
+        # 所有等待者都被取消时异常可能无人读取，这里统一消费避免告警
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        future.add_done_callback(lambda f: pending.pop(key, None) if pending.get(key) is f else None)
+        pending[key] = future
+    return await asyncio.shield(future), joined
@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+from ledger import ledger
+from coalesce import coalesce
+
+DEDUP_ENABLED = os.getenv("TRIPO_DEDUP", "true").lower() not in ("0", "false", "no")
+DEDUP_TTL = float(os.getenv("TRIPO_DEDUP_TTL", "86400"))
+
+# 失败类终态的任务不能复用，需重新提交
+NON_REUSABLE_STATUSES = ("failed", "cancelled", "banned", "expired", "unknown")
+
+def required_seeds(payload: Dict[str, Any]) -> Tuple[str, ...]:
+    """返回结果可复现所需固定的种子字段；空元组表示该任务类型不做去重。"""
+    task_type = payload.get("type")
+    textured = payload.get("texture", True) or payload.get("pbr", True)
+    if task_type in ("text_to_model", "image_to_model", "multiview_to_model"):
+        return ("model_seed", "texture_seed") if textured else ("model_seed",)
+    if task_type == "texture_model":
+        return ("texture_seed",)
+    return ()
+
+def canonical_key(payload: Dict[str, Any]) -> Optional[str]:
+    # 仅当种子全部固定时请求才是确定性的，此时按规范化后的请求体计算摘要
+    seeds = required_seeds(payload)
+    if not seeds or any(payload.get(seed) is None for seed in seeds):
+        return None
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=20).hexdigest()
+
+class SubmissionDedup:
+    """幂等提交：种子固定的相同请求在 TTL 内返回已有任务ID（先查内存，再查本地台账），并发相同请求只提交一次。"""
+
+    def __init__(self, ttl: float = DEDUP_TTL, enabled: bool = DEDUP_ENABLED):
+        self.ttl = ttl
+        self.enabled = enabled
+        self._recent: Dict[str, Tuple[str, float]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    async def lookup(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self._recent.get(key)
+        if entry is not None:
+            task_id, created_at = entry
+            if now - created_at <= self.ttl and await ledger.get_status_async(task_id) not in NON_REUSABLE_STATUSES:
+                return task_id
+            self._recent.pop(key, None)
+        found = await ledger.find_by_hash_async(key, now - self.ttl, NON_REUSABLE_STATUSES)
+        if found is None:
+            return None
+        self._remember(key, found[0], found[1])
+        return found[0]
+
+    async def submit(self, payload: Dict[str, Any], create: Callable[[Optional[str]], Awaitable[Dict[str, Any]]],
+                     dedup: bool = True) -> Dict[str, Any]:
+        key = canonical_key(payload) if self.enabled and dedup and self.ttl > 0 else None
+        if key is None:
+            return await create(None)
+        task_id = await self.lookup(key)
+        if task_id:
+            self.hits += 1
+            return {"code": 0, "data": {"task_id": task_id}, "deduplicated": True}
+        result, joined = await coalesce(self._pending, key, lambda: create(key))
+        if joined:
+            self.coalesced += 1
+            return {**result, "deduplicated": True} if result.get("code", 0) == 0 else result
+        self.misses += 1
+        data = result.get("data") if isinstance(result, dict) else None
+        if isinstance(data, dict) and data.get("task_id"):
+            self._remember(key, data["task_id"], time.time())
+        return result
+
+    def _remember(self, key: str, task_id: str, created_at: float) -> None:
+        self._recent[key] = (task_id, created_at)
+        if len(self._recent) > 10000:
+            now = time.time()
+            self._recent = {k: v for k, v in self._recent.items() if now - v[1] <= self.ttl}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "coalesced": self.coalesced, "misses": self.misses, "entries": len(self._recent)}
+
+submissions = SubmissionDedup()
@@ -0,0 +1,256 @@
+import os
+import json
+import uuid
+import shutil
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse
+import httpx
+from models import TaskIdRequest
+import tripo_api
+import task_cache
+import upload_cache
+import metrics
+
+DOWNLOAD_DIR = os.getenv("TRIPO_DOWNLOAD_DIR", os.path.join(os.getcwd(), "tripo_downloads"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("TRIPO_DOWNLOAD_CONCURRENCY", "4"))
+DOWNLOAD_PARTS = int(os.getenv("TRIPO_DOWNLOAD_PARTS", "4"))
+DOWNLOAD_PART_THRESHOLD = int(os.getenv("TRIPO_DOWNLOAD_PART_THRESHOLD", str(8 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_MAX_ATTEMPTS = 3
+BLOB_DIR = os.path.join(upload_cache.CACHE_DIR, "blobs")
+INDEX_PATH = os.path.join(upload_cache.CACHE_DIR, "download_index.json")
+
+# 签名 URL 过期时 CDN 通常返回这些状态码
+EXPIRED_STATUS = {401, 403, 404, 410}
+# 要求原样传输，保证落盘字节数可与 Content-Length/Content-Range 校验
+IDENTITY = {"Accept-Encoding": "identity"}
+
+class SignedUrlExpired(Exception):
+    pass
+
+def extract_artifacts(output: Dict[str, Any]) -> Dict[str, str]:
+    """从任务 output 中提取所有产物 URL，兼容字符串与 {"url": ...} 两种形式。"""
+    artifacts: Dict[str, str] = {}
+    for key, value in (output or {}).items():
+        if isinstance(value, dict):
+            value = value.get("url")
+        if isinstance(value, str) and value.startswith(("http://", "https://")):
+            artifacts[key] = value
+    return artifacts
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+class DownloadIndex:
+    """task_id -> {"keys": 产物名列表, "files": {产物名: {digest, size, ext}}} 的持久化索引，产物内容按摘要存放在 blobs 目录。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, task_id: str) -> Dict[str, Any]:
+        return self._load().get(task_id, {})
+
+    def set_keys(self, task_id: str, keys: List[str]) -> None:
+        self._load().setdefault(task_id, {})["keys"] = keys
+        self._save()
+
+    def put(self, task_id: str, key: str, entry: Dict[str, Any]) -> None:
+        self._load().setdefault(task_id, {}).setdefault("files", {})[key] = entry
+        self._save()
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+index = DownloadIndex(INDEX_PATH)
+# 校验通过后实际从网络下载的字节数，不含缓存命中
+bytes_downloaded = 0
+
+async def _stream_to_file(resp: httpx.Response, path: str, offset: int) -> int:
+    # 边收边写，内存中最多只保留一个分块
+    loop = asyncio.get_running_loop()
+    written = 0
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            await loop.run_in_executor(None, f.write, chunk)
+            written += len(chunk)
+    return written
+
+def _check_expired(resp: httpx.Response) -> None:
+    if resp.status_code in EXPIRED_STATUS:
+        raise SignedUrlExpired(f"HTTP {resp.status_code}")
+    resp.raise_for_status()
+
+async def _download_range(url: str, path: str, start: int, end: int) -> int:
+    for attempt in range(DOWNLOAD_MAX_ATTEMPTS):
+        try:
+            async with tripo_api.get_client().stream("GET", url, headers={**IDENTITY, "Range": f"bytes={start}-{end}"}) as resp:
+                _check_expired(resp)
+                if resp.status_code != 206:
+                    raise httpx.HTTPError(f"Range request not honoured: HTTP {resp.status_code}")
+                return await _stream_to_file(resp, path, start)
+        except httpx.TransportError:
+            if attempt + 1 >= DOWNLOAD_MAX_ATTEMPTS:
+                raise
+            await asyncio.sleep(0.5 * (2 ** attempt))
+    return 0
+
+async def _download_to(url: str, path: str) -> int:
+    """下载单个文件：探测到支持 Range 且文件较大时分段并行下载，否则单连接流式下载。返回校验后的字节数。"""
+    open(path, "wb").close()
+    async with tripo_api.get_client().stream("GET", url, headers={**IDENTITY, "Range": "bytes=0-0"}) as resp:
+        _check_expired(resp)
+        total = None
+        if resp.status_code == 206:
+            content_range = resp.headers.get("Content-Range", "")
+            if "/" in content_range and not content_range.endswith("/*"):
+                total = int(content_range.rsplit("/", 1)[1])
+        else:
+            # 服务端忽略 Range，直接使用本次响应流
+            expected = resp.headers.get("Content-Length")
+            written = await _stream_to_file(resp, path, 0)
+            if expected is not None and written != int(expected):
+                raise IOError(f"Size mismatch: expected {expected}, got {written}")
+            return written
+    if total is None:
+        async with tripo_api.get_client().stream("GET", url, headers=IDENTITY) as resp:
+            _check_expired(resp)
+            return await _stream_to_file(resp, path, 0)
+    with open(path, "r+b") as f:
+        f.truncate(total)
+    parts = DOWNLOAD_PARTS if total >= DOWNLOAD_PART_THRESHOLD else 1
+    part_size = -(-total // parts)
+    ranges: List[Tuple[int, int]] = [
+        (start, min(start + part_size, total) - 1) for start in range(0, total, part_size)
+    ]
+    written = sum(await asyncio.gather(*(_download_range(url, path, start, end) for start, end in ranges)))
+    actual = os.path.getsize(path)
+    if written != total or actual != total:
+        raise IOError(f"Size mismatch: expected {total}, got {written}")
+    return total
+
+async def _store_blob(tmp_path: str) -> Tuple[str, int]:
+    global bytes_downloaded
+    digest = await upload_cache.digest_file(tmp_path)
+    size = os.path.getsize(tmp_path)
+    bytes_downloaded += size
+    blob_path = _blob_path(digest)
+    # 总是原子替换：已有的缓存文件可能已损坏，替换后旧版本留下的硬链接也与缓存脱钩
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    os.replace(tmp_path, blob_path)
+    return digest, size
+
+def _materialize(digest: str, dest: str) -> None:
+    # 复制而不是硬链接：用户就地修改下载的文件时不会改动缓存中按摘要存放的内容
+    tmp_path = f"{dest}.{uuid.uuid4().hex}.part"
+    try:
+        shutil.copyfile(_blob_path(digest), tmp_path)
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+async def _fresh_artifacts(task_id: str) -> Dict[str, str]:
+    # 签名 URL 过期后丢弃缓存的任务结果，重新查询以获取新 URL
+    task_cache.cache.invalidate(task_id)
+    result = await tripo_api.get_task_status(TaskIdRequest(task_id=task_id))
+    return extract_artifacts((result.get("data") or {}).get("output") or {})
+
+async def _fetch_artifact(task_id: str, key: str, url: str, refreshed: Dict[str, Any]) -> Tuple[str, int]:
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    tmp_path = os.path.join(BLOB_DIR, f".{task_id}.{key}.{uuid.uuid4().hex}.part")
+    try:
+        try:
+            await _download_to(url, tmp_path)
+        except SignedUrlExpired:
+            # 多个产物同时过期时只重新查询一次
+            if "task" not in refreshed:
+                refreshed["task"] = asyncio.ensure_future(_fresh_artifacts(task_id))
+            fresh = await refreshed["task"]
+            if key not in fresh:
+                raise
+            await _download_to(fresh[key], tmp_path)
+        return await _store_blob(tmp_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+async def download_result(task_id: str, output_dir: Optional[str] = None,
+                          keys: Optional[List[str]] = None) -> Dict[str, Any]:
+    target_dir = os.path.join(output_dir or DOWNLOAD_DIR, task_id)
+    record = index.get(task_id)
+    cached = record.get("files", {})
+    artifacts: Dict[str, str] = {}
+
+    def have(key: str) -> bool:
+        # 旧版本把下载文件硬链接到缓存，仍有其他链接或大小不符时缓存内容可能已被就地修改，视为未缓存重新下载
+        if key not in cached:
+            return False
+        try:
+            stat = os.stat(_blob_path(cached[key]["digest"]))
+        except OSError:
+            return False
+        return stat.st_nlink == 1 and stat.st_size == cached[key]["size"]
+
+    wanted = keys or record.get("keys")
+    # 同一任务的产物已全部缓存时无需访问网络
+    if not wanted or not all(have(k) for k in wanted):
+        result = await tripo_api.get_task_status(TaskIdRequest(task_id=task_id))
+        if result.get("code", 0) != 0:
+            return result
+        data = result.get("data") or {}
+        if data.get("status") != "success":
+            return {"code": 2002, "msg": f"Task {task_id} is not successful (status: {data.get('status')})."}
+        artifacts = extract_artifacts(data.get("output") or {})
+        index.set_keys(task_id, list(artifacts))
+        wanted = keys or list(artifacts)
+        missing = [k for k in wanted if k not in artifacts and not have(k)]
+        if missing:
+            return {"code": 2002, "msg": f"Unknown output keys: {', '.join(missing)}"}
+
+    os.makedirs(target_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+    refreshed: Dict[str, Any] = {}
+
+    async def one(key: str) -> Dict[str, Any]:
+        entry = cached.get(key)
+        from_cache = have(key)
+        try:
+            if not from_cache:
+                async with semaphore:
+                    digest, size = await _fetch_artifact(task_id, key, artifacts[key], refreshed)
+                ext = os.path.splitext(urlparse(artifacts[key]).path)[1]
+                entry = {"digest": digest, "size": size, "ext": ext}
+                index.put(task_id, key, entry)
+            dest = os.path.join(target_dir, f"{key}{entry['ext']}")
+            await asyncio.to_thread(_materialize, entry["digest"], dest)
+            return {"key": key, "path": dest, "size": entry["size"], "digest": entry["digest"], "cached": from_cache}
+        except Exception as e:
+            return {"key": key, "error": str(e)}
+
+    files = await asyncio.gather(*(one(key) for key in wanted))
+    failed = [f for f in files if "error" in f]
+    return {"code": 0 if not failed else 1001, "data": {"task_id": task_id, "files": files}}
+
+metrics.registry.register(
+    "tripo_download_bytes", "counter", "Result bytes downloaded from Tripo, excluding cache hits.",
+    lambda: {(): bytes_downloaded},
+)
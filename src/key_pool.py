@@ -0,0 +1,161 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from rate_limit import RunningTaskGovernor
+from ledger import ledger
+
+KEY_MIN_BALANCE = float(os.getenv("TRIPO_KEY_MIN_BALANCE", "40"))
+KEY_BALANCE_REFRESH = float(os.getenv("TRIPO_KEY_BALANCE_REFRESH", "300"))
+
+# 后续操作引用上游任务的字段；按这些字段把任务固定到原任务所属的 key
+PARENT_TASK_FIELDS = ("original_model_task_id", "draft_model_task_id")
+
+def load_keys() -> List[str]:
+    """读取 TRIPO_API_KEY 与 TRIPO_API_KEYS（逗号或空白分隔），按出现顺序去重。"""
+    raw = [os.getenv("TRIPO_API_KEY") or ""] + re.split(r"[,\s]+", os.getenv("TRIPO_API_KEYS") or "")
+    return list(dict.fromkeys(key for key in raw if key))
+
+def key_id(api_key: str) -> str:
+    # 对外只暴露 key 的指纹，不泄露 key 本身
+    return hashlib.blake2b(api_key.encode("utf-8"), digest_size=6).hexdigest()
+
+class PooledKey:
+    """池中的一个账户：请求头、独立的运行任务数控制，以及后台刷新的余额。"""
+
+    def __init__(self, api_key: str, max_running: int, learn_ttl: float = 600.0):
+        self.id = key_id(api_key)
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.running = RunningTaskGovernor(max_running, refresh_interval=10.0, stale_after=6 * 3600.0,
+                                           learn_ttl=learn_ttl)
+        self.balance: Optional[float] = None
+        self.frozen: Optional[float] = None
+        self.balance_updated: Optional[float] = None
+        self.balance_error: Optional[str] = None
+
+    def load(self) -> int:
+        return self.running.occupied()
+
+    def has_balance(self, minimum: float) -> bool:
+        # 余额未知（尚未刷新或刷新失败）时不排除该 key
+        return self.balance is None or self.balance >= minimum
+
+    def update_balance(self, result: Dict[str, Any]) -> None:
+        data = result.get("data") if isinstance(result, dict) else None
+        if result.get("code", 0) == 0 and isinstance(data, dict) and "balance" in data:
+            self.balance = float(data["balance"])
+            self.frozen = float(data.get("frozen") or 0)
+            self.balance_updated = time.time()
+            self.balance_error = None
+        else:
+            self.balance_error = str(result.get("msg") or result.get("message") or result.get("code"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "balance": self.balance,
+            "frozen": self.frozen,
+            "balance_age_seconds": round(time.time() - self.balance_updated, 1) if self.balance_updated else None,
+            "balance_error": self.balance_error,
+            **self.running.stats(),
+        }
+
+class KeyPool:
+    """多 API key 负载均衡：新任务路由到余额充足且运行任务最少的 key，后续操作固定到原任务所属的 key。"""
+
+    def __init__(self, api_keys: List[str], max_running: int = 0, min_balance: float = KEY_MIN_BALANCE,
+                 refresh_interval: float = KEY_BALANCE_REFRESH, learn_ttl: float = 600.0):
+        self.keys = [PooledKey(api_key, max_running, learn_ttl) for api_key in api_keys or [""]]
+        self._by_id = {key.id: key for key in self.keys}
+        self.min_balance = min_balance
+        self.refresh_interval = refresh_interval
+        # 任务ID/上传 token -> key 指纹；任务所属关系同时记在台账中，跨会话有效
+        self._owners: Dict[str, str] = {}
+        self.refresh_balance: Optional[Callable[[PooledKey], Awaitable[Any]]] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def primary(self) -> PooledKey:
+        return self.keys[0]
+
+    def select(self) -> PooledKey:
+        if len(self.keys) == 1:
+            return self.primary
+        eligible = [key for key in self.keys if key.has_balance(self.min_balance)]
+        if not eligible:
+            # 所有 key 余额都不足时交给余额最多的 key，由上游给出余额不足的错误
+            return max(self.keys, key=lambda key: key.balance or 0)
+        return min(eligible, key=lambda key: (key.load(), -(key.balance or 0)))
+
+    async def owner(self, resource_id: Optional[str]) -> Optional[PooledKey]:
+        if not resource_id:
+            return None
+        owner_id = self._owners.get(resource_id)
+        if owner_id is None and len(self.keys) > 1:
+            owner_id = await ledger.get_owner_async(resource_id)
+            if owner_id is not None:
+                self._owners[resource_id] = owner_id
+        return self._by_id.get(owner_id) if owner_id else None
+
+    def assign(self, resource_id: str, key: PooledKey) -> None:
+        if len(self.keys) > 1:
+            self._owners[resource_id] = key.id
+
+    async def route(self, payload: Dict[str, Any]) -> PooledKey:
+        """为待提交的任务选择 key：引用了已有任务或上传 token 时使用其所属 key，否则选负载最低的 key。"""
+        if len(self.keys) == 1:
+            return self.primary
+        references = [payload.get(field) for field in PARENT_TASK_FIELDS]
+        files = payload.get("files") if isinstance(payload.get("files"), list) else [payload.get("file")]
+        references += [f.get("file_token") for f in files if isinstance(f, dict)]
+        for reference in references:
+            key = await self.owner(reference)
+            if key is not None:
+                return key
+        return self.select()
+
+    def is_running(self, task_id: str) -> bool:
+        return any(key.running.is_running(task_id) for key in self.keys)
+
+    def finished(self, task_id: str) -> None:
+        for key in self.keys:
+            key.running.finished(task_id)
+
+    async def refresh_all(self) -> None:
+        if self.refresh_balance is not None:
+            await asyncio.gather(*(self.refresh_balance(key) for key in self.keys), return_exceptions=True)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """启动后台余额刷新；单 key 时余额不参与路由，不启动。"""
+        if len(self.keys) > 1 and self.refresh_interval > 0 and self._refresher is None:
+            self._refresher = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+
+    def running_stats(self) -> Dict[str, Any]:
+        per_key = [key.running.stats() for key in self.keys]
+        return {
+            "running": sum(s["running"] for s in per_key),
+            "submitting": sum(s["submitting"] for s in per_key),
+            "waiting": sum(s["waiting"] for s in per_key),
+            "keys": {key.id: s for key, s in zip(self.keys, per_key)},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": [key.stats() for key in self.keys],
+            "min_balance": self.min_balance,
+            "refresh_interval": self.refresh_interval,
+            "pinned_resources": len(self._owners),
+        }
@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+import functools
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Tuple, Callable
+import upload_cache
+
+LEDGER_PATH = os.getenv("TRIPO_LEDGER_PATH", os.path.join(upload_cache.CACHE_DIR, "ledger.sqlite3"))
+# 后台写入线程合并写操作的等待时间（秒），同一时段的多次状态变化写入同一个事务
+LEDGER_FLUSH_DELAY = float(os.getenv("TRIPO_LEDGER_FLUSH_DELAY", "0.2"))
+# 内存中记住最近写入状态的任务数上限，用于跳过未变化的状态写入
+LEDGER_MAX_TRACKED = int(os.getenv("TRIPO_LEDGER_MAX_TRACKED", "10000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL,
+    request TEXT NOT NULL,
+    output TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    request_hash TEXT,
+    api_key_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_type ON tasks(type, created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks(created_at);
+CREATE TABLE IF NOT EXISTS task_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_task ON task_events(task_id, at);
+"""
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts is not None else None
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    # 支持 ISO 8601 字符串或 Unix 时间戳
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+class TaskLedger:
+    """本地任务台账（SQLite WAL），记录任务请求、状态历史与时间戳，跨会话保留。
+
+    写入在后台线程中合并为事务执行，不阻塞事件循环；读取前先写入排队中的操作，保证读到最新记录，
+    事件循环中通过 *_async 方法在线程池中读取。
+    """
+
+    def __init__(self, path: str, flush_delay: float = LEDGER_FLUSH_DELAY, max_tracked: int = LEDGER_MAX_TRACKED):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.max_tracked = max_tracked
+        self._conn: Optional[sqlite3.Connection] = None
+        # 保护连接；写入线程与读取方都在持有该锁时执行排队的写操作
+        self._lock = threading.Lock()
+        self._queue: List[Callable[[sqlite3.Connection], None]] = []
+        self._queue_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._closing = False
+        self.write_errors = 0
+        # 最近一次写入的 (status, progress)，状态未变化时跳过写库；按 LRU 淘汰，长期运行时不无限增长
+        self._last: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            # 兼容旧版台账：补充幂等提交用的 request_hash 列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+            if "request_hash" not in columns:
+                conn.execute("ALTER TABLE tasks ADD COLUMN request_hash TEXT")
+            # 多 key 部署：记录任务所属 key 的指纹，后续操作与查询固定到同一账户
+            if "api_key_id" not in columns:
+                conn.execute("ALTER TABLE tasks ADD COLUMN api_key_id TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_request_hash ON tasks(request_hash, created_at)")
+            conn.row_factory = sqlite3.Row
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, task_id: str, state: Tuple[str, Optional[float]]) -> None:
+        self._last[task_id] = state
+        self._last.move_to_end(task_id)
+        while len(self._last) > self.max_tracked:
+            self._last.popitem(last=False)
+
+    def _enqueue(self, op: Callable[[sqlite3.Connection], None]) -> None:
+        with self._queue_lock:
+            self._queue.append(op)
+            if self._writer is None and not self._closing:
+                self._writer = threading.Thread(target=self._run, name="tripo-ledger", daemon=True)
+                self._writer.start()
+        self._wakeup.set()
+
+    def _drain(self) -> None:
+        """持有 self._lock 时调用：把排队的写操作在一个事务中写入。"""
+        with self._queue_lock:
+            ops, self._queue = self._queue, []
+        if not ops:
+            return
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                for op in ops:
+                    op(conn)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            # 台账只做记录，写入失败不影响任务本身
+            self.write_errors += len(ops)
+
+    def _run(self) -> None:
+        while not self._closing:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._closing:
+                time.sleep(self.flush_delay)
+            with self._lock:
+                self._drain()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._drain()
+
+    @staticmethod
+    def _insert_created(conn: sqlite3.Connection, task_id: str, task_type: str, request: str, now: float,
+                        request_hash: Optional[str], api_key_id: Optional[str]) -> None:
+        conn.execute(
+            "INSERT OR IGNORE INTO tasks "
+            "(task_id, type, status, progress, request, created_at, updated_at, request_hash, api_key_id) "
+            "VALUES (?, ?, 'queued', 0, ?, ?, ?, ?, ?)",
+            (task_id, task_type, request, now, now, request_hash, api_key_id),
+        )
+        conn.execute("INSERT INTO task_events (task_id, status, progress, at) VALUES (?, 'queued', 0, ?)", (task_id, now))
+
+    @staticmethod
+    def _apply_status(conn: sqlite3.Connection, task_id: str, task_type: str, status: str,
+                      progress: Optional[float], output: Optional[str], created_at: float, now: float) -> None:
+        row = conn.execute("SELECT status FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            # 非本服务创建的任务同样入账，请求内容未知
+            conn.execute(
+                "INSERT OR IGNORE INTO tasks (task_id, type, status, progress, request, output, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, '{}', ?, ?, ?)",
+                (task_id, task_type, status, progress, output, created_at, now),
+            )
+        else:
+            conn.execute(
+                "UPDATE tasks SET status = ?, progress = ?, output = COALESCE(?, output), updated_at = ? "
+                "WHERE task_id = ?",
+                (status, progress, output, now, task_id),
+            )
+        if row is None or row["status"] != status:
+            conn.execute("INSERT INTO task_events (task_id, status, progress, at) VALUES (?, ?, ?, ?)",
+                         (task_id, status, progress, now))
+
+    def record_created(self, task_id: str, task_type: str, payload: Dict[str, Any],
+                       request_hash: Optional[str] = None, api_key_id: Optional[str] = None) -> None:
+        self._enqueue(functools.partial(self._insert_created, task_id=task_id, task_type=task_type,
+                                        request=json.dumps(payload, ensure_ascii=False), now=time.time(),
+                                        request_hash=request_hash, api_key_id=api_key_id))
+        self._remember(task_id, ("queued", 0))
+
+    def record_status(self, task_id: str, data: Dict[str, Any]) -> None:
+        status = data.get("status")
+        if not status:
+            return
+        progress = data.get("progress")
+        if self._last.get(task_id) == (status, progress):
+            return
+        now = time.time()
+        output = json.dumps(data["output"], ensure_ascii=False) if data.get("output") else None
+        self._enqueue(functools.partial(self._apply_status, task_id=task_id, task_type=data.get("type") or "unknown",
+                                        status=status, progress=progress, output=output,
+                                        created_at=data.get("create_time") or now, now=now))
+        self._remember(task_id, (status, progress))
+
+    def find_by_hash(self, request_hash: str, since: float,
+                     exclude_statuses: Tuple[str, ...]) -> Optional[Tuple[str, float]]:
+        placeholders = ", ".join("?" for _ in exclude_statuses)
+        try:
+            with self._lock:
+                self._drain()
+                row = self._connect().execute(
+                    f"SELECT task_id, created_at FROM tasks WHERE request_hash = ? AND created_at >= ? "
+                    f"AND status NOT IN ({placeholders}) ORDER BY created_at DESC LIMIT 1",
+                    (request_hash, since, *exclude_statuses),
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        return (row["task_id"], row["created_at"]) if row else None
+
+    def get_status(self, task_id: str) -> Optional[str]:
+        try:
+            with self._lock:
+                self._drain()
+                row = self._connect().execute("SELECT status FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return row["status"] if row else None
+
+    def get_owner(self, task_id: str) -> Optional[str]:
+        try:
+            with self._lock:
+                self._drain()
+                row = self._connect().execute("SELECT api_key_id FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return row["api_key_id"] if row else None
+
+    def query(self, status: Optional[str] = None, task_type: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, limit: int = 50, offset: int = 0,
+              include_history: bool = False) -> Dict[str, Any]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if task_type:
+            clauses.append("type = ?")
+            params.append(task_type)
+        since_ts, until_ts = _parse_time(since), _parse_time(until)
+        if since_ts is not None:
+            clauses.append("created_at >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            clauses.append("created_at < ?")
+            params.append(until_ts)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        limit = max(1, min(limit, 500))
+        offset = max(0, offset)
+        with self._lock:
+            self._drain()
+            conn = self._connect()
+            total = conn.execute(f"SELECT COUNT(*) FROM tasks {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM tasks {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+            history: Dict[str, List[Dict[str, Any]]] = {}
+            if include_history and rows:
+                # 一次查出本页所有任务的状态历史
+                task_ids = [row["task_id"] for row in rows]
+                events = conn.execute(
+                    f"SELECT task_id, status, progress, at FROM task_events "
+                    f"WHERE task_id IN ({', '.join('?' for _ in task_ids)}) ORDER BY at",
+                    task_ids,
+                ).fetchall()
+                for e in events:
+                    history.setdefault(e["task_id"], []).append(
+                        {"status": e["status"], "progress": e["progress"], "at": _iso(e["at"])})
+            items = []
+            for row in rows:
+                item = {
+                    "task_id": row["task_id"],
+                    "type": row["type"],
+                    "status": row["status"],
+                    "progress": row["progress"],
+                    "request": json.loads(row["request"]),
+                    "output": json.loads(row["output"]) if row["output"] else None,
+                    "created_at": _iso(row["created_at"]),
+                    "updated_at": _iso(row["updated_at"]),
+                }
+                if include_history:
+                    item["history"] = history.get(row["task_id"], [])
+                items.append(item)
+        return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+    # 事件循环中的调用方使用以下异步版本：读取前需写入排队中的操作并可能等待写入线程提交，放到线程池执行
+    async def find_by_hash_async(self, request_hash: str, since: float,
+                                 exclude_statuses: Tuple[str, ...]) -> Optional[Tuple[str, float]]:
+        return await asyncio.to_thread(self.find_by_hash, request_hash, since, exclude_statuses)
+
+    async def get_status_async(self, task_id: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get_status, task_id)
+
+    async def get_owner_async(self, task_id: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get_owner, task_id)
+
+    async def query_async(self, *args, **kwargs) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.query, *args, **kwargs)
+
+    def close(self) -> None:
+        # 停止写入线程并写入剩余的排队操作
+        self._closing = True
+        self._wakeup.set()
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.join(timeout=5)
+        with self._lock:
+            self._drain()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        # 关闭后再次写入时重新启动写入线程
+        self._closing = False
+
+ledger = TaskLedger(LEDGER_PATH)
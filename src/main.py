@@ -1,29 +1,100 @@
+import time
+_STARTED = time.perf_counter()
 import os
-import json
-import httpx
+import sys
+import hmac
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from typing import Optional
 import asyncio
+from contextlib import asynccontextmanager
 try:
-    from mcp import FastMCP
+    from mcp import FastMCP, Context
 except ImportError:
-    from mcp.server.fastmcp import FastMCP
+    from mcp.server.fastmcp import FastMCP, Context
 from models import (
     TextToModelRequest, ImageToModelRequest, MultiviewToModelRequest, TextureModelRequest,
     RefineModelRequest, AnimatePrerigcheckRequest, AnimateRigRequest, AnimateRetargetRequest,
-    StylizeModelRequest, ConvertModelRequest, TaskIdRequest, UploadImageRequest
+    StylizeModelRequest, ConvertModelRequest, TaskIdRequest, UploadImageRequest,
+    WaitForTaskRequest, WaitForTasksRequest, BatchSubmitRequest, PipelineRequest, DownloadResultRequest,
+    ListTasksRequest, MeshStatsRequest, GenerateLodsRequest
 )
 import tripo_api
+import batch
+import pipeline
+import downloader
+import preprocess
+import mesh
+import callbacks
+import quotas
+from ledger import ledger
+import metrics
+from task_waiter import waiter
+import schema_cache
+
+# 启动各阶段耗时（秒），供 --profile-startup 输出
+STARTUP_PHASES = {"imports": time.perf_counter() - _STARTED}
 
 # 加载环境变量
 load_dotenv()
 
 TRIPO_API_KEY = os.getenv("TRIPO_API_KEY")
-if not TRIPO_API_KEY:
-    raise ValueError("TRIPO_API_KEY 环境变量未设置")
+if not TRIPO_API_KEY and not os.getenv("TRIPO_API_KEYS"):
+    raise ValueError("TRIPO_API_KEY 或 TRIPO_API_KEYS 环境变量未设置")
+
+# MCP 服务监听配置，仅 streamable-http/sse 传输使用；默认值与 mcp.json.example 中的 url 一致
+MCP_HOST = os.getenv("TRIPO_MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.getenv("TRIPO_MCP_PORT", "5001"))
+MCP_PATH = os.getenv("TRIPO_MCP_PATH", "/mcp")
+# 设置后 HTTP 传输的每个请求须携带 Authorization: Bearer <token>；监听非回环地址时必须设置
+MCP_TOKEN = os.getenv("TRIPO_MCP_TOKEN", "")
+TRANSPORTS = ("stdio", "streamable-http", "sse")
+
+# HTTP 传输下共享资源由 serve_http 在进程级创建，各会话的 lifespan 不再重复创建与释放
+_shared_resources = False
+
+@asynccontextmanager
+async def resources():
+    # 在后台线程预建共享连接池（TLS 上下文加载约百毫秒），不阻塞首次 tools/list；关闭时释放所有 keep-alive 连接
+    warmup = asyncio.ensure_future(asyncio.to_thread(tripo_api.get_client))
+    metrics_server = await metrics.start_http_server()
+    # 多 key 时在后台定期刷新各账户余额，供任务路由使用
+    tripo_api.accounts.start()
+    # 配置了 TRIPO_CALLBACK_PORT 时接收任务回调，等待任务改为回调唤醒、超时后稀疏轮询
+    callbacks.receiver.start()
+    try:
+        yield {}
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+            await metrics_server.wait_closed()
+        await tripo_api.accounts.stop()
+        await callbacks.receiver.stop()
+        await asyncio.gather(warmup, return_exceptions=True)
+        await tripo_api.close_client()
+        preprocess.images.shutdown()
+        mesh.meshes.shutdown()
+        ledger.close()
+
+@asynccontextmanager
+async def lifespan(server):
+    # FastMCP 对每个会话执行一次 lifespan：stdio 下一个进程只有一个会话，HTTP 传输下所有会话共享进程级资源
+    if _shared_resources:
+        yield {}
+        return
+    async with resources():
+        yield {}
 
-mcp = FastMCP("Tripo3D MCP Server", log_level="ERROR")
+mcp = FastMCP("Tripo3D MCP Server", log_level=os.getenv("TRIPO_LOG_LEVEL", "ERROR"), lifespan=lifespan)
+
+def tool(description: str, quota: bool = True):
+    # 注册 MCP 工具，同时记录每次调用的耗时与返回码；参数 schema 走磁盘缓存
+    # quota 为 True 时受每个客户端会话的并发上限约束；长时间挂起但不占用上游的等待类工具不计入
+    def decorator(fn):
+        handler = quotas.clients.limited(fn) if quota else fn
+        schema_cache.add_tool(mcp, metrics.registry.timed(fn.__name__)(handler), description)
+        return fn
+    return decorator
 
 class CreateTaskRequest(BaseModel):
     prompt: str = Field(..., description="3D模型描述")
@@ -36,7 +107,7 @@ class TaskResponse(BaseModel):
     id: str = Field(..., description="任务ID")
     result: Optional[dict] = Field(None, description="任务结果")
 
-@mcp.tool(description=
+@tool(description=
     """
     文本转3D模型（text_to_model）。
     参数列表：
@@ -59,7 +130,7 @@ class TaskResponse(BaseModel):
 async def tripo3d_text_to_model(request: TextToModelRequest):
     return await tripo_api.text_to_model(request)
 
-@mcp.tool(description=
+@tool(description=
     """
     图片转3D模型（image_to_model）。
     参数列表：
@@ -78,17 +149,20 @@ async def tripo3d_text_to_model(request: TextToModelRequest):
         - auto_size (bool, 可选，默认False)：是否自动缩放到真实世界尺寸。
         - orientation (str, 可选，默认default)：模型朝向，可选：align_image、default。
         - quad (bool, 可选，默认False)：是否输出四边面网格。
+        - preprocess (bool, 可选)：使用file_path时，上传前是否在本地预处理图片（缩放、去元数据、转码、可选裁剪主体），默认取TRIPO_PREPROCESS。
     详见Tripo3D官方文档。
     """
     )
 async def tripo3d_image_to_model(request: ImageToModelRequest):
     return await tripo_api.image_to_model(request)
 
-@mcp.tool(description=
+@tool(description=
     """
     多视图转3D模型（multiview_to_model）。
     参数列表：
-        - files (list, 必填)：长度为4的图片描述对象数组，顺序为[front, left, back, right]，每个对象：
+        - front/left/back/right (str, 可选)：各视图的本地图片路径或http(s) URL，front必填。本地图片在本地校验格式与尺寸后并发上传（同一文件只传一次），全部完成后直接提交任务，无需先调用upload_image。
+        - preprocess (bool, 可选)：上传前是否在本地预处理各视图图片，默认取TRIPO_PREPROCESS。
+        - files (list, 可选)：与front/left/back/right二选一。长度为4的图片描述对象数组，顺序为[front, left, back, right]，每个对象：
         - type (str, 必填)：图片类型。
         - file_token (str, 必填)：图片上传后返回的token。
         - mode (str, 可选)：LEFT或RIGHT。
@@ -110,7 +184,7 @@ async def tripo3d_image_to_model(request: ImageToModelRequest):
 async def tripo3d_multiview_to_model(request: MultiviewToModelRequest):
     return await tripo_api.multiview_to_model(request)
 
-@mcp.tool(description=
+@tool(description=
     """
     模型贴图（texture_model）。
     主要参数：
@@ -123,7 +197,7 @@ async def tripo3d_multiview_to_model(request: MultiviewToModelRequest):
 async def tripo3d_texture_model(request: TextureModelRequest):
     return await tripo_api.texture_model(request)
 
-@mcp.tool(description=
+@tool(description=
     """
     模型精修（refine_model）。
     主要参数：
@@ -134,7 +208,7 @@ async def tripo3d_texture_model(request: TextureModelRequest):
 async def tripo3d_refine_model(request: RefineModelRequest):
     return await tripo_api.refine_model(request)
 
-@mcp.tool(description=
+@tool(description=
     """
     动画预检查（animate_prerigcheck）。
     主要参数：
@@ -145,7 +219,7 @@ async def tripo3d_refine_model(request: RefineModelRequest):
 async def tripo3d_animate_prerigcheck(request: AnimatePrerigcheckRequest):
     return await tripo_api.animate_prerigcheck(request)
 
-@mcp.tool(description=
+@tool(description=
     """
     动画骨骼绑定（animate_rig）。
     主要参数：
@@ -159,7 +233,7 @@ async def tripo3d_animate_prerigcheck(request: AnimatePrerigcheckRequest):
 async def tripo3d_animate_rig(request: AnimateRigRequest):
     return await tripo_api.animate_rig(request)
 
-@mcp.tool(description=
+@tool(description=
     """
     动画重定向（animate_retarget）。
     主要参数：
@@ -173,7 +247,7 @@ async def tripo3d_animate_rig(request: AnimateRigRequest):
 async def tripo3d_animate_retarget(request: AnimateRetargetRequest):
     return await tripo_api.animate_retarget(request)
 
-@mcp.tool(description=
+@tool(description=
     """
     模型风格化。
     主要参数：
@@ -186,21 +260,58 @@ async def tripo3d_animate_retarget(request: AnimateRetargetRequest):
 async def tripo3d_stylize_model(request: StylizeModelRequest):
     return await tripo_api.stylize_model(request)
 
-@mcp.tool(description=
+@tool(description=
     """
     模型格式转换（convert_model）。
     主要参数：
         - original_model_task_id (str): 原始模型任务ID。
         - format (str): 目标格式。
         - quad (bool, 可选): 是否四边面重拓扑。
-        - face_limit (int, 可选): 输出模型面数上限。
+        - face_limit (int, 可选): 输出模型面数上限。只需降低GLB面数时可用generate_lods在本地简化，无需消耗额度。
     详见Tripo3D官方文档。
     """
     )
 async def tripo3d_convert_model(request: ConvertModelRequest):
     return await tripo_api.convert_model(request)
 
-@mcp.tool(description=
+@tool(description=
+    """
+    批量提交任务（batch_submit）。
+    一次调用并发提交多个任务（可混合类型），受并发数与速率限制，单项失败不影响其它任务。
+    主要参数：
+        - items (list): 任务列表，每项包含：
+        - type (str): 任务类型，如text_to_model、image_to_model、texture_model、convert_model等。
+        - params (dict): 与对应单任务工具相同的参数。
+        - max_concurrency (int, 可选): 并发提交数上限。
+    返回每项的index、type、code，成功时附task_id，失败时附msg。
+    """
+    )
+async def tripo3d_batch_submit(request: BatchSubmitRequest):
+    return await batch.submit_batch(request.items, request.max_concurrency)
+
+@tool(description=
+    """
+    任务流水线（run_pipeline）。
+    以DAG声明一组串联的Tripo操作（如text_to_model→texture_model→animate_prerigcheck→animate_rig→animate_retarget→convert_model），
+    服务端在依赖步骤成功后立即提交下一步，无依赖关系的分支（如同一绑定任务的多个重定向、多个格式转换）并行执行，
+    省去每一步之间的LLM往返。
+    主要参数：
+        - steps (list): 步骤列表，每项包含：
+        - id (str): 步骤ID。
+        - type (str): 任务类型。
+        - params (dict, 可选): 任务参数，依赖步骤的任务ID会自动填入（已显式给出时不覆盖）。
+        - depends_on (str | list[str], 可选): 依赖的步骤ID，可有多个。
+        - use_task_id_of (str, 可选): 取哪个依赖的任务ID填入，默认第一个；依赖animate_prerigcheck时填入其检查的源模型任务ID，预检查结果不可绑定时下游步骤跳过。
+        - timeout (float, 可选): 整条流水线最长等待秒数，默认3600。
+    返回整体状态(success/partial/failed)及每一步的task_id、状态与输出。
+    """
+    )
+async def tripo3d_run_pipeline(request: PipelineRequest, ctx: Context):
+    async def on_progress(done: float, total: float, message: str):
+        await ctx.report_progress(done, total, message=message)
+    return await pipeline.run_pipeline(request.steps, request.timeout, on_progress)
+
+@tool(description=
     """
     查询任务状态（get_task_status）。
     主要参数：
@@ -211,30 +322,274 @@ async def tripo3d_convert_model(request: ConvertModelRequest):
 async def tripo3d_get_task_status(request: TaskIdRequest):
     return await tripo_api.get_task_status(request)
 
-@mcp.tool(description=
+@tool(description=
+    """
+    等待任务完成（wait_for_task）。
+    服务端按任务进度/剩余时间自适应轮询，直至任务进入终态后一次性返回，无需反复调用get_task_status。
+    同一任务的并发等待会合并为一个轮询，并通过MCP进度通知推送进度。配置了任务回调接收端（TRIPO_CALLBACK_PORT）时由回调唤醒，仅对迟迟收不到回调的任务稀疏轮询。
+    主要参数：
+        - task_id (str): 任务ID。
+        - timeout (float, 可选): 最长等待秒数，默认600，超时返回最新状态并附带timed_out=True。
+    """, quota=False
+    )
+async def tripo3d_wait_for_task(request: WaitForTaskRequest, ctx: Context):
+    async def on_progress(task_id: str, progress: float, status: str):
+        await ctx.report_progress(progress, 100, message=f"{task_id}: {status}")
+    return await waiter.wait(request.task_id, request.timeout, on_progress)
+
+@tool(description=
+    """
+    批量等待任务完成（wait_for_tasks）。
+    并发等待多个任务进入终态，按传入顺序返回每个任务的最终状态，进度通知为所有任务的平均进度。
+    主要参数：
+        - task_ids (list[str]): 任务ID列表。
+        - timeout (float, 可选): 最长等待秒数，默认600。
+    """, quota=False
+    )
+async def tripo3d_wait_for_tasks(request: WaitForTasksRequest, ctx: Context):
+    async def on_progress(task_id: str, progress: float, status: str):
+        await ctx.report_progress(progress, 100, message=f"{task_id}: {status}")
+    results = await waiter.wait_many(request.task_ids, request.timeout, on_progress)
+    return {"code": 0, "data": results}
+
+@tool(description=
+    """
+    查询本地任务台账（list_tasks）。
+    列出通过本服务创建或查询过的任务，包含请求参数、当前状态、输出及时间戳，数据来自本地SQLite台账，不访问上游API。
+    主要参数：
+        - status (str, 可选): 按状态过滤，如queued、running、success、failed。
+        - type (str, 可选): 按任务类型过滤，如text_to_model。
+        - since / until (str, 可选): 创建时间范围，ISO 8601或Unix时间戳。
+        - limit (int, 可选): 每页条数，默认50，最大500。
+        - offset (int, 可选): 偏移量，默认0。
+        - include_history (bool, 可选): 是否返回状态变化历史。
+    """
+    )
+async def tripo3d_list_tasks(request: ListTasksRequest):
+    return await tripo_api.list_tasks(request)
+
+@tool(description=
+    """
+    下载任务结果（download_result）。
+    下载任务输出的全部产物（GLB/FBX/贴图/渲染图等）到本地，大文件分段并行下载并直接流式写盘，校验文件大小。
+    产物按内容摘要缓存在本地，重复下载同一任务无需联网；签名URL过期时自动重新查询任务获取新链接。
+    主要参数：
+        - task_id (str): 任务ID。
+        - output_dir (str, 可选): 保存目录。
+        - keys (list[str], 可选): 只下载指定产物。
+    返回每个产物的本地路径、大小、摘要及是否命中缓存。
+    """
+    )
+async def tripo3d_download_result(request: DownloadResultRequest):
+    return await downloader.download_result(request.task_id, request.output_dir, request.keys)
+
+@tool(description=
+    """
+    统计模型几何信息（mesh_stats）。
+    在本地解析GLB，返回面数、顶点数、世界坐标包围盒、材质数、各贴图的格式/字节数/宽高及使用的扩展，不访问上游API（需安装NumPy）。
+    主要参数：
+        - file_path (str, 可选): 本地GLB路径，与task_id二选一。
+        - task_id (str, 可选): 已成功的任务ID，先下载（命中本地缓存时不联网）其GLB产物。
+        - key (str, 可选): 使用的产物，默认按pbr_model、model、base_model顺序取第一个GLB。
+        - output_dir (str, 可选): 按任务ID处理时的下载目录。
+    """
+    )
+async def tripo3d_mesh_stats(request: MeshStatsRequest):
+    return await mesh.model_stats(request)
+
+@tool(description=
+    """
+    本地生成LOD链（generate_lods）。
+    在本地用顶点聚类简化GLB，按面数比例或面数上限生成多级LOD（<模型名>_lod1.glb、_lod2.glb…），保留材质、贴图、骨骼与动画。
+    只需降低面数时优先使用本工具，无需调用convert_model消耗额度；四边面重拓扑、格式转换等仍需convert_model（需安装NumPy）。
+    主要参数：
+        - file_path / task_id / key (可选): 源模型，同mesh_stats。
+        - ratios (list[float], 可选): 各级面数比例，默认取TRIPO_LOD_RATIOS（0.5,0.25,0.1）。
+        - face_limits (list[int], 可选): 各级面数上限。
+        - output_dir (str, 可选): LOD保存目录，默认与源模型同目录。
+    返回源模型与每级LOD的路径、面数、顶点数、字节数及耗时。
+    """
+    )
+async def tripo3d_generate_lods(request: GenerateLodsRequest):
+    return await mesh.generate_lods(request)
+
+@tool(description=
     """
-    上传图片，返回image_token（upload_image）。
+    上传图片，返回image_token（upload_image）。图片类型按文件头自动识别，返回结果附带upload_stats吞吐统计。
     主要参数：
-        - file_path (str): 本地图片路径。
+        - file_path (str): 本地图片路径。上传前在本地校验格式、尺寸与20MB大小限制。
+        - preprocess (bool, 可选): 是否在本地预处理图片：缩放到最长边上限、去除元数据、转码为webp/jpeg、可选裁剪主体（需安装Pillow），默认取TRIPO_PREPROCESS。启用时返回结果附带preprocess统计（节省字节数与估算节省的上传时间）。
     详见Tripo3D官方文档。
     """
     )
 async def tripo3d_upload_image(request: UploadImageRequest):
     return await tripo_api.upload_image(request)
 
-@mcp.tool(description=
+@tool(description=
+    """
+    查询任务状态缓存统计（get_cache_stats）。
+    无需参数。
+    返回任务状态缓存与上传去重缓存的命中(hits)、未命中(misses)、合并请求(coalesced)次数及缓存占用，用于核对上游请求量。
+    """
+    )
+async def tripo3d_get_cache_stats():
+    return tripo_api.get_cache_stats()
+
+@tool(description=
+    """
+    查询限速与并发统计（get_rate_limit_stats）。
+    无需参数。
+    返回创建任务/轮询/上传/账户各类请求的限速配置、排队数、在途数、重试与429次数，以及运行中任务数与并发上限。
+    """
+    )
+async def tripo3d_get_rate_limit_stats():
+    return tripo_api.get_rate_limit_stats()
+
+@tool(description=
+    """
+    查询服务运行指标（server_stats）。
+    无需参数。
+    返回每个工具与每类上游请求的调用次数、平均/p50/p90/p99延迟、按返回码统计的错误数、上传/下载字节数、
+    各队列深度，以及缓存、限速、多key账户池与各客户端会话的并发配额统计。设置TRIPO_METRICS_PORT后同样的指标以OpenMetrics格式在/metrics提供。
+    """
+    )
+async def tripo3d_server_stats():
+    endpoint = f"http://{metrics.METRICS_HOST}:{metrics.METRICS_PORT}/metrics" \
+        if metrics.METRICS_PORT and metrics.registry.enabled else None
+    return {"code": 0, "data": {
+        "metrics": metrics.registry.snapshot(),
+        "metrics_endpoint": endpoint,
+        "cache": tripo_api.get_cache_stats()["data"],
+        "rate_limit": tripo_api.get_rate_limit_stats()["data"],
+        "accounts": tripo_api.get_account_stats()["data"],
+        "callbacks": callbacks.receiver.stats(),
+        "mesh": mesh.meshes.stats(),
+        "clients": quotas.clients.stats(),
+    }}
+
+@tool(description=
     """
     查询API余额（get_balance）。
     无需参数。
-    返回余额和冻结金额。
+    返回余额和冻结金额。配置了多个API key（TRIPO_API_KEYS）时返回合计余额，并在keys中列出每个key（指纹）的余额与运行中任务数。
     详见Tripo3D官方文档。
     """
     )
 async def tripo3d_get_balance():
     return await tripo_api.get_balance()
 
+# 首次启动或源码变化后写回 schema 缓存，命中时为空操作
+schema_cache.cache.save()
+STARTUP_PHASES["tools"] = time.perf_counter() - _STARTED - STARTUP_PHASES["imports"]
+
+def profile_startup() -> None:
+    """输出启动耗时分解：顶层模块导入耗时（python -X importtime）与本进程各启动阶段耗时。"""
+    import subprocess
+
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=src_dir, capture_output=True, text=True)
+    # importtime 先输出子模块再输出父模块，名称前的缩进表示嵌套层级；只统计 main 直接导入的模块
+    imports, children, total = [], [], 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            if name.strip() == "main":
+                imports, total = children, int(cumulative)
+            children = []
+    print(f"Import time of main: {total / 1000:.1f} ms (top direct imports, cumulative):")
+    for micros, name in sorted(imports, reverse=True)[:15]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    async def first_list() -> float:
+        started = time.perf_counter()
+        await mcp.list_tools()
+        return time.perf_counter() - started
+
+    phases = dict(STARTUP_PHASES)
+    phases["list_tools"] = asyncio.run(first_list())
+    started = time.perf_counter()
+    tripo_api.get_client()
+    phases["http_client (background)"] = time.perf_counter() - started
+    print("Startup phases (this process):")
+    for name, seconds in phases.items():
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+    stats = schema_cache.cache.stats()
+    print(f"Tool schema cache: {stats['hits']} hits, {stats['misses']} misses ({stats['path']})")
+
+def _require_token(app, token: str):
+    """ASGI 中间件：HTTP 请求须携带 Authorization: Bearer <token>，否则返回 401；lifespan 事件直接放行。"""
+    expected = f"Bearer {token}".encode("utf-8")
+
+    async def guarded(scope, receive, send):
+        if scope["type"] == "http":
+            provided = dict(scope.get("headers") or []).get(b"authorization", b"")
+            if not hmac.compare_digest(provided, expected):
+                await send({"type": "http.response.start", "status": 401, "headers": [
+                    (b"content-type", b"application/json"), (b"www-authenticate", b"Bearer"),
+                ]})
+                await send({"type": "http.response.body", "body": b'{"code": 1002, "msg": "Invalid or missing bearer token"}'})
+                return
+        await app(scope, receive, send)
+
+    return guarded
+
+async def serve_http(transport: str, host: str, port: int, path: str, token: str = MCP_TOKEN) -> None:
+    """以 streamable-http 或 sse 传输运行：多个客户端共享一个进程的连接池、任务缓存、限速器与回调接收端。
+
+    工具会消耗积分并写入本地文件，监听非回环地址时必须设置 TRIPO_MCP_TOKEN，否则拒绝启动。
+    """
+    import uvicorn
+
+    global _shared_resources
+    if not callbacks.is_loopback(host):
+        if not token:
+            raise SystemExit(f"Refusing to listen on {host} without TRIPO_MCP_TOKEN: "
+                             f"set a bearer token or bind to 127.0.0.1")
+        # FastMCP 默认只允许本机 Host 头访问（防 DNS rebinding），监听其它地址时改由 token 鉴权
+        mcp.settings.transport_security = None
+    mcp.settings.host = host
+    mcp.settings.port = port
+    mcp.settings.streamable_http_path = path
+    app = mcp.streamable_http_app() if transport == "streamable-http" else mcp.sse_app()
+    if token:
+        app = _require_token(app, token)
+    async with resources():
+        # 多个客户端共享进程时才按会话限制并发工具调用数
+        _shared_resources = quotas.clients.enabled = True
+        try:
+            config = uvicorn.Config(app, host=host, port=port, log_level=mcp.settings.log_level.lower())
+            await uvicorn.Server(config).serve()
+        finally:
+            _shared_resources = quotas.clients.enabled = False
+
 def main():
-    print("MCP server starting...")
-    mcp.run()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tripo3D MCP Server")
+    parser.add_argument("--transport", choices=TRANSPORTS, default=os.getenv("TRIPO_MCP_TRANSPORT", "stdio"),
+                        help="stdio 为每个客户端一个进程；streamable-http/sse 为多个客户端共享一个常驻进程")
+    parser.add_argument("--host", default=MCP_HOST)
+    parser.add_argument("--port", type=int, default=MCP_PORT)
+    parser.add_argument("--path", default=MCP_PATH, help="streamable-http 的端点路径")
+    parser.add_argument("--profile-startup", action="store_true", help="输出启动耗时分解后退出")
+    args = parser.parse_args()
+    if args.profile_startup:
+        profile_startup()
+        return
+    if args.transport == "stdio":
+        print("MCP server starting...")
+        mcp.run()
+        return
+    print(f"MCP server starting ({args.transport}) on http://{args.host}:{args.port}"
+          f"{args.path if args.transport == 'streamable-http' else mcp.settings.sse_path}", file=sys.stderr)
+    asyncio.run(serve_http(args.transport, args.host, args.port, args.path))
 if __name__ == "__main__":
     main()
\ No newline at end of file
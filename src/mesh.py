@@ -0,0 +1,620 @@
+import os
+import copy
+import json
+import time
+import struct
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
+from models import MeshStatsRequest, GenerateLodsRequest
+import uploader
+import downloader
+import metrics
+
+# NumPy 为可选依赖，首次使用网格工具时才导入，不影响冷启动耗时；未安装时工具直接返回错误提示
+np = None
+
+def _load_numpy() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+MESH_WORKERS = int(os.getenv("TRIPO_MESH_WORKERS", str(min(2, os.cpu_count() or 1))))
+LOD_RATIOS = [float(ratio) for ratio in os.getenv("TRIPO_LOD_RATIOS", "0.5,0.25,0.1").split(",") if ratio.strip()]
+
+# 按任务ID处理时优先使用的产物
+MODEL_KEYS = ("pbr_model", "model", "base_model")
+
+GLB_MAGIC = b"glTF"
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+TRIANGLES = 4
+# accessor.componentType -> NumPy dtype
+COMPONENT_DTYPES = {5120: "i1", 5121: "u1", 5122: "<i2", 5123: "<u2", 5125: "<u4", 5126: "<f4"}
+TYPE_WIDTHS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+WIDTH_TYPES = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4"}
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+# 聚类网格沿最长轴的最大格数，保证三维格坐标能打包进 int64
+MAX_CELLS = 1 << 16
+# 区分 UV 接缝两侧顶点的粗网格，每个方向的格数
+UV_BINS = 8
+
+class GlbError(ValueError):
+    pass
+
+def _read_glb(file_path: str) -> Tuple[Dict[str, Any], int, int]:
+    """只读取 GLB 头与 JSON 块，返回 (gltf, BIN 块在文件中的偏移, BIN 块长度)。"""
+    with open(file_path, "rb") as f:
+        header = f.read(20)
+        if len(header) < 20 or header[:4] != GLB_MAGIC:
+            raise GlbError(f"Not a GLB file: {file_path}")
+        version, _, json_length, json_type = struct.unpack("<III I", header[4:20])
+        if version != 2 or json_type != CHUNK_JSON:
+            raise GlbError(f"Unsupported GLB version or layout: {file_path}")
+        gltf = json.loads(f.read(json_length))
+        bin_offset, bin_length = 0, 0
+        chunk = f.read(8)
+        if len(chunk) == 8:
+            length, chunk_type = struct.unpack("<II", chunk)
+            if chunk_type == CHUNK_BIN:
+                bin_offset, bin_length = 20 + json_length + 8, length
+    return gltf, bin_offset, bin_length
+
+def _map_bin(file_path: str, bin_offset: int, bin_length: int):
+    # 按需映射 BIN 块，只有访问到的缓冲视图会被读入内存
+    if not bin_length:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(file_path, dtype=np.uint8, mode="r", offset=bin_offset, shape=(bin_length,))
+
+def _accessor(gltf: Dict[str, Any], buf, index: int):
+    accessor = gltf["accessors"][index]
+    if "sparse" in accessor:
+        raise GlbError("Sparse accessors are not supported")
+    dtype = np.dtype(COMPONENT_DTYPES[accessor["componentType"]])
+    width = TYPE_WIDTHS[accessor["type"]]
+    count = accessor["count"]
+    if "bufferView" not in accessor:
+        return np.zeros((count, width), dtype=dtype)
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    if view.get("buffer", 0) != 0:
+        raise GlbError("External buffers are not supported")
+    offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride") or dtype.itemsize * width
+    return np.ndarray((count, width), dtype=dtype, buffer=buf, offset=offset, strides=(stride, dtype.itemsize))
+
+def _node_matrix(node: Dict[str, Any]):
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T
+    tx, ty, tz = node.get("translation", (0, 0, 0))
+    x, y, z, w = node.get("rotation", (0, 0, 0, 1))
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get("scale", (1, 1, 1)), dtype=np.float64)
+    matrix[:3, 3] = (tx, ty, tz)
+    return matrix
+
+def _mesh_instances(gltf: Dict[str, Any]) -> List[Tuple[int, Any]]:
+    """遍历默认场景的节点树，返回 (mesh 索引, 世界矩阵) 列表；没有场景时每个 mesh 按单位矩阵计一次。"""
+    nodes = gltf.get("nodes", [])
+    scenes = gltf.get("scenes", [])
+    if not scenes:
+        return [(index, np.eye(4)) for index in range(len(gltf.get("meshes", [])))]
+    instances = []
+    stack = [(root, np.eye(4)) for root in scenes[gltf.get("scene", 0)].get("nodes", [])]
+    while stack:
+        index, parent = stack.pop()
+        node = nodes[index]
+        world = parent @ _node_matrix(node)
+        if "mesh" in node:
+            instances.append((node["mesh"], world))
+        stack.extend((child, world) for child in node.get("children", []))
+    return instances
+
+def _primitive_faces(gltf: Dict[str, Any], primitive: Dict[str, Any]) -> int:
+    accessors = gltf["accessors"]
+    count = accessors[primitive["indices"]]["count"] if "indices" in primitive \
+        else accessors[primitive["attributes"]["POSITION"]]["count"]
+    mode = primitive.get("mode", TRIANGLES)
+    if mode == TRIANGLES:
+        return count // 3
+    # 三角带与三角扇
+    return max(count - 2, 0) if mode in (5, 6) else 0
+
+def _position_bounds(gltf: Dict[str, Any], buf, index: int):
+    accessor = gltf["accessors"][index]
+    if "min" in accessor and "max" in accessor:
+        return np.array(accessor["min"][:3], dtype=np.float64), np.array(accessor["max"][:3], dtype=np.float64)
+    positions = _accessor(gltf, buf, index)
+    return positions.min(axis=0).astype(np.float64), positions.max(axis=0).astype(np.float64)
+
+def _texture_stats(file_path: str, gltf: Dict[str, Any], bin_offset: int) -> List[Dict[str, Any]]:
+    textures = []
+    with open(file_path, "rb") as f:
+        for index, image in enumerate(gltf.get("images", [])):
+            entry: Dict[str, Any] = {"index": index, "mime_type": image.get("mimeType"), "bytes": None,
+                                     "width": None, "height": None}
+            if "bufferView" in image:
+                view = gltf["bufferViews"][image["bufferView"]]
+                entry["bytes"] = view["byteLength"]
+                # 图片宽高在文件头中，只读取开头部分
+                f.seek(bin_offset + view.get("byteOffset", 0))
+                size = uploader.image_size_bytes(f.read(min(view["byteLength"], 64 * 1024)))
+                if size is not None:
+                    entry["width"], entry["height"] = size
+            elif "uri" in image:
+                entry["uri"] = image["uri"] if not image["uri"].startswith("data:") else "data:"
+            textures.append(entry)
+    return textures
+
+def glb_stats(file_path: str) -> Dict[str, Any]:
+    """统计 GLB 的面数、顶点数、包围盒与贴图尺寸；只解析 JSON 与访问到的缓冲视图，不解码整个场景。"""
+    _load_numpy()
+    gltf, bin_offset, bin_length = _read_glb(file_path)
+    buf = _map_bin(file_path, bin_offset, bin_length)
+    meshes = gltf.get("meshes", [])
+    accessors = gltf.get("accessors", [])
+    instances = _mesh_instances(gltf)
+    faces = vertices = primitives = 0
+    corners = []
+    unit_cube = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+    for mesh_index, world in instances:
+        for primitive in meshes[mesh_index].get("primitives", []):
+            primitives += 1
+            faces += _primitive_faces(gltf, primitive)
+            position = primitive.get("attributes", {}).get("POSITION")
+            if position is None:
+                continue
+            vertices += accessors[position]["count"]
+            low, high = _position_bounds(gltf, buf, position)
+            # 局部包围盒的 8 个角点变换到世界坐标
+            local = low + unit_cube * (high - low)
+            corners.append(local @ world[:3, :3].T + world[:3, 3])
+    bounds = None
+    if corners:
+        points = np.concatenate(corners)
+        low, high = points.min(axis=0), points.max(axis=0)
+        bounds = {"min": low.round(6).tolist(), "max": high.round(6).tolist(), "size": (high - low).round(6).tolist()}
+    textures = _texture_stats(file_path, gltf, bin_offset)
+    return {
+        "file": file_path,
+        "bytes": os.path.getsize(file_path),
+        "generator": gltf.get("asset", {}).get("generator"),
+        "meshes": len(meshes),
+        "instances": len(instances),
+        "primitives": primitives,
+        "faces": faces,
+        "vertices": vertices,
+        "bounds": bounds,
+        "materials": len(gltf.get("materials", [])),
+        "textures": textures,
+        "texture_bytes": sum(t["bytes"] or 0 for t in textures),
+        "animations": len(gltf.get("animations", [])),
+        "skins": len(gltf.get("skins", [])),
+        "extensions": gltf.get("extensionsUsed", []),
+    }
+
+def _cell_ids(points, cells: int):
+    """把顶点按沿最长轴 cells 格的均匀网格分组，返回每个顶点所在格的紧凑编号。"""
+    low = points.min(axis=0)
+    extent = float((points.max(axis=0) - low).max()) or 1.0
+    q = np.minimum(((points - low) * (cells / extent)).astype(np.int64), cells)
+    span = cells + 1
+    _, ids = np.unique((q[:, 0] * span + q[:, 1]) * span + q[:, 2], return_inverse=True)
+    return ids.reshape(-1)
+
+def _kept_triangles(triangles, cell_ids):
+    # 三个顶点落在不同格中的三角形才会保留
+    a, b, c = cell_ids[triangles[:, 0]], cell_ids[triangles[:, 1]], cell_ids[triangles[:, 2]]
+    return (a != b) & (b != c) & (a != c)
+
+def _triangle_keys(triangles):
+    # 三角形的顶点编号排序后打包成一个整数（顶点相同、顺序不同的三角形得到同一个键），比按行 unique 快一个数量级
+    ordered = np.sort(triangles, axis=1)
+    span = int(ordered.max()) + 1 if len(ordered) else 1
+    if span < 1 << 21:
+        return (ordered[:, 0] * span + ordered[:, 1]) * span + ordered[:, 2]
+    return np.unique(ordered, axis=0, return_inverse=True)[1].reshape(-1)
+
+def _unique_triangles(triangles):
+    # 去掉重复三角形，保留首次出现的朝向
+    _, first = np.unique(_triangle_keys(triangles), return_index=True)
+    return triangles[np.sort(first)]
+
+def _charts(triangles, count: int):
+    """按索引连通性给顶点标记所属 UV 岛：贴图接缝两侧在索引中本就是不同顶点，连通分量即 UV 岛。
+    并行连通分量算法：每轮把三角形三个顶点的根挂到最小编号上，再做指针跳跃压缩，直到标号不变。"""
+    labels = np.arange(count)
+    columns = triangles.T
+    while True:
+        low = np.minimum(np.minimum(labels[columns[0]], labels[columns[1]]), labels[columns[2]])
+        merged = labels.copy()
+        for column in columns:
+            np.minimum.at(merged, labels[column], low)
+        while True:
+            jumped = merged[merged]
+            if np.array_equal(jumped, merged):
+                break
+            merged = jumped
+        if np.array_equal(merged, labels):
+            return labels
+        labels = merged
+
+def _cluster_faces(points, triangles, cells: int) -> int:
+    ids = _cell_ids(points, cells)
+    kept = ids[triangles[_kept_triangles(triangles, ids)]]
+    return len(np.unique(_triangle_keys(kept))) if len(kept) else 0
+
+def _choose_cells(points, triangles, target: int) -> int:
+    """搜索使聚类后面数不超过 target 的最大网格分辨率；面数近似随格数平方增长，先按此估算再二分。"""
+    counted: Dict[int, int] = {}
+
+    def faces(cells: int) -> int:
+        if cells not in counted:
+            counted[cells] = _cluster_faces(points, triangles, cells)
+        return counted[cells]
+
+    estimate = int(64 * (target / max(faces(64), 1)) ** 0.5)
+    low, high = 1, min(max(estimate, 2), MAX_CELLS)
+    while faces(high) <= target:
+        if high == MAX_CELLS:
+            return high
+        low, high = high, min(high * 2, MAX_CELLS)
+    while high - low > max(1, low // 50):
+        middle = (low + high) // 2
+        if faces(middle) <= target:
+            low = middle
+        else:
+            high = middle
+    return low if faces(low) > 0 else high
+
+def _decimate(gltf: Dict[str, Any], buf, primitive: Dict[str, Any], target: int) -> Optional[Dict[str, Any]]:
+    """顶点聚类简化：位置取所在格内顶点的均值（同一格只有一个位置，不产生裂缝），其余属性在 (格, UV岛) 内取均值，
+    不跨越贴图接缝合并顶点。返回新的属性数组与索引，无法处理的图元返回 None。"""
+    if primitive.get("mode", TRIANGLES) != TRIANGLES or "extensions" in primitive:
+        return None
+    attributes = {name: _accessor(gltf, buf, index) for name, index in primitive.get("attributes", {}).items()}
+    if "POSITION" not in attributes or attributes["POSITION"].dtype != np.float32:
+        return None
+    points = attributes["POSITION"].astype(np.float64)
+    if "indices" in primitive:
+        triangles = _accessor(gltf, buf, primitive["indices"]).reshape(-1).astype(np.int64)
+    else:
+        triangles = np.arange(len(points), dtype=np.int64)
+    triangles = triangles[:len(triangles) // 3 * 3].reshape(-1, 3)
+    if len(triangles) <= target:
+        return None
+    charts = None
+    if "TEXCOORD_0" in attributes:
+        # 先按 (位置, UV) 焊接完全相同的顶点，未建索引的三角形汤也能求出 UV 岛
+        _, welded = np.unique(np.column_stack([points, attributes["TEXCOORD_0"]]), axis=0, return_inverse=True)
+        welded = welded.reshape(-1)
+        charts = _charts(welded[triangles], int(welded.max()) + 1)[welded]
+        # 同一 UV 岛绕回自身（如圆柱展开）时接缝两侧仍连通，再按粗 UV 网格区分，UV 相距很远的顶点不会合并
+        bins = np.clip(np.floor(attributes["TEXCOORD_0"].astype(np.float64) * UV_BINS), -UV_BINS, 2 * UV_BINS - 1)
+        bins = (bins[:, 0] + UV_BINS) * 3 * UV_BINS + bins[:, 1] + UV_BINS
+        charts = charts * 9 * UV_BINS * UV_BINS + bins.astype(np.int64)
+    cells = _choose_cells(points, triangles, target)
+    while True:
+        cell_ids = _cell_ids(points, cells)
+        if charts is None:
+            vertex_ids = cell_ids
+        else:
+            _, vertex_ids = np.unique(cell_ids * (int(charts.max()) + 1) + charts, return_inverse=True)
+            vertex_ids = vertex_ids.reshape(-1)
+        new_triangles = _unique_triangles(vertex_ids[triangles[_kept_triangles(triangles, cell_ids)]])
+        # 接缝处同一组格中可能多保留几个三角形，超出目标时略微降低网格分辨率
+        if len(new_triangles) <= target or cells <= 2:
+            break
+        cells = max(int(cells * 0.95), 2)
+    used, new_triangles = np.unique(new_triangles, return_inverse=True)
+    new_triangles = new_triangles.reshape(-1, 3)
+
+    clusters = int(vertex_ids.max()) + 1
+    counts = np.bincount(vertex_ids, minlength=clusters).astype(np.float64)
+    cell_counts = np.bincount(cell_ids).astype(np.float64)
+    cell_of_cluster = np.zeros(clusters, dtype=np.int64)
+    cell_of_cluster[vertex_ids] = cell_ids
+    # 每个聚类中第一个顶点的下标，整数属性与蒙皮属性取该顶点的值
+    first = np.zeros(clusters, dtype=np.int64)
+    first[vertex_ids[::-1]] = np.arange(len(vertex_ids) - 1, -1, -1)
+
+    def mean(values, ids, totals):
+        return np.column_stack([np.bincount(ids, weights=values[:, i], minlength=len(totals)) / totals
+                                for i in range(values.shape[1])])
+
+    result: Dict[str, Any] = {}
+    for name, values in attributes.items():
+        if name == "POSITION":
+            merged = mean(points, cell_ids, cell_counts)[cell_of_cluster]
+        elif name.startswith(("JOINTS_", "WEIGHTS_")):
+            # 骨骼权重与骨骼索引逐项对应，单独平均权重会与索引错位，成对取同一个代表顶点的值
+            merged = values[first]
+        elif values.dtype.kind == "f":
+            merged = mean(values.astype(np.float64), vertex_ids, counts)
+            if name in ("NORMAL", "TANGENT"):
+                length = np.linalg.norm(merged[:, :3], axis=1, keepdims=True)
+                merged[:, :3] /= np.where(length > 0, length, 1)
+                if name == "TANGENT":
+                    merged[:, 3] = values[first, 3]
+        else:
+            merged = values[first]
+        result[name] = np.ascontiguousarray(merged[used].astype(values.dtype))
+    return {"attributes": result, "indices": new_triangles}
+
+class _GlbWriter:
+    """重建 GLB：简化后的图元写入新的访问器，其余访问器、缓冲视图（贴图、动画、蒙皮）按原样复制。"""
+
+    def __init__(self, gltf: Dict[str, Any], buf):
+        self.source = gltf
+        self.buf = buf
+        self.bin = bytearray()
+        self.views: List[Dict[str, Any]] = []
+        self.accessors: List[Dict[str, Any]] = []
+        self._copied_views: Dict[int, int] = {}
+        self._copied_accessors: Dict[int, int] = {}
+
+    def _append(self, data: bytes) -> int:
+        self.bin.extend(b"\0" * (-len(self.bin) % 4))
+        offset = len(self.bin)
+        self.bin.extend(data)
+        return offset
+
+    def copy_view(self, index: int) -> int:
+        if index not in self._copied_views:
+            view = dict(self.source["bufferViews"][index])
+            start = view.get("byteOffset", 0)
+            view["byteOffset"] = self._append(bytes(self.buf[start:start + view["byteLength"]]))
+            view["buffer"] = 0
+            self.views.append(view)
+            self._copied_views[index] = len(self.views) - 1
+        return self._copied_views[index]
+
+    def copy_accessor(self, index: int) -> int:
+        if index not in self._copied_accessors:
+            accessor = copy.deepcopy(self.source["accessors"][index])
+            if "bufferView" in accessor:
+                accessor["bufferView"] = self.copy_view(accessor["bufferView"])
+            for part in ("indices", "values"):
+                if part in accessor.get("sparse", {}):
+                    accessor["sparse"][part]["bufferView"] = self.copy_view(accessor["sparse"][part]["bufferView"])
+            self.accessors.append(accessor)
+            self._copied_accessors[index] = len(self.accessors) - 1
+        return self._copied_accessors[index]
+
+    def add_accessor(self, values, target: int, template: Optional[Dict[str, Any]] = None) -> int:
+        values = np.ascontiguousarray(values)
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+        component = {np.dtype(dtype): code for code, dtype in COMPONENT_DTYPES.items()}[values.dtype]
+        self.views.append({"buffer": 0, "byteOffset": self._append(values.tobytes()),
+                           "byteLength": values.nbytes, "target": target})
+        accessor = {"bufferView": len(self.views) - 1, "componentType": component, "count": len(values),
+                    "type": WIDTH_TYPES[values.shape[1]]}
+        if template is not None and template.get("normalized"):
+            accessor["normalized"] = True
+        if target == ARRAY_BUFFER and template is not None and "min" in template:
+            accessor["min"] = values.min(axis=0).tolist()
+            accessor["max"] = values.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+    def add_indices(self, triangles, vertex_count: int) -> int:
+        dtype = np.uint16 if vertex_count < 65536 else np.uint32
+        return self.add_accessor(triangles.reshape(-1).astype(dtype), ELEMENT_ARRAY_BUFFER)
+
+    def build(self, meshes: List[Dict[str, Any]]) -> bytes:
+        gltf = {key: copy.deepcopy(value) for key, value in self.source.items()
+                if key not in ("buffers", "bufferViews", "accessors", "meshes")}
+        gltf["meshes"] = meshes
+        for image in gltf.get("images", []):
+            if "bufferView" in image:
+                image["bufferView"] = self.copy_view(image["bufferView"])
+        for skin in gltf.get("skins", []):
+            if "inverseBindMatrices" in skin:
+                skin["inverseBindMatrices"] = self.copy_accessor(skin["inverseBindMatrices"])
+        for animation in gltf.get("animations", []):
+            for sampler in animation.get("samplers", []):
+                sampler["input"] = self.copy_accessor(sampler["input"])
+                sampler["output"] = self.copy_accessor(sampler["output"])
+        gltf["accessors"] = self.accessors
+        gltf["bufferViews"] = self.views
+        gltf["buffers"] = [{"byteLength": len(self.bin)}] if self.bin else []
+        if not self.views:
+            gltf.pop("bufferViews")
+        payload = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+        payload += b" " * (-len(payload) % 4)
+        self.bin.extend(b"\0" * (-len(self.bin) % 4))
+        total = 12 + 8 + len(payload) + (8 + len(self.bin) if self.bin else 0)
+        chunks = [GLB_MAGIC, struct.pack("<II", 2, total), struct.pack("<II", len(payload), CHUNK_JSON), payload]
+        if self.bin:
+            chunks += [struct.pack("<II", len(self.bin), CHUNK_BIN), bytes(self.bin)]
+        return b"".join(chunks)
+
+def _write_lod(gltf: Dict[str, Any], buf, targets: Dict[Tuple[int, int], int], output_path: str) -> Dict[str, Any]:
+    writer = _GlbWriter(gltf, buf)
+    meshes, faces, vertices, skipped = [], 0, 0, 0
+    for mesh_index, mesh in enumerate(gltf.get("meshes", [])):
+        source_primitives = mesh.get("primitives", [])
+        mesh = copy.deepcopy(mesh)
+        for primitive_index, primitive in enumerate(mesh.get("primitives", [])):
+            source = source_primitives[primitive_index]
+            simplified = _decimate(gltf, buf, source, targets[(mesh_index, primitive_index)])
+            if simplified is None:
+                # 不需要或无法简化的图元（未达目标面数、非三角形、Draco 压缩等）原样保留
+                skipped += 1
+                primitive["attributes"] = {name: writer.copy_accessor(index)
+                                           for name, index in primitive.get("attributes", {}).items()}
+                if "indices" in primitive:
+                    primitive["indices"] = writer.copy_accessor(primitive["indices"])
+                if "targets" in primitive:
+                    primitive["targets"] = [{name: writer.copy_accessor(index) for name, index in target.items()}
+                                            for target in primitive["targets"]]
+                draco = primitive.get("extensions", {}).get("KHR_draco_mesh_compression")
+                if draco is not None:
+                    draco["bufferView"] = writer.copy_view(draco["bufferView"])
+                faces += _primitive_faces(gltf, source)
+                vertices += gltf["accessors"][source["attributes"]["POSITION"]]["count"]
+                continue
+            attributes = simplified["attributes"]
+            primitive["attributes"] = {
+                name: writer.add_accessor(values, ARRAY_BUFFER, gltf["accessors"][source["attributes"][name]])
+                for name, values in attributes.items()
+            }
+            primitive["indices"] = writer.add_indices(simplified["indices"], len(attributes["POSITION"]))
+            # 简化后顶点数变化，变形目标无法对应，移除
+            primitive.pop("targets", None)
+            faces += len(simplified["indices"])
+            vertices += len(attributes["POSITION"])
+        if not any("targets" in p for p in mesh.get("primitives", [])):
+            mesh.pop("weights", None)
+        meshes.append(mesh)
+    data = writer.build(meshes)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, output_path)
+    return {"path": output_path, "faces": faces, "vertices": vertices, "bytes": len(data), "unchanged_primitives": skipped}
+
+def build_lods(file_path: str, levels: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """在子进程中执行：读取一次源模型，按各级目标面数（ratio 或 face_limit）依次生成 LOD 文件。"""
+    _load_numpy()
+    gltf, bin_offset, bin_length = _read_glb(file_path)
+    if "EXT_meshopt_compression" in gltf.get("extensionsRequired", []):
+        raise GlbError("Meshopt-compressed GLB is not supported")
+    buf = _map_bin(file_path, bin_offset, bin_length)
+    results = []
+    for level in levels:
+        started = time.perf_counter()
+        targets = {}
+        for mesh_index, mesh in enumerate(gltf.get("meshes", [])):
+            for primitive_index, primitive in enumerate(mesh.get("primitives", [])):
+                source_faces = _primitive_faces(gltf, primitive)
+                if level.get("face_limit"):
+                    total = sum(_primitive_faces(gltf, p) for m in gltf["meshes"] for p in m.get("primitives", []))
+                    target = int(source_faces * level["face_limit"] / max(total, 1))
+                else:
+                    target = int(source_faces * level["ratio"])
+                targets[(mesh_index, primitive_index)] = max(target, 1)
+        result = _write_lod(gltf, buf, targets, level["path"])
+        result.update({key: level[key] for key in ("ratio", "face_limit") if level.get(key)})
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        results.append(result)
+    return results
+
+class MeshProcessor:
+    """下载结果的本地几何后处理：统计在线程中执行，LOD 生成在进程池中执行，不阻塞事件循环。"""
+
+    def __init__(self, workers: int = MESH_WORKERS):
+        self.workers = max(workers, 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.inspected = 0
+        self.lods_generated = 0
+        self.faces_removed = 0
+
+    @property
+    def available(self) -> bool:
+        return _load_numpy()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def inspect(self, file_path: str) -> Dict[str, Any]:
+        self.inspected += 1
+        return await asyncio.to_thread(glb_stats, file_path)
+
+    async def lods(self, file_path: str, levels: List[Dict[str, Any]], source_faces: int) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self._get_pool(), build_lods, file_path, levels)
+        self.lods_generated += len(results)
+        self.faces_removed += sum(max(source_faces - r["faces"], 0) for r in results)
+        return results
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "numpy": np is not None,
+            "workers": self.workers,
+            "inspected": self.inspected,
+            "lods_generated": self.lods_generated,
+            "faces_removed": self.faces_removed,
+        }
+
+meshes = MeshProcessor()
+
+metrics.registry.register(
+    "tripo_mesh_lods_generated", "counter", "LOD files generated by local mesh decimation.",
+    lambda: {(): meshes.lods_generated},
+)
+
+async def _resolve_model(file_path: Optional[str], task_id: Optional[str], key: Optional[str],
+                         output_dir: Optional[str]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """返回本地 GLB 路径；给出任务ID时先下载（已下载过的产物直接从本地缓存取）。"""
+    if bool(file_path) == bool(task_id):
+        return None, {"code": 2003, "msg": "Exactly one of file_path, task_id must be provided."}
+    if file_path:
+        if not os.path.isfile(file_path):
+            return None, {"code": 2002, "msg": f"File not found: {file_path}"}
+        return file_path, None
+    result = await downloader.download_result(task_id, output_dir, [key] if key else None)
+    files = {f["key"]: f for f in (result.get("data") or {}).get("files", []) if "path" in f}
+    for candidate in ([key] if key else MODEL_KEYS):
+        entry = files.get(candidate)
+        if entry is not None and entry["path"].lower().endswith(".glb"):
+            return entry["path"], None
+    if result.get("code", 0) != 0:
+        return None, result
+    return None, {"code": 2002, "msg": f"Task {task_id} has no GLB model output."}
+
+def _unavailable() -> Dict[str, Any]:
+    return {"code": 2002, "msg": "Local mesh processing requires NumPy (pip install numpy)."}
+
+async def model_stats(data: MeshStatsRequest) -> Dict[str, Any]:
+    if not meshes.available:
+        return _unavailable()
+    path, error = await _resolve_model(data.file_path, data.task_id, data.key, data.output_dir)
+    if error:
+        return error
+    try:
+        return {"code": 0, "data": await meshes.inspect(path)}
+    except (GlbError, KeyError, IndexError, ValueError) as e:
+        return {"code": 2002, "msg": f"Invalid GLB: {str(e)}"}
+
+async def generate_lods(data: GenerateLodsRequest) -> Dict[str, Any]:
+    if not meshes.available:
+        return _unavailable()
+    if data.face_limits and any(limit <= 0 for limit in data.face_limits):
+        return {"code": 2002, "msg": "face_limits must be positive."}
+    ratios = data.ratios or ([] if data.face_limits else LOD_RATIOS)
+    if any(not 0 < ratio < 1 for ratio in ratios):
+        return {"code": 2002, "msg": "ratios must be between 0 and 1."}
+    path, error = await _resolve_model(data.file_path, data.task_id, data.key, data.output_dir)
+    if error:
+        return error
+    stem, _ = os.path.splitext(os.path.basename(path))
+    target_dir = data.output_dir if data.output_dir and data.file_path else os.path.dirname(path)
+    os.makedirs(target_dir, exist_ok=True)
+    targets = [{"ratio": ratio} for ratio in ratios] + [{"face_limit": limit} for limit in data.face_limits or []]
+    levels = [dict(target, path=os.path.join(target_dir, f"{stem}_lod{i}.glb")) for i, target in enumerate(targets, 1)]
+    try:
+        source = await meshes.inspect(path)
+        results = await meshes.lods(path, levels, source["faces"])
+    except (GlbError, KeyError, IndexError, ValueError) as e:
+        return {"code": 2002, "msg": f"Cannot simplify GLB: {str(e)}"}
+    return {"code": 0, "data": {"source": {"path": path, "faces": source["faces"], "vertices": source["vertices"],
+                                           "bytes": source["bytes"]}, "lods": results}}
@@ -0,0 +1,233 @@
+import os
+import time
+import asyncio
+import functools
+from bisect import bisect_left
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+METRICS_ENABLED = os.getenv("TRIPO_METRICS", "true").lower() not in ("0", "false", "no")
+METRICS_HOST = os.getenv("TRIPO_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("TRIPO_METRICS_PORT", "0"))
+
+# 覆盖从毫秒级缓存命中到长时间等待任务的延迟分布（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    """固定分桶直方图，记录次数、总和，并可按分桶线性插值估算分位数。"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                # 分桶插值的估计值不超过实际观测到的最大值
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 2) if value is not None else None
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.sum / self.count) if self.count else None,
+            "p50_ms": ms(self.quantile(0.5)),
+            "p90_ms": ms(self.quantile(0.9)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max) if self.count else None,
+        }
+
+def labels(**values: Any) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in values.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(label_set: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(label_set) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class MetricsRegistry:
+    """进程内指标：工具与上游请求的延迟直方图、按 code 统计的错误数，以及由各模块注册的计数器/队列深度回调。"""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.tool_latency: Dict[str, Histogram] = {}
+        self.tool_errors: Dict[Tuple[str, str], int] = {}
+        self.upstream_latency: Dict[str, Histogram] = {}
+        self.upstream_responses: Dict[Tuple[str, str], int] = {}
+        # 名称 -> (类型, 说明, 回调)；回调返回 {标签: 值}，仅在采集时调用，不占热路径
+        self._collectors: Dict[str, Tuple[str, str, Callable[[], Dict[Labels, float]]]] = {}
+
+    def timed(self, tool: str) -> Callable:
+        """装饰异步工具函数，记录耗时与非 0 返回码；关闭指标时原样返回函数。"""
+        def decorator(fn: Callable) -> Callable:
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                code = "exception"
+                try:
+                    result = await fn(*args, **kwargs)
+                    code = str(result.get("code", 0)) if isinstance(result, dict) else "0"
+                    return result
+                finally:
+                    self.observe_tool(tool, code, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def observe_tool(self, tool: str, code: str, seconds: float) -> None:
+        histogram = self.tool_latency.get(tool)
+        if histogram is None:
+            histogram = self.tool_latency[tool] = Histogram()
+        histogram.observe(seconds)
+        if code != "0":
+            key = (tool, code)
+            self.tool_errors[key] = self.tool_errors.get(key, 0) + 1
+
+    def observe_upstream(self, endpoint: str, status: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        histogram = self.upstream_latency.get(endpoint)
+        if histogram is None:
+            histogram = self.upstream_latency[endpoint] = Histogram()
+        histogram.observe(seconds)
+        key = (endpoint, status)
+        self.upstream_responses[key] = self.upstream_responses.get(key, 0) + 1
+
+    def register(self, name: str, kind: str, help_text: str, collect: Callable[[], Dict[Labels, float]]) -> None:
+        """注册采集时才读取的指标，kind 为 counter 或 gauge。"""
+        self._collectors[name] = (kind, help_text, collect)
+
+    def _collected(self) -> List[Tuple[str, str, str, Dict[Labels, float]]]:
+        families = []
+        for name, (kind, help_text, collect) in self._collectors.items():
+            try:
+                samples = collect()
+            except Exception:
+                continue
+            families.append((name, kind, help_text, samples))
+        return families
+
+    def render(self) -> str:
+        """按 OpenMetrics 文本格式输出全部指标。"""
+        lines: List[str] = []
+
+        def histogram_family(name: str, help_text: str, label: str, histograms: Dict[str, Histogram]) -> None:
+            lines.append(f"# TYPE {name} histogram")
+            lines.append(f"# UNIT {name} seconds")
+            lines.append(f"# HELP {name} {help_text}")
+            for key, histogram in sorted(histograms.items()):
+                label_set = labels(**{label: key})
+                cumulative = 0
+                for bound, n in zip(histogram.buckets, histogram.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(label_set, ('le', repr(float(bound))))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(label_set, ('le', '+Inf'))} {histogram.count}")
+                lines.append(f"{name}_count{_format_labels(label_set)} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(label_set)} {histogram.sum!r}")
+
+        def counter_family(name: str, help_text: str, samples: Dict[Labels, float]) -> None:
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"# HELP {name} {help_text}")
+            for label_set, value in sorted(samples.items()):
+                lines.append(f"{name}_total{_format_labels(label_set)} {_format_value(value)}")
+
+        histogram_family("tripo_tool_duration_seconds", "MCP tool call latency.", "tool", self.tool_latency)
+        counter_family("tripo_tool_errors", "MCP tool calls that returned a non-zero code.",
+                       {labels(tool=t, code=c): n for (t, c), n in self.tool_errors.items()})
+        histogram_family("tripo_upstream_duration_seconds", "Tripo API request latency per endpoint budget.",
+                         "endpoint", self.upstream_latency)
+        counter_family("tripo_upstream_responses", "Tripo API responses by endpoint and HTTP status.",
+                       {labels(endpoint=e, status=s): n for (e, s), n in self.upstream_responses.items()})
+        for name, kind, help_text, samples in self._collected():
+            if kind == "counter":
+                counter_family(name, help_text, samples)
+                continue
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"# HELP {name} {help_text}")
+            for label_set, value in sorted(samples.items()):
+                lines.append(f"{name}{_format_labels(label_set)} {_format_value(value)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """供 tripo3d_server_stats 使用的 JSON 摘要，延迟以毫秒分位数给出。"""
+        errors: Dict[str, Dict[str, int]] = {}
+        for (tool, code), n in self.tool_errors.items():
+            errors.setdefault(tool, {})[code] = n
+        responses: Dict[str, Dict[str, int]] = {}
+        for (endpoint, status), n in self.upstream_responses.items():
+            responses.setdefault(endpoint, {})[status] = n
+        collected = {}
+        for name, _, _, samples in self._collected():
+            collected[name] = {",".join(f"{k}={v}" for k, v in label_set) or "value": value
+                               for label_set, value in samples.items()}
+        return {
+            "enabled": self.enabled,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "tools": {tool: {**h.summary(), "errors": errors.get(tool, {})} for tool, h in sorted(self.tool_latency.items())},
+            "upstream": {endpoint: {**h.summary(), "responses": responses.get(endpoint, {})}
+                         for endpoint, h in sorted(self.upstream_latency.items())},
+            **collected,
+        }
+
+registry = MetricsRegistry()
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await reader.readline()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+        parts = request_line.split()
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] in (b"/metrics", b"/"):
+            status, content_type, body = "200 OK", CONTENT_TYPE, registry.render().encode("utf-8")
+        else:
+            status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"Not Found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("ascii") + body
+        )
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def start_http_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[asyncio.AbstractServer]:
+    """启动 OpenMetrics 抓取端点（GET /metrics）；未配置端口或指标关闭时不启动。"""
+    if not port or not registry.enabled:
+        return None
+    return await asyncio.start_server(_handle, host, port)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 
 class TextToModelRequest(BaseModel):
     prompt: str = Field(..., description="文本描述，指引3D模型生成，最大1024字符。支持多语言，不支持emoji和部分特殊字符。")
@@ -14,6 +14,7 @@ class TextToModelRequest(BaseModel):
     style: Optional[str] = Field(None, description="风格化类型，如person:person2cartoon, animal:venom, object:clay等。详见官方文档。")
     auto_size: Optional[bool] = Field(False, description="是否自动缩放到真实世界尺寸（米）。默认False。仅v2.0及以上版本有效。")
     quad: Optional[bool] = Field(False, description="是否输出四边面网格。默认False。若为True且未设置face_limit，默认10000。仅v2.0及以上版本有效。")
+    dedup: Optional[bool] = Field(True, exclude=True, description="是否启用幂等提交：种子固定的相同请求在有效期内直接返回已有任务ID。设为False强制新建任务。默认True。")
 
 class ImageToModelRequest(BaseModel):
     file_path: Optional[str] = Field(None, description="本地图片文件路径，支持webp、jpeg、png。最大20MB。与url、file_token、object互斥。")
@@ -33,9 +34,15 @@ class ImageToModelRequest(BaseModel):
     auto_size: Optional[bool] = Field(False, description="是否自动缩放到真实世界尺寸。默认False。仅v2.0及以上版本有效。")
     orientation: Optional[str] = Field("default", description="模型朝向，可选align_image/default。默认default。")
     quad: Optional[bool] = Field(False, description="是否输出四边面网格。默认False。仅v2.0及以上版本有效。")
+    dedup: Optional[bool] = Field(True, exclude=True, description="是否启用幂等提交：种子固定的相同请求在有效期内直接返回已有任务ID。设为False强制新建任务。默认True。")
+    preprocess: Optional[bool] = Field(None, exclude=True, description="上传前是否在本地预处理图片（缩放到最长边上限、去除元数据、转码为webp/jpeg、可选裁剪主体），需安装Pillow。未设置时取TRIPO_PREPROCESS。")
 
 class MultiviewToModelRequest(BaseModel):
-    files: List[Dict[str, Any]] = Field(..., description="多视图图片输入，列表顺序为[front, left, back, right]，每项为dict，需包含type和file_token。front必填。")
+    files: Optional[List[Dict[str, Any]]] = Field(None, description="多视图图片输入，列表顺序为[front, left, back, right]，每项为dict，需包含type和file_token。与front/left/back/right二选一。")
+    front: Optional[str] = Field(None, description="正视图，本地图片路径或http(s) URL。本地图片自动并发上传后提交任务。未提供files时必填。")
+    left: Optional[str] = Field(None, description="左视图，本地图片路径或http(s) URL。可选。")
+    back: Optional[str] = Field(None, description="后视图，本地图片路径或http(s) URL。可选。")
+    right: Optional[str] = Field(None, description="右视图，本地图片路径或http(s) URL。可选。")
     model_version: Optional[str] = Field("v2.5-20250123", description="模型版本，同TextToModelRequest。")
     face_limit: Optional[int] = Field(None, description="输出模型面数上限。未设置时自适应。仅v2.0及以上版本有效。")
     texture: Optional[bool] = Field(True, description="是否生成贴图。默认True。仅v2.0及以上版本有效。")
@@ -46,6 +53,8 @@ class MultiviewToModelRequest(BaseModel):
     style: Optional[str] = Field(None, description="风格化类型，详见官方文档。")
     auto_size: Optional[bool] = Field(False, description="是否自动缩放到真实世界尺寸。默认False。仅v2.0及以上版本有效。")
     quad: Optional[bool] = Field(False, description="是否输出四边面网格。默认False。仅v2.0及以上版本有效。")
+    dedup: Optional[bool] = Field(True, exclude=True, description="是否启用幂等提交：种子固定的相同请求在有效期内直接返回已有任务ID。设为False强制新建任务。默认True。")
+    preprocess: Optional[bool] = Field(None, exclude=True, description="上传前是否在本地预处理图片（缩放到最长边上限、去除元数据、转码为webp/jpeg、可选裁剪主体），需安装Pillow。未设置时取TRIPO_PREPROCESS。")
 
 class TextureModelRequest(BaseModel):
     original_model_task_id: str = Field(..., description="原始模型任务ID，需为text_to_model/image_to_model/multiview_to_model类型且成功。")
@@ -55,6 +64,7 @@ class TextureModelRequest(BaseModel):
     texture_seed: Optional[int] = Field(None, description="贴图生成随机种子。")
     texture_quality: Optional[str] = Field("standard", description="贴图质量，可选：standard, detailed。默认standard。")
     texture_alignment: Optional[str] = Field("original_image", description="贴图对齐方式，可选original_image/geometry。默认original_image。")
+    dedup: Optional[bool] = Field(True, exclude=True, description="是否启用幂等提交：种子固定的相同请求在有效期内直接返回已有任务ID。设为False强制新建任务。默认True。")
 
 class RefineModelRequest(BaseModel):
     draft_model_task_id: str = Field(..., description="草稿模型任务ID，仅支持text_to_model/image_to_model/multiview_to_model类型且成功。v2.0及以上版本不支持。")
@@ -97,7 +107,60 @@ class TaskIdRequest(BaseModel):
 
 class UploadImageRequest(BaseModel):
     file_path: str = Field(..., description="本地图片文件路径，支持webp、jpeg、png。最大20MB。")
+    preprocess: Optional[bool] = Field(None, exclude=True, description="上传前是否在本地预处理图片（缩放到最长边上限、去除元数据、转码为webp/jpeg、可选裁剪主体），需安装Pillow。未设置时取TRIPO_PREPROCESS。")
 
 class BalanceResponse(BaseModel):
     balance: float = Field(..., description="API钱包余额。")
-    frozen: float = Field(..., description="冻结余额，任务运行或交易中时非零。") 
\ No newline at end of file
+    frozen: float = Field(..., description="冻结余额，任务运行或交易中时非零。")
+
+class WaitForTaskRequest(BaseModel):
+    task_id: str = Field(..., description="任务ID。服务端轮询直至任务进入终态（success/failed/cancelled等）。")
+    timeout: Optional[float] = Field(600, description="最长等待秒数，超时返回最新状态并附带timed_out=True。默认600。")
+
+class WaitForTasksRequest(BaseModel):
+    task_ids: List[str] = Field(..., description="任务ID列表，全部进入终态或超时后按原顺序返回结果。")
+    timeout: Optional[float] = Field(600, description="最长等待秒数，超时的任务返回最新状态并附带timed_out=True。默认600。")
+
+class BatchSubmitItem(BaseModel):
+    type: str = Field(..., description="任务类型，可选text_to_model/image_to_model/multiview_to_model/texture_model/refine_model/animate_prerigcheck/animate_rig/animate_retarget/stylize_model/convert_model。")
+    params: Dict[str, Any] = Field(..., description="任务参数，与对应单任务工具的请求参数相同。")
+
+class BatchSubmitRequest(BaseModel):
+    items: List[BatchSubmitItem] = Field(..., description="待提交的任务列表，可混合不同类型。")
+    max_concurrency: Optional[int] = Field(None, description="并发提交数上限，未设置时使用服务端配置TRIPO_BATCH_CONCURRENCY。")
+
+class PipelineStep(BaseModel):
+    id: str = Field(..., description="步骤ID，在流水线内唯一。")
+    type: str = Field(..., description="任务类型，同BatchSubmitItem.type。")
+    params: Dict[str, Any] = Field(default_factory=dict, description="任务参数，与对应单任务工具相同。依赖步骤的任务ID会自动填入，无需提供。")
+    depends_on: Optional[Union[str, List[str]]] = Field(None, description="依赖的步骤ID或ID列表，全部依赖成功后才提交本步骤。use_task_id_of指定的依赖（默认第一个）的任务ID自动填入本步骤的original_model_task_id（refine_model为draft_model_task_id），params中已显式给出时不覆盖；该依赖为animate_prerigcheck时填入其检查的源模型任务ID。")
+    use_task_id_of: Optional[str] = Field(None, description="取哪个依赖步骤的任务ID填入本步骤，须在depends_on中。默认第一个依赖。")
+
+class PipelineRequest(BaseModel):
+    steps: List[PipelineStep] = Field(..., description="流水线步骤列表，按依赖关系构成DAG，无依赖关系的分支并行执行。")
+    timeout: Optional[float] = Field(3600, description="整条流水线的最长等待秒数，默认3600。")
+
+class DownloadResultRequest(BaseModel):
+    task_id: str = Field(..., description="已成功的任务ID。")
+    output_dir: Optional[str] = Field(None, description="保存目录，文件保存在output_dir/task_id/下。未设置时使用TRIPO_DOWNLOAD_DIR。")
+    keys: Optional[List[str]] = Field(None, description="只下载指定产物（如model、pbr_model、base_model、rendered_image），未设置时下载全部。")
+
+class ListTasksRequest(BaseModel):
+    status: Optional[str] = Field(None, description="按状态过滤，如queued/running/success/failed/cancelled。")
+    type: Optional[str] = Field(None, description="按任务类型过滤，如text_to_model/image_to_model/convert_model。")
+    since: Optional[str] = Field(None, description="创建时间下限（含），ISO 8601字符串或Unix时间戳。")
+    until: Optional[str] = Field(None, description="创建时间上限（不含），ISO 8601字符串或Unix时间戳。")
+    limit: Optional[int] = Field(50, description="每页条数，默认50，最大500。")
+    offset: Optional[int] = Field(0, description="分页偏移量，默认0。")
+    include_history: Optional[bool] = Field(False, description="是否返回每个任务的状态变化历史。默认False。")
+
+class MeshStatsRequest(BaseModel):
+    file_path: Optional[str] = Field(None, description="本地GLB文件路径，与task_id二选一。")
+    task_id: Optional[str] = Field(None, description="已成功的任务ID，先下载其GLB产物再统计，与file_path二选一。")
+    key: Optional[str] = Field(None, description="使用的产物，如pbr_model/model/base_model。未设置时按该顺序取第一个GLB。")
+    output_dir: Optional[str] = Field(None, description="按任务ID处理时的下载目录。未设置时使用TRIPO_DOWNLOAD_DIR。")
+
+class GenerateLodsRequest(MeshStatsRequest):
+    ratios: Optional[List[float]] = Field(None, description="各级LOD相对原模型的面数比例（0~1），如[0.5, 0.25, 0.1]。未设置且未给face_limits时使用TRIPO_LOD_RATIOS。")
+    face_limits: Optional[List[int]] = Field(None, description="各级LOD的面数上限，与ratios可同时使用，本地简化代替convert_model的face_limit。")
+    output_dir: Optional[str] = Field(None, description="LOD保存目录；按任务ID处理时同时作为下载目录，LOD与模型保存在output_dir/task_id/下。未设置时与源模型同目录。")
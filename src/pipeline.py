@@ -0,0 +1,147 @@
+import time
+import asyncio
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from models import PipelineStep, BatchSubmitItem
+from task_waiter import waiter
+import tripo_api
+import batch
+
+# 后续任务引用上游任务ID的字段名，未列出的类型均为 original_model_task_id
+TASK_ID_FIELDS = {"refine_model": "draft_model_task_id"}
+# 只做检查、不产出新模型的任务类型：下游步骤使用它所检查的源模型任务ID
+CHECK_TYPES = {"animate_prerigcheck"}
+
+ProgressCallback = Callable[[float, float, str], Awaitable[None]]
+
+def parents(step: PipelineStep) -> List[str]:
+    if step.depends_on is None:
+        return []
+    return [step.depends_on] if isinstance(step.depends_on, str) else list(step.depends_on)
+
+def task_id_field(step_type: str) -> str:
+    return TASK_ID_FIELDS.get(step_type, "original_model_task_id")
+
+def validate_steps(steps: List[PipelineStep]) -> Optional[str]:
+    by_id: Dict[str, PipelineStep] = {}
+    for step in steps:
+        if step.id in by_id:
+            return f"Duplicate step id: {step.id}"
+        if step.type not in tripo_api.TASK_CREATORS:
+            return f"The task type {step.type} is unsupported."
+        by_id[step.id] = step
+    for step in steps:
+        for parent_id in parents(step):
+            if parent_id not in by_id:
+                return f"Step {step.id} depends on unknown step {parent_id}"
+        if step.use_task_id_of is not None and step.use_task_id_of not in parents(step):
+            return f"Step {step.id}: use_task_id_of {step.use_task_id_of} is not one of its dependencies"
+    # 深度优先检查环：visiting 中的步骤再次出现即成环
+    visiting, visited = set(), set()
+
+    def has_cycle(step_id: str) -> bool:
+        if step_id in visited:
+            return False
+        if step_id in visiting:
+            return True
+        visiting.add(step_id)
+        if any(has_cycle(parent_id) for parent_id in parents(by_id[step_id])):
+            return True
+        visiting.discard(step_id)
+        visited.add(step_id)
+        return False
+
+    for step in steps:
+        if has_cycle(step.id):
+            return f"Dependency cycle detected at step {step.id}"
+    return None
+
+async def run_pipeline(steps: List[PipelineStep], timeout: Optional[float] = None,
+                       on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """按依赖关系调度步骤：依赖成功后立即提交，互不依赖的分支并行执行。"""
+    error = validate_steps(steps)
+    if error:
+        return {"code": 2002, "msg": error}
+    deadline = time.monotonic() + (timeout or 3600)
+    nodes: Dict[str, Dict[str, Any]] = {
+        step.id: {"id": step.id, "type": step.type, "depends_on": parents(step), "status": "pending", "task_id": None}
+        for step in steps
+    }
+    # 每个步骤实际使用的源模型任务ID，检查类步骤的下游沿用它
+    sources: Dict[str, Optional[str]] = {}
+    finished = {step.id: asyncio.Event() for step in steps}
+    done_count = 0
+
+    async def report(message: str) -> None:
+        if on_progress is not None:
+            try:
+                await on_progress(done_count, len(steps), message)
+            except Exception:
+                pass
+
+    async def run_step(step: PipelineStep) -> None:
+        nonlocal done_count
+        node = nodes[step.id]
+        try:
+            params = dict(step.params)
+            parent_ids = parents(step)
+            for parent_id in parent_ids:
+                await finished[parent_id].wait()
+            for parent_id in parent_ids:
+                if nodes[parent_id]["status"] != "success":
+                    node["status"] = "skipped"
+                    node["msg"] = f"Dependency {parent_id} ended with status {nodes[parent_id]['status']}"
+                    return
+            field = task_id_field(step.type)
+            if parent_ids and not params.get(field):
+                source_id = step.use_task_id_of or parent_ids[0]
+                source = nodes[source_id]
+                params[field] = sources.get(source_id) if source["type"] in CHECK_TYPES else source["task_id"]
+            sources[step.id] = params.get(field)
+            node["status"] = "submitting"
+            response = await batch.submit_one(BatchSubmitItem(type=step.type, params=params))
+            data = response.get("data")
+            task_id = data.get("task_id") if isinstance(data, dict) else None
+            if response.get("code") != 0 or not task_id:
+                node["status"] = "submit_failed"
+                node["msg"] = response.get("msg") or response.get("message")
+                return
+            node["task_id"] = task_id
+            node["status"] = "running"
+            await report(f"{step.id}: submitted {task_id}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                node["status"] = "timeout"
+                return
+            result = await waiter.wait(task_id, remaining)
+            if result.get("timed_out"):
+                node["status"] = "timeout"
+            elif result.get("code", 0) != 0:
+                node["status"] = "failed"
+                node["msg"] = result.get("msg") or result.get("message")
+            else:
+                data = result.get("data") or {}
+                node["status"] = data.get("status", "unknown")
+                if data.get("output"):
+                    node["output"] = data["output"]
+                # 预检查任务本身成功但模型不可绑定时，依赖它的绑定步骤不再提交
+                if node["status"] == "success" and step.type == "animate_prerigcheck" \
+                        and (data.get("output") or {}).get("riggable") is False:
+                    node["status"] = "not_riggable"
+                    node["msg"] = "The model is not riggable."
+        except Exception as e:
+            node["status"] = "failed"
+            node["msg"] = f"Fatal error: {str(e)}"
+        finally:
+            done_count += 1
+            finished[step.id].set()
+            await report(f"{step.id}: {node['status']}")
+
+    await asyncio.gather(*(run_step(step) for step in steps))
+    statuses = [node["status"] for node in nodes.values()]
+    if all(status == "success" for status in statuses):
+        overall = "success"
+    elif any(status == "success" for status in statuses):
+        overall = "partial"
+    else:
+        overall = "failed"
+    return {"code": 0, "data": {"status": overall, "steps": [nodes[step.id] for step in steps]}}
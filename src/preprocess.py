@@ -0,0 +1,215 @@
+import os
+import time
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+import upload_cache
+import uploader
+import metrics
+from coalesce import coalesce
+
+# Pillow 为可选依赖，首次转换图片时才导入，不影响冷启动耗时；未安装时只做本地校验，不转换图片
+Image = ImageChops = ImageOps = None
+
+def _load_pillow() -> bool:
+    global Image, ImageChops, ImageOps
+    if Image is None:
+        try:
+            from PIL import Image as image_module, ImageChops as chops_module, ImageOps as ops_module
+        except ImportError:
+            return False
+        Image, ImageChops, ImageOps = image_module, chops_module, ops_module
+    return True
+
+PREPROCESS_ENABLED = os.getenv("TRIPO_PREPROCESS", "false").lower() in ("1", "true", "yes")
+PREPROCESS_MAX_EDGE = int(os.getenv("TRIPO_PREPROCESS_MAX_EDGE", "2048"))
+PREPROCESS_FORMAT = os.getenv("TRIPO_PREPROCESS_FORMAT", "webp").lower()
+PREPROCESS_QUALITY = int(os.getenv("TRIPO_PREPROCESS_QUALITY", "90"))
+PREPROCESS_CROP = os.getenv("TRIPO_PREPROCESS_CROP", "false").lower() in ("1", "true", "yes")
+PREPROCESS_WORKERS = int(os.getenv("TRIPO_PREPROCESS_WORKERS", str(min(2, os.cpu_count() or 1))))
+PREPROCESS_DIR = os.path.join(upload_cache.CACHE_DIR, "preprocessed")
+
+# Tripo 对上传图片的限制
+UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+IMAGE_MIN_SIDE = 20
+IMAGE_MAX_SIDE = 6000
+
+# 裁剪主体：与背景（透明度或左上角颜色）差值超过阈值的像素视为主体，四周保留边距
+CROP_THRESHOLD = 16
+CROP_MARGIN = 0.05
+
+def _subject_box(image) -> Optional[Tuple[int, int, int, int]]:
+    if image.mode == "RGBA":
+        mask = image.getchannel("A")
+    else:
+        background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+        mask = ImageChops.difference(image, background).convert("L")
+    box = mask.point(lambda value: 255 if value > CROP_THRESHOLD else 0).getbbox()
+    if box is None:
+        return None
+    margin = int(max(box[2] - box[0], box[3] - box[1]) * CROP_MARGIN)
+    return (max(box[0] - margin, 0), max(box[1] - margin, 0),
+            min(box[2] + margin, image.width), min(box[3] + margin, image.height))
+
+def _transform(src: str, dst: str, max_edge: int, image_format: str, quality: int, crop: bool) -> Dict[str, Any]:
+    """在子进程中执行：摆正方向、可选裁剪主体、缩放、去除元数据并转码写入 dst。"""
+    _load_pillow()
+    started = time.process_time()
+    with Image.open(src) as opened:
+        original_size = opened.size
+        # 先按 EXIF 方向摆正，之后丢弃全部元数据
+        image = ImageOps.exif_transpose(opened)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.info = {}
+        cropped = False
+        if crop:
+            box = _subject_box(image)
+            if box is not None and box != (0, 0) + image.size:
+                image = image.crop(box)
+                cropped = True
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        if image_format == "jpeg":
+            if has_alpha:
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            options = {"quality": quality, "optimize": True}
+        else:
+            options = {"quality": quality, "method": 4}
+        tmp_path = f"{dst}.{os.getpid()}.tmp"
+        image.save(tmp_path, image_format.upper(), **options)
+        os.replace(tmp_path, dst)
+    return {
+        "original_size": list(original_size),
+        "size": list(image.size),
+        "cropped": cropped,
+        "cpu_seconds": round(time.process_time() - started, 3),
+    }
+
+class ImagePreprocessor:
+    """上传前的本地图片预处理：校验、缩放、去元数据、转码与可选的主体裁剪，在进程池中执行，不阻塞事件循环。
+
+    结果按源文件摘要与处理参数缓存在磁盘上，同一图片只处理一次。
+    """
+
+    def __init__(self, enabled: bool = PREPROCESS_ENABLED, max_edge: int = PREPROCESS_MAX_EDGE,
+                 image_format: str = PREPROCESS_FORMAT, quality: int = PREPROCESS_QUALITY,
+                 crop: bool = PREPROCESS_CROP, workers: int = PREPROCESS_WORKERS, output_dir: str = PREPROCESS_DIR):
+        self.enabled = enabled
+        self.max_edge = min(max_edge, IMAGE_MAX_SIDE)
+        self.format = "jpeg" if image_format in ("jpg", "jpeg") else "webp"
+        self.quality = quality
+        self.crop = crop
+        self.workers = max(workers, 1)
+        self.output_dir = output_dir
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, "asyncio.Future"] = {}
+        self.processed = 0
+        self.reused = 0
+        self.kept_original = 0
+        self.bytes_saved = 0
+        self.cpu_seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return _load_pillow()
+
+    def active(self, enabled: Optional[bool] = None) -> bool:
+        return (self.enabled if enabled is None else enabled) and self.available
+
+    def check(self, file_path: str, enabled: Optional[bool] = None) -> Optional[str]:
+        """只读文件头校验格式、尺寸与大小，返回错误信息；启用预处理时可修复的超限（过大）不报错。"""
+        if not os.path.isfile(file_path):
+            return f"File not found: {file_path}"
+        if uploader.sniff_image_type(file_path) is None:
+            return f"Unsupported image format, expected jpeg/png/webp: {file_path}"
+        size = uploader.image_size(file_path)
+        if size is not None and min(size) < IMAGE_MIN_SIDE:
+            return f"Image size {size[0]}x{size[1]} is below the {IMAGE_MIN_SIDE} px minimum: {file_path}"
+        if self.active(enabled):
+            return None
+        if size is not None and max(size) > IMAGE_MAX_SIDE:
+            return f"Image size {size[0]}x{size[1]} exceeds the {IMAGE_MAX_SIDE} px maximum: {file_path}"
+        file_size = os.path.getsize(file_path)
+        if file_size > UPLOAD_MAX_BYTES:
+            return (f"Image is {file_size / 1024 / 1024:.1f}MB, exceeding the 20MB upload limit; "
+                    f"enable preprocessing (TRIPO_PREPROCESS=true, requires Pillow) to shrink it: {file_path}")
+        return None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def _run(self, file_path: str, output_path: str) -> Dict[str, Any]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        info = await loop.run_in_executor(self._get_pool(), _transform, file_path, output_path,
+                                          self.max_edge, self.format, self.quality, self.crop)
+        self.processed += 1
+        self.cpu_seconds += info["cpu_seconds"]
+        return info
+
+    async def prepare(self, file_path: str, enabled: Optional[bool] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """返回实际要上传的文件路径与预处理统计；未启用时原样返回，处理结果不比原图小且原图合规时仍上传原图。"""
+        if not self.active(enabled):
+            return file_path, None
+        digest = await upload_cache.digest_file(file_path)
+        options = f"{self.max_edge}:{self.format}:{self.quality}:{int(self.crop)}"
+        key = hashlib.blake2b(f"{digest}:{options}".encode("utf-8"), digest_size=16).hexdigest()
+        output_path = os.path.join(self.output_dir, f"{key}.{'jpg' if self.format == 'jpeg' else 'webp'}")
+        if os.path.exists(output_path):
+            self.reused += 1
+            info: Dict[str, Any] = {"reused": True}
+        else:
+            # 同一图片的并发预处理只执行一次
+            result, _ = await coalesce(self._pending, key, lambda: self._run(file_path, output_path))
+            info = dict(result)
+        original_bytes = os.path.getsize(file_path)
+        output_bytes = os.path.getsize(output_path)
+        if output_bytes >= original_bytes and self.check(file_path, False) is None:
+            self.kept_original += 1
+            return file_path, {"original_bytes": original_bytes, "bytes": original_bytes, "bytes_saved": 0,
+                               "format": uploader.sniff_image_type(file_path), "kept_original": True, **info}
+        saved = original_bytes - output_bytes
+        self.bytes_saved += max(saved, 0)
+        # 按上传队列的平均吞吐估算节省的上传时间；尚无上传记录时无法估算
+        throughput = uploader.queue.throughput_ewma
+        return output_path, {
+            "original_bytes": original_bytes,
+            "bytes": output_bytes,
+            "bytes_saved": saved,
+            "format": self.format,
+            "upload_seconds_saved": round(saved / throughput, 3) if throughput else None,
+            **info,
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pillow": self.available,
+            "max_edge": self.max_edge,
+            "format": self.format,
+            "quality": self.quality,
+            "crop": self.crop,
+            "processed": self.processed,
+            "reused": self.reused,
+            "kept_original": self.kept_original,
+            "bytes_saved": self.bytes_saved,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+        }
+
+images = ImagePreprocessor()
+
+metrics.registry.register(
+    "tripo_preprocess_bytes_saved", "counter", "Upload bytes saved by local image preprocessing.",
+    lambda: {(): images.bytes_saved},
+)
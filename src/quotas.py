@@ -0,0 +1,98 @@
+import os
+import asyncio
+import functools
+import weakref
+from typing import Dict, Any, Callable
+
+try:
+    from mcp.server.lowlevel.server import request_ctx
+except ImportError:
+    request_ctx = None
+
+# 每个客户端会话同时执行的工具调用数上限，0 表示不限；只在多客户端共享一个进程（HTTP 传输）时生效，stdio 下不限制
+CLIENT_MAX_CONCURRENCY = int(os.getenv("TRIPO_CLIENT_MAX_CONCURRENCY", "8"))
+
+class _ClientState:
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.calls = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"client": self.name, "active": self.active, "waiting": self.waiting, "calls": self.calls}
+
+def _current_session():
+    if request_ctx is None:
+        return None
+    try:
+        return request_ctx.get().session
+    except LookupError:
+        return None
+
+def _client_name(session) -> str:
+    params = getattr(session, "client_params", None)
+    info = getattr(params, "clientInfo", None)
+    name = getattr(info, "name", None) or "unknown"
+    return f"{name}#{id(session) & 0xFFFF:04x}"
+
+class ClientQuotas:
+    """按 MCP 会话限制并发工具调用数，防止单个客户端占满共享的连接池与限速预算；会话结束后状态随之回收。
+
+    enabled 由 HTTP 传输的入口置位；stdio 下每个客户端独占一个进程，不做限制。
+    """
+
+    def __init__(self, limit: int = CLIENT_MAX_CONCURRENCY):
+        self.limit = limit
+        self.enabled = False
+        self._clients: "weakref.WeakKeyDictionary[Any, _ClientState]" = weakref.WeakKeyDictionary()
+        self.sessions_seen = 0
+        self.throttled = 0
+
+    def _state(self, session) -> _ClientState:
+        state = self._clients.get(session)
+        if state is None:
+            state = self._clients[session] = _ClientState(_client_name(session), self.limit)
+            self.sessions_seen += 1
+        return state
+
+    def limited(self, fn: Callable) -> Callable:
+        """装饰异步工具函数：超过所属会话的并发上限时排队等待；未启用（含 stdio 传输）或不在 MCP 请求上下文中时直接执行。"""
+        if self.limit <= 0:
+            return fn
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            session = _current_session() if self.enabled else None
+            if session is None:
+                return await fn(*args, **kwargs)
+            state = self._state(session)
+            state.calls += 1
+            if state.semaphore.locked():
+                self.throttled += 1
+            state.waiting += 1
+            try:
+                await state.semaphore.acquire()
+            finally:
+                state.waiting -= 1
+            state.active += 1
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                state.active -= 1
+                state.semaphore.release()
+        return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        clients = [state.stats() for state in list(self._clients.values())]
+        return {
+            "enabled": self.enabled,
+            "limit_per_client": self.limit,
+            "connected_clients": len(clients),
+            "sessions_seen": self.sessions_seen,
+            "throttled_calls": self.throttled,
+            "clients": clients,
+        }
+
+clients = ClientQuotas()
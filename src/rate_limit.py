@@ -0,0 +1,186 @@
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+
+class TokenBucket:
+    """异步令牌桶：rate 为每秒补充的令牌数，burst 为桶容量；rate<=0 表示不限速。"""
+
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1) -> None:
+        if self.rate <= 0:
+            return
+        # 持锁等待保证先到先得，避免高并发下饥饿
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+class RequestBudget:
+    """单类请求（创建任务/轮询/上传等）的限速预算，同时统计排队与在途请求数。"""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.retries = 0
+        self.throttled = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        self.queued += 1
+        try:
+            await self.bucket.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "retries": self.retries,
+            "throttled": self.throttled,
+        }
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After 可以是秒数或 HTTP 日期
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # 全抖动指数退避：在 [0, min(cap, base * 2^attempt)] 内随机
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class RunningTaskGovernor:
+    """限制账户上同时运行的任务数。
+
+    limit 为 0 时先不限制，上游明确以并发超限拒绝创建任务时，以被拒时运行任务数的最大值作为账户套餐的并发上限；
+    学到的上限在 learn_ttl 秒内没有新的并发拒绝时失效，恢复为不限制，避免一次偶然的拒绝永久压低并发。
+    等待空位期间定期通过 refresh 回调刷新运行中任务的状态，避免无人轮询时永久阻塞。
+    """
+
+    def __init__(self, limit: int, refresh_interval: float, stale_after: float, learn_ttl: float = 600.0):
+        self.limit = limit
+        self.learned_limit: Optional[int] = None
+        self.learn_ttl = learn_ttl
+        self._learned_at = 0.0
+        self.refresh_interval = refresh_interval
+        self.stale_after = stale_after
+        self.refresh: Optional[Callable[[List[str]], Awaitable[None]]] = None
+        self._running: Dict[str, float] = {}
+        self._reserved = 0
+        self._changed: Optional[asyncio.Event] = None
+        self.waiting = 0
+
+    def effective_limit(self) -> int:
+        if self.learned_limit is not None and time.monotonic() - self._learned_at > self.learn_ttl:
+            self.learned_limit = None
+        return self.limit or self.learned_limit or 0
+
+    def _event(self) -> asyncio.Event:
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        return self._changed
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for task_id in [t for t, started in self._running.items() if now - started > self.stale_after]:
+            del self._running[task_id]
+
+    def occupied(self) -> int:
+        return len(self._running) + self._reserved
+
+    def _has_room(self) -> bool:
+        limit = self.effective_limit()
+        return not limit or self.occupied() < limit
+
+    async def acquire(self) -> None:
+        """占用一个运行名额；提交成功后调用 started，失败则调用 release 归还。"""
+        self._expire()
+        limit = self.effective_limit()
+        if limit and self.occupied() >= limit:
+            self.waiting += 1
+            try:
+                # 每轮重新读取上限：学到的上限可能在等待期间失效（变为 0，不再限制）
+                while not self._has_room():
+                    event = self._event()
+                    event.clear()
+                    if self.refresh is not None:
+                        await self.refresh(list(self._running))
+                        if self._has_room():
+                            break
+                    try:
+                        await asyncio.wait_for(event.wait(), self.refresh_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._expire()
+            finally:
+                self.waiting -= 1
+        self._reserved += 1
+
+    def release(self) -> None:
+        self._reserved -= 1
+        self._event().set()
+
+    def started(self, task_id: str) -> None:
+        self._reserved -= 1
+        self._running[task_id] = time.monotonic()
+
+    def is_running(self, task_id: str) -> bool:
+        return task_id in self._running
+
+    def finished(self, task_id: str) -> None:
+        if self._running.pop(task_id, None) is not None:
+            self._event().set()
+
+    def rejected(self) -> None:
+        """上游以并发超限拒绝创建时调用（普通限速的 429 不应调用）：取有效期内观察到的最大运行任务数作为上限。"""
+        if self.limit or not self._running:
+            return
+        # 先让过期的上限失效，再与本次被拒时的运行任务数取最大值
+        self.effective_limit()
+        self.learned_limit = max(len(self._running), self.learned_limit or 0)
+        self._learned_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._running),
+            "submitting": self._reserved,
+            "limit": self.effective_limit() or None,
+            "learned_limit": self.learned_limit,
+            "waiting": self.waiting,
+        }
@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+import inspect
+from typing import Dict, Any, Optional, Callable, List
+import pydantic
+import upload_cache
+
+SCHEMA_CACHE_ENABLED = os.getenv("TRIPO_SCHEMA_CACHE", "true").lower() not in ("0", "false", "no")
+SCHEMA_CACHE_PATH = os.path.join(upload_cache.CACHE_DIR, "tool_schemas.json")
+
+try:
+    from mcp.server.fastmcp.tools import Tool
+    from mcp.server.fastmcp.utilities.func_metadata import func_metadata
+    from mcp.server.fastmcp.utilities.context_injection import find_context_parameter
+except ImportError:
+    # 旧版 mcp 没有这些内部接口，退回 FastMCP.add_tool，每次启动生成 schema
+    Tool = None
+
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _source_key(sources: List[str]) -> str:
+    # 工具签名与请求模型的源码、pydantic 版本、mcp 安装文件任一变化都会使缓存失效
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pydantic.VERSION.encode())
+    if Tool is not None:
+        mcp_file = inspect.getfile(Tool)
+        stat = os.stat(mcp_file)
+        h.update(f"{mcp_file}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    for path in sources:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+class ToolSchemaCache:
+    """工具参数 JSON Schema 的磁盘缓存，按源码摘要整体失效，命中时启动阶段跳过 pydantic 的 schema 生成。"""
+
+    def __init__(self, path: str, sources: List[str], enabled: bool = SCHEMA_CACHE_ENABLED):
+        self.path = path
+        self.sources = sources
+        self.enabled = enabled
+        self.key: Optional[str] = None
+        self._schemas: Optional[Dict[str, Any]] = None
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, Any]:
+        if self._schemas is None:
+            self._schemas = {}
+            self.key = _source_key(self.sources)
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                if stored.get("key") == self.key:
+                    self._schemas = stored.get("tools", {})
+            except (OSError, ValueError, AttributeError):
+                pass
+        return self._schemas
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        schema = self._load().get(name)
+        if schema is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return schema
+
+    def put(self, name: str, schema: Dict[str, Any]) -> None:
+        if self.enabled:
+            self._load()[name] = schema
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": self.key, "tools": self._schemas}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses, "path": self.path}
+
+cache = ToolSchemaCache(SCHEMA_CACHE_PATH, [os.path.join(_SRC_DIR, "main.py"), os.path.join(_SRC_DIR, "models.py")])
+
+def add_tool(server, fn: Callable, description: str) -> None:
+    """注册 MCP 工具，参数 schema 优先取自磁盘缓存；与 FastMCP.add_tool 注册的结果一致。"""
+    manager = getattr(server, "_tool_manager", None)
+    if Tool is None or not isinstance(getattr(manager, "_tools", None), dict):
+        server.add_tool(fn, description=description)
+        return
+    name = fn.__name__
+    context_kwarg = find_context_parameter(fn)
+    fn_metadata = func_metadata(fn, skip_names=[context_kwarg] if context_kwarg is not None else [])
+    parameters = cache.get(name)
+    if parameters is None:
+        parameters = fn_metadata.arg_model.model_json_schema(by_alias=True)
+        cache.put(name, parameters)
+    manager._tools[name] = Tool(
+        fn=fn,
+        name=name,
+        description=description,
+        parameters=parameters,
+        fn_metadata=fn_metadata,
+        is_async=inspect.iscoroutinefunction(fn),
+        context_kwarg=context_kwarg,
+    )
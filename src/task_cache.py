@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Awaitable, Tuple
+from coalesce import coalesce
+
+# 任务终态：进入这些状态后结果不再变化
+TERMINAL_STATUSES = {"success", "failed", "cancelled", "banned", "expired", "unknown"}
+
+TASK_CACHE_MAX_ENTRIES = int(os.getenv("TRIPO_TASK_CACHE_MAX_ENTRIES", "10000"))
+TASK_CACHE_MAX_BYTES = int(os.getenv("TRIPO_TASK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TASK_CACHE_INFLIGHT_TTL = float(os.getenv("TRIPO_TASK_CACHE_TTL", "1.0"))
+
+class TaskStatusCache:
+    """任务状态缓存：终态结果按 LRU 长期保存，运行中状态短 TTL 缓存，并发查询合并为一次请求。"""
+
+    def __init__(self, max_entries: int = TASK_CACHE_MAX_ENTRIES, max_bytes: int = TASK_CACHE_MAX_BYTES,
+                 inflight_ttl: float = TASK_CACHE_INFLIGHT_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.inflight_ttl = inflight_ttl
+        self._terminal: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._terminal_bytes = 0
+        self._inflight: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def lookup(self, task_id: str):
+        entry = self._terminal.get(task_id)
+        if entry is not None:
+            self._terminal.move_to_end(task_id)
+            return entry[0]
+        entry = self._inflight.get(task_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                return entry[1]
+            del self._inflight[task_id]
+        return None
+
+    def put(self, task_id: str, result: Dict[str, Any]) -> None:
+        # 只缓存成功响应，业务错误每次都重新请求
+        if not isinstance(result, dict) or result.get("code", 0) != 0:
+            return
+        status = (result.get("data") or {}).get("status")
+        if status in TERMINAL_STATUSES:
+            self._inflight.pop(task_id, None)
+            self._store_terminal(task_id, result)
+        elif self.inflight_ttl > 0:
+            self._inflight[task_id] = (time.monotonic() + self.inflight_ttl, result)
+
+    def _store_terminal(self, task_id: str, result: Dict[str, Any]) -> None:
+        size = len(json.dumps(result, ensure_ascii=False))
+        old = self._terminal.pop(task_id, None)
+        if old is not None:
+            self._terminal_bytes -= old[1]
+        self._terminal[task_id] = (result, size)
+        self._terminal_bytes += size
+        while self._terminal and (len(self._terminal) > self.max_entries or self._terminal_bytes > self.max_bytes):
+            _, (_, evicted) = self._terminal.popitem(last=False)
+            self._terminal_bytes -= evicted
+
+    def invalidate(self, task_id: str) -> None:
+        old = self._terminal.pop(task_id, None)
+        if old is not None:
+            self._terminal_bytes -= old[1]
+        self._inflight.pop(task_id, None)
+
+    async def get(self, task_id: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        cached = self.lookup(task_id)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        result, joined = await coalesce(self._pending, task_id, fetch)
+        if joined:
+            self.coalesced += 1
+            return result
+        self.misses += 1
+        self.put(task_id, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "terminal_entries": len(self._terminal),
+            "terminal_bytes": self._terminal_bytes,
+            "inflight_entries": len(self._inflight),
+            "pending_requests": len(self._pending),
+        }
+
+cache = TaskStatusCache()
@@ -0,0 +1,213 @@
+import os
+import time
+import asyncio
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from models import TaskIdRequest
+from task_cache import TERMINAL_STATUSES
+import tripo_api
+import metrics
+import callbacks
+from ledger import ledger
+
+POLL_MIN_INTERVAL = float(os.getenv("TRIPO_POLL_MIN_INTERVAL", "2"))
+POLL_MAX_INTERVAL = float(os.getenv("TRIPO_POLL_MAX_INTERVAL", "30"))
+POLL_BACKOFF_FACTOR = float(os.getenv("TRIPO_POLL_BACKOFF_FACTOR", "1.5"))
+POLL_MAX_ERRORS = int(os.getenv("TRIPO_POLL_MAX_ERRORS", "5"))
+WAIT_DEFAULT_TIMEOUT = float(os.getenv("TRIPO_WAIT_TIMEOUT", "600"))
+
+ProgressCallback = Callable[[str, float, str], Awaitable[None]]
+
+def is_terminal(result: Dict[str, Any]) -> bool:
+    if not isinstance(result, dict):
+        return False
+    # 业务错误（如任务不存在）同样视为终态，继续轮询没有意义
+    if result.get("code", 0) != 0:
+        return True
+    return (result.get("data") or {}).get("status") in TERMINAL_STATUSES
+
+def _clamp(value: float) -> float:
+    return max(POLL_MIN_INTERVAL, min(POLL_MAX_INTERVAL, value))
+
+def next_interval(interval: float, samples: List[tuple], data: Dict[str, Any]) -> float:
+    """根据任务上报的剩余时间或进度速率估算下一次轮询间隔。
+
+    samples 为 (时间戳, 进度) 列表。估算出剩余时间时取其一半，使间隔随完成临近而收敛；
+    无法估算（排队中或进度停滞）时按指数退避。
+    """
+    eta = data.get("running_left_time")
+    if not isinstance(eta, (int, float)) or eta <= 0:
+        eta = None
+        if len(samples) >= 2:
+            (t0, p0), (t1, p1) = samples[0], samples[-1]
+            if p1 > p0 and t1 > t0:
+                eta = (100 - p1) / ((p1 - p0) / (t1 - t0))
+    if eta is not None:
+        return _clamp(eta / 2)
+    return _clamp(interval * POLL_BACKOFF_FACTOR)
+
+class _Poller:
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.waiters = 0
+        self.listeners: List[ProgressCallback] = []
+        self.latest: Optional[Dict[str, Any]] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # 收到该任务的回调时置位，提前结束当前等待
+        self.wakeup = asyncio.Event()
+        self.started = time.monotonic()
+        self.task = asyncio.create_task(self._run())
+
+    def _callback_interval(self, interval: float) -> float:
+        """启用回调时的等待间隔：期限内只等回调不轮询，期限后仍无回调则退回稀疏轮询。"""
+        last_event = callbacks.receiver.last_received(self.task_id) or self.started
+        remaining = last_event + callbacks.CALLBACK_GRACE - time.monotonic()
+        if remaining > 0:
+            return remaining
+        return max(interval, callbacks.CALLBACK_POLL_INTERVAL)
+
+    async def _sleep(self, interval: float) -> None:
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _notify(self, data: Dict[str, Any]) -> None:
+        progress = data.get("progress")
+        progress = float(progress) if isinstance(progress, (int, float)) else 0.0
+        status = data.get("status", "")
+        for listener in list(self.listeners):
+            try:
+                await listener(self.task_id, progress, status)
+            except Exception:
+                pass
+
+    async def _run(self) -> None:
+        interval = POLL_MIN_INTERVAL
+        samples: List[tuple] = []
+        errors = 0
+        try:
+            while True:
+                self.wakeup.clear()
+                try:
+                    result = await tripo_api.get_task_status(TaskIdRequest(task_id=self.task_id))
+                    errors = 0
+                except Exception as e:
+                    errors += 1
+                    if errors >= POLL_MAX_ERRORS:
+                        self.future.set_result({"code": 1001, "msg": f"Fatal error: {str(e)}"})
+                        return
+                    interval = _clamp(interval * POLL_BACKOFF_FACTOR)
+                    await self._sleep(interval)
+                    continue
+                self.latest = result
+                data = (result.get("data") or {}) if isinstance(result, dict) else {}
+                await self._notify(data)
+                if is_terminal(result):
+                    self.future.set_result(result)
+                    return
+                progress = data.get("progress")
+                if isinstance(progress, (int, float)):
+                    samples.append((time.monotonic(), float(progress)))
+                    samples = samples[-5:]
+                interval = next_interval(interval, samples, data)
+                if callbacks.receiver.running:
+                    await self._sleep(self._callback_interval(interval))
+                else:
+                    await self._sleep(interval)
+        except asyncio.CancelledError:
+            if not self.future.done():
+                self.future.cancel()
+            raise
+        except Exception as e:
+            # 轮询逻辑自身出错时立即释放所有等待者，而不是让它们一直等到超时
+            if not self.future.done():
+                self.future.set_result({"code": 1001, "msg": f"Fatal error: {str(e)}"})
+
+class TaskWaiter:
+    """服务端任务等待器：同一任务ID的并发等待者共享一个轮询协程。"""
+
+    def __init__(self):
+        self._pollers: Dict[str, _Poller] = {}
+
+    async def wait(self, task_id: str, timeout: Optional[float] = None,
+                   on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        poller = self._pollers.get(task_id)
+        if poller is None or poller.future.done():
+            poller = _Poller(task_id)
+            self._pollers[task_id] = poller
+        poller.waiters += 1
+        if on_progress is not None:
+            poller.listeners.append(on_progress)
+        try:
+            return await asyncio.wait_for(asyncio.shield(poller.future), timeout or WAIT_DEFAULT_TIMEOUT)
+        except asyncio.TimeoutError:
+            result = dict(poller.latest or {"code": 0, "data": {"task_id": task_id}})
+            result["timed_out"] = True
+            return result
+        finally:
+            poller.waiters -= 1
+            if on_progress is not None and on_progress in poller.listeners:
+                poller.listeners.remove(on_progress)
+            # 没有等待者时停止轮询，避免泄漏后台协程
+            if poller.waiters == 0:
+                if not poller.task.done():
+                    poller.task.cancel()
+                if self._pollers.get(task_id) is poller:
+                    del self._pollers[task_id]
+
+    async def wait_many(self, task_ids: List[str], timeout: Optional[float] = None,
+                        on_progress: Optional[ProgressCallback] = None) -> List[Dict[str, Any]]:
+        unique_ids = list(dict.fromkeys(task_ids))
+        progress: Dict[str, float] = {task_id: 0.0 for task_id in unique_ids}
+
+        async def aggregate(task_id: str, value: float, status: str) -> None:
+            # 批量等待时上报所有任务的平均进度
+            progress[task_id] = 100.0 if status in TERMINAL_STATUSES else value
+            if on_progress is not None:
+                await on_progress(task_id, sum(progress.values()) / len(progress), status)
+
+        results = await asyncio.gather(*(
+            self.wait(task_id, timeout, aggregate) for task_id in unique_ids
+        ))
+        by_id = dict(zip(unique_ids, results))
+        return [by_id[task_id] for task_id in task_ids]
+
+    def notify(self, task_id: str) -> bool:
+        """任务状态有推送更新时唤醒对应的轮询协程立即查询新状态，返回该任务是否有人在等待。"""
+        poller = self._pollers.get(task_id)
+        if poller is None or poller.future.done():
+            return False
+        poller.wakeup.set()
+        return True
+
+    def active_pollers(self) -> int:
+        return len(self._pollers)
+
+waiter = TaskWaiter()
+
+# 无人等待的任务收到回调后在后台查询一次，按任务ID去重
+_refreshing: Dict[str, asyncio.Task] = {}
+
+def _refreshed(task_id: str, task: asyncio.Task) -> None:
+    _refreshing.pop(task_id, None)
+    if not task.cancelled():
+        task.exception()
+
+async def _refresh_known(task_id: str) -> None:
+    # 只查询本服务提交过（运行中或已入账）的任务，任意伪造的任务ID不消耗轮询预算
+    if tripo_api.accounts.is_running(task_id) or await ledger.get_status_async(task_id) is not None:
+        await tripo_api.get_task_status(TaskIdRequest(task_id=task_id))
+
+def _on_callback(task_id: str) -> None:
+    # 回调只是状态变化的通知：唤醒等待者向上游查询；无人等待时也查询一次，使台账与运行任务数及时更新
+    if not tripo_api.apply_task_callback(task_id) or waiter.notify(task_id) or task_id in _refreshing:
+        return
+    task = asyncio.ensure_future(_refresh_known(task_id))
+    _refreshing[task_id] = task
+    task.add_done_callback(lambda done: _refreshed(task_id, done))
+
+callbacks.receiver.on_update = _on_callback
+metrics.registry.register(
+    "tripo_active_pollers", "gauge", "Background pollers shared by wait_for_task callers.",
+    lambda: {(): waiter.active_pollers()},
+)
@@ -1,24 +1,233 @@
 import os
+import time
+import asyncio
+import threading
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 from models import (
     TextToModelRequest, ImageToModelRequest, MultiviewToModelRequest, TextureModelRequest,
     RefineModelRequest, AnimatePrerigcheckRequest, AnimateRigRequest, AnimateRetargetRequest,
-    StylizeModelRequest, ConvertModelRequest, TaskIdRequest, UploadImageRequest
+    StylizeModelRequest, ConvertModelRequest, TaskIdRequest, UploadImageRequest, ListTasksRequest
 )
+import task_cache
+import upload_cache
+import uploader
+import preprocess
+from ledger import ledger
+from dedup import submissions
+from coalesce import coalesce
+import metrics
+from rate_limit import RequestBudget, RunningTaskGovernor, parse_retry_after, backoff_delay
+from key_pool import KeyPool, PooledKey, load_keys
 
 load_dotenv()
 TRIPO_API_KEY = os.getenv("TRIPO_API_KEY")
-BASE_URL = "https://api.tripo3d.ai/v2/openapi"
-HEADERS = {"Authorization": f"Bearer {TRIPO_API_KEY}"}
+BASE_URL = os.getenv("TRIPO_API_BASE_URL", "https://api.tripo3d.ai/v2/openapi")
+
+# 共享连接池配置，均可通过环境变量覆盖
+HTTP_MAX_CONNECTIONS = int(os.getenv("TRIPO_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("TRIPO_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("TRIPO_HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("TRIPO_HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("TRIPO_HTTP_CONNECT_TIMEOUT", "10"))
+HTTP2_ENABLED = os.getenv("TRIPO_HTTP2", "true").lower() not in ("0", "false", "no")
+
+# 限速与重试配置：创建任务、轮询状态、上传分别使用独立的令牌桶预算
+RETRY_MAX_ATTEMPTS = int(os.getenv("TRIPO_RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.getenv("TRIPO_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("TRIPO_RETRY_MAX_DELAY", "30"))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# 创建任务等非幂等请求只在确定请求未送达上游时重试，避免重复创建计费任务
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# 表示账户并发任务数超限的上游错误码；其余 429 只是限速，不用于学习并发上限
+CONCURRENCY_ERROR_CODES = {int(code) for code in os.getenv("TRIPO_CONCURRENCY_ERROR_CODES", "2000").split(",") if code.strip()}
+LEARNED_LIMIT_TTL = float(os.getenv("TRIPO_LEARNED_LIMIT_TTL", "600"))
+MAX_RUNNING_TASKS = int(os.getenv("TRIPO_MAX_RUNNING_TASKS", "0"))
+
+BUDGETS = {
+    "create": RequestBudget("create", float(os.getenv("TRIPO_RATE_CREATE", "5")), float(os.getenv("TRIPO_RATE_CREATE_BURST", "10"))),
+    "poll": RequestBudget("poll", float(os.getenv("TRIPO_RATE_POLL", "20")), float(os.getenv("TRIPO_RATE_POLL_BURST", "40"))),
+    "upload": RequestBudget("upload", float(os.getenv("TRIPO_RATE_UPLOAD", "5")), float(os.getenv("TRIPO_RATE_UPLOAD_BURST", "10"))),
+    "account": RequestBudget("account", float(os.getenv("TRIPO_RATE_ACCOUNT", "2")), float(os.getenv("TRIPO_RATE_ACCOUNT_BURST", "5"))),
+}
+# 多视图输入顺序，与 Tripo 接口的 files 列表一致
+MULTIVIEW_VIEWS = ("front", "left", "back", "right")
+
+# 每个 key 对应一个账户，运行任务数上限按 key 分别控制
+accounts = KeyPool(load_keys(), MAX_RUNNING_TASKS, learn_ttl=LEARNED_LIMIT_TTL)
+HEADERS = accounts.primary.headers
+
+_client: Optional[httpx.AsyncClient] = None
+# 连接池可能由启动预热线程与首个请求同时创建
+_client_lock = threading.Lock()
+
+def _http2_available() -> bool:
+    # HTTP/2 依赖 h2 包（httpx[http2]），缺失时退回 HTTP/1.1
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_client() -> httpx.AsyncClient:
+    """返回模块级共享的 AsyncClient，首次调用时创建，复用 TCP/TLS 连接。"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        return _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                http2=HTTP2_ENABLED and _http2_available(),
+            )
+        return _client
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _error_code(resp: httpx.Response) -> Optional[int]:
+    try:
+        body = resp.json()
+    except ValueError:
+        return None
+    code = body.get("code") if isinstance(body, dict) else None
+    return code if isinstance(code, int) else None
+
+def _response_result(resp: httpx.Response) -> Dict[str, Any]:
+    """解析上游响应：非 JSON（如网关返回的 HTML 错误页）或非 2xx 响应统一映射为 1001 错误，保留 HTTP 状态码。"""
+    try:
+        result = resp.json()
+    except ValueError:
+        result = None
+    if resp.is_success and isinstance(result, dict):
+        return result
+    error = {"code": 1001, "msg": "Fatal error on server side", "http_status": resp.status_code}
+    if isinstance(result, dict) and (result.get("message") or result.get("msg")):
+        error["msg"] = str(result.get("message") or result.get("msg"))
+    return error
+
+async def _request(method: str, url: str, budget: str, content_factory=None,
+                   governor: Optional[RunningTaskGovernor] = None, idempotent: bool = True,
+                   **kwargs) -> httpx.Response:
+    """统一的上游请求入口：按预算限速，对 429/5xx 与网络错误做带抖动的指数退避重试，并遵循 Retry-After。
+
+    流式请求体无法重放，需通过 content_factory 在每次尝试时重新生成。
+    非幂等请求（创建任务）传入 idempotent=False：上游可能已处理的超时、断连与 5xx 不重试，只重试 429 与连接失败。
+    创建任务时传入所用 key 的 governor，上游以并发超限错误码拒绝时据此学习该账户的并发上限。
+    """
+    limiter = BUDGETS[budget]
+    attempt = 0
+    while True:
+        async with limiter.slot():
+            if content_factory is not None:
+                kwargs["content"] = content_factory()
+            started = time.perf_counter()
+            try:
+                resp = await get_client().request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                metrics.registry.observe_upstream(budget, "error", time.perf_counter() - started)
+                if attempt + 1 >= RETRY_MAX_ATTEMPTS or not (idempotent or isinstance(e, UNSENT_ERRORS)):
+                    raise
+                delay = backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+            else:
+                metrics.registry.observe_upstream(budget, str(resp.status_code), time.perf_counter() - started)
+                if resp.status_code == 429:
+                    limiter.throttled += 1
+                    if governor is not None and _error_code(resp) in CONCURRENCY_ERROR_CODES:
+                        governor.rejected()
+                retryable = resp.status_code == 429 if not idempotent else resp.status_code in RETRYABLE_STATUS
+                if not retryable or attempt + 1 >= RETRY_MAX_ATTEMPTS:
+                    return resp
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                delay = min(retry_after, RETRY_MAX_DELAY) if retry_after is not None else backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+        attempt += 1
+        limiter.retries += 1
+        await asyncio.sleep(delay)
+
+async def _create_task(payload: Dict[str, Any], dedup: bool = True) -> Dict[str, Any]:
+    # 种子固定的相同请求直接复用已有任务，避免重复消耗积分
+    return await submissions.submit(payload, lambda request_hash: _submit_task(payload, request_hash), dedup)
+
+async def _submit_task(payload: Dict[str, Any], request_hash: Optional[str] = None) -> Dict[str, Any]:
+    # 后续操作固定到原任务所属的 key，新任务选余额充足且负载最低的 key
+    api_key = await accounts.route(payload)
+    await api_key.running.acquire()
+    task_id = None
+    try:
+        resp = await _request("POST", f"{BASE_URL}/task", "create", governor=api_key.running, idempotent=False,
+                              headers=api_key.headers, json=payload)
+        result = _response_result(resp)
+        data = result.get("data") if isinstance(result, dict) else None
+        task_id = data.get("task_id") if isinstance(data, dict) else None
+    finally:
+        if task_id:
+            api_key.running.started(task_id)
+        else:
+            api_key.running.release()
+    if task_id:
+        accounts.assign(task_id, api_key)
+        ledger.record_created(task_id, payload.get("type", "unknown"), payload, request_hash, api_key.id)
+    return result
+
+_pending_uploads: Dict[str, "asyncio.Future"] = {}
+
+async def _post_upload(file_path: str, mime_type: str, api_key: PooledKey) -> Dict[str, Any]:
+    # 分块流式上传，经上传队列限制并发数与在途字节数
+    async def send(headers: Dict[str, str], content_factory) -> Dict[str, Any]:
+        resp = await _request("POST", f"{BASE_URL}/upload", "upload", content_factory=content_factory,
+                              headers={**api_key.headers, **headers})
+        return _response_result(resp)
+    return await uploader.queue.upload(send, file_path, mime_type)
+
+async def _upload_file(file_path: str, file_type: Optional[str] = None,
+                       api_key: Optional[PooledKey] = None, preprocess_image: Optional[bool] = None) -> Dict[str, Any]:
+    # 上传前在本地校验并按需预处理（缩放、转码、去元数据），不合规的图片不占用上传配额
+    error = preprocess.images.check(file_path, preprocess_image)
+    if error:
+        return {"code": 2002, "msg": error}
+    try:
+        file_path, prepared = await preprocess.images.prepare(file_path, preprocess_image)
+    except (OSError, ValueError) as e:
+        return {"code": 2002, "msg": f"Image preprocessing failed: {str(e)}"}
+    result = await _upload_prepared(file_path, file_type, api_key)
+    if prepared is not None and isinstance(result, dict):
+        result = {**result, "preprocess": prepared}
+    return result
+
+async def _upload_prepared(file_path: str, file_type: Optional[str], api_key: Optional[PooledKey]) -> Dict[str, Any]:
+    # 以文件头识别的真实类型为准，识别失败时才使用调用方声明的类型
+    mime_type = f"image/{uploader.sniff_image_type(file_path) or file_type or 'jpeg'}"
+    # image_token 属于上传所用的账户，去重缓存按 key 区分
+    api_key = api_key or accounts.select()
+    # 按文件内容摘要去重：已上传且 token 未过期则直接复用，同一文件的并发上传只发一次
+    digest = await upload_cache.digest_file(file_path)
+    cache_key = digest if api_key is accounts.primary else f"{api_key.id}:{digest}"
+    image_token = upload_cache.tokens.get(cache_key)
+    if image_token:
+        accounts.assign(image_token, api_key)
+        return {"code": 0, "data": {"image_token": image_token}}
+    result, joined = await coalesce(_pending_uploads, cache_key, lambda: _post_upload(file_path, mime_type, api_key))
+    if joined:
+        return result
+    image_token = (result.get("data") or {}).get("image_token") if isinstance(result, dict) else None
+    if image_token:
+        accounts.assign(image_token, api_key)
+        upload_cache.tokens.put(cache_key, image_token, os.path.getsize(file_path))
+    return result
 
 async def text_to_model(data: TextToModelRequest) -> Dict[str, Any]:
     payload = data.model_dump(exclude_none=True)
     payload["type"] = "text_to_model"
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    return await _create_task(payload, data.dedup)
 
 async def image_to_model(data: ImageToModelRequest) -> Dict[str, Any]:
     # 互斥校验：file_path、file_token、url、object 只能有一个
@@ -29,17 +238,18 @@ async def image_to_model(data: ImageToModelRequest) -> Dict[str, Any]:
     payload["type"] = "image_to_model"
     # 本地文件优先，且必须真实存在
     if data.file_path and os.path.isfile(data.file_path):
-        async with httpx.AsyncClient() as client:
-            with open(data.file_path, "rb") as f:
-                files = {"file": (os.path.basename(data.file_path), f, f"image/{data.file_type or 'jpeg'}")}
-                upload_resp = await client.post(f"{BASE_URL}/upload", headers=HEADERS, files=files)
-            upload_data = upload_resp.json()
-            file_token = upload_data.get("data", {}).get("image_token")
-            payload["file"] = {"type": data.file_type or "jpeg", "file_token": file_token}
-            payload.pop("file_path", None)
-            payload.pop("file_type", None)
-            payload.pop("url", None)
-            payload.pop("object", None)
+        file_type = uploader.sniff_image_type(data.file_path) or data.file_type or "jpeg"
+        upload_data = await _upload_file(data.file_path, file_type, preprocess_image=data.preprocess)
+        file_token = (upload_data.get("data") or {}).get("image_token")
+        if not file_token:
+            return upload_data
+        # 预处理可能把图片转成 webp/jpeg，任务中的类型以实际上传的文件为准
+        file_type = (upload_data.get("preprocess") or {}).get("format") or file_type
+        payload["file"] = {"type": file_type, "file_token": file_token}
+        payload.pop("file_path", None)
+        payload.pop("file_type", None)
+        payload.pop("url", None)
+        payload.pop("object", None)
     elif data.file_token:
         payload["file"] = {"type": data.file_type or "jpeg", "file_token": data.file_token}
         payload.pop("file_path", None)
@@ -58,46 +268,78 @@ async def image_to_model(data: ImageToModelRequest) -> Dict[str, Any]:
         payload.pop("file_type", None)
         payload.pop("file_token", None)
         payload.pop("url", None)
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    return await _create_task(payload, data.dedup)
 
 async def multiview_to_model(data: MultiviewToModelRequest) -> Dict[str, Any]:
     payload = data.model_dump(exclude_none=True)
     payload["type"] = "multiview_to_model"
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    views = {view: payload.pop(view, None) for view in MULTIVIEW_VIEWS}
+    if not any(views.values()):
+        if not data.files:
+            return {"code": 2003, "msg": "Either files or front/left/back/right must be provided."}
+        return await _create_task(payload, data.dedup)
+    if data.files:
+        return {"code": 2003, "msg": "files and front/left/back/right are mutually exclusive."}
+    if not views["front"]:
+        return {"code": 2003, "msg": "The front view is required."}
+    local = {view: path for view, path in views.items() if path and not path.startswith(("http://", "https://"))}
+    # 上传前先在本地校验全部视图，避免部分上传后才发现无效图片
+    errors = [f"{view}: {error}" for view, error in
+              ((view, preprocess.images.check(path, data.preprocess)) for view, path in local.items()) if error]
+    if errors:
+        return {"code": 2002, "msg": "; ".join(errors)}
+    # 任务只能引用同一账户上传的 token，所有视图固定用一个 key 上传
+    api_key = accounts.select()
+    # 同一文件出现在多个视图时只上传一次，其余视图并发上传
+    paths = list(dict.fromkeys(os.path.realpath(path) for path in local.values()))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_upload_file(path, None, api_key, data.preprocess) for path in paths))
+    uploaded = dict(zip(paths, results))
+    upload_seconds = round(time.perf_counter() - started, 3)
+    files, uploads = [], {}
+    for view in MULTIVIEW_VIEWS:
+        path = views[view]
+        if not path:
+            files.append({})
+        elif view in local:
+            result = uploaded[os.path.realpath(path)]
+            image_token = (result.get("data") or {}).get("image_token") if isinstance(result, dict) else None
+            if not image_token:
+                msg = result.get("msg") or result.get("message") if isinstance(result, dict) else None
+                return {"code": (result.get("code") if isinstance(result, dict) else None) or 1001,
+                        "msg": f"Upload of the {view} view failed: {msg}"}
+            prepared = result.get("preprocess") or {}
+            files.append({"type": prepared.get("format") or uploader.sniff_image_type(path), "file_token": image_token})
+            uploads[view] = {**result.get("upload_stats", {"reused": True}), **({"preprocess": prepared} if prepared else {})}
+        else:
+            files.append({"type": "jpeg", "url": path})
+    payload["files"] = files
+    result = await _create_task(payload, data.dedup)
+    if isinstance(result, dict) and uploads:
+        result["uploads"] = {"files": len(paths), "seconds": upload_seconds, "views": uploads}
+    return result
 
 async def texture_model(data: TextureModelRequest) -> Dict[str, Any]:
     payload = data.model_dump(exclude_none=True)
     payload["type"] = "texture_model"
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    return await _create_task(payload, data.dedup)
 
 async def refine_model(data: RefineModelRequest) -> Dict[str, Any]:
     payload = data.model_dump(exclude_none=True)
     payload["type"] = "refine_model"
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    return await _create_task(payload)
 
 async def animate_prerigcheck(data: AnimatePrerigcheckRequest) -> Dict[str, Any]:
     payload = data.model_dump(exclude_none=True)
     payload["type"] = "animate_prerigcheck"
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    return await _create_task(payload)
 
 async def animate_rig(data: AnimateRigRequest) -> Dict[str, Any]:
     payload = data.model_dump(exclude_none=True)
     payload["type"] = "animate_rig"
     if "out_format" in payload and payload["out_format"] not in ["glb", "fbx"]:
         return {"code": 2002, "msg": "The out_format is unsupported."}
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    return await _create_task(payload)
 
 async def animate_retarget(data: AnimateRetargetRequest) -> Dict[str, Any]:
     payload = data.model_dump(exclude_none=True)
@@ -110,53 +352,166 @@ async def animate_retarget(data: AnimateRetargetRequest) -> Dict[str, Any]:
     ]
     if payload.get("animation") not in valid_animations:
         return {"code": 2002, "msg": "The animation is unsupported."}
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    return await _create_task(payload)
 
 async def stylize_model(data: StylizeModelRequest) -> Dict[str, Any]:
     payload = data.model_dump(exclude_none=True)
     payload["type"] = "stylize_model"
     if payload.get("style") not in ["lego", "voxel", "voronoi", "minecraft"]:
         return {"code": 2002, "msg": "The style is unsupported."}
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    return await _create_task(payload)
 
 async def convert_model(data: ConvertModelRequest) -> Dict[str, Any]:
     payload = data.model_dump(exclude_none=True)
     payload["type"] = "convert_model"
     if payload.get("format") not in ["GLTF", "USDZ", "FBX", "OBJ", "STL", "3MF"]:
         return {"code": 2002, "msg": "The format is unsupported."}
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{BASE_URL}/task", headers=HEADERS, json=payload)
-        return resp.json()
+    return await _create_task(payload)
+
+async def _fetch_task_status(task_id: str) -> Dict[str, Any]:
+    # 任务只能用创建它的 key 查询；所属 key 未知时（非本服务创建）依次尝试，找到后记住
+    owner = await accounts.owner(task_id)
+    candidates = [owner] if owner is not None else accounts.keys
+    for api_key in candidates:
+        resp = await _request("GET", f"{BASE_URL}/task/{task_id}", "poll", headers=api_key.headers)
+        result = _response_result(resp)
+        found = isinstance(result, dict) and result.get("code", 0) == 0
+        if found or api_key is candidates[-1]:
+            if found and owner is None:
+                accounts.assign(task_id, api_key)
+            return result
+
+def _record_status(task_id: str, result: Dict[str, Any]) -> None:
+    if isinstance(result, dict) and result.get("code", 0) == 0 and isinstance(result.get("data"), dict):
+        # 状态有变化时才写入台账
+        ledger.record_status(task_id, result["data"])
+        if result["data"].get("status") in task_cache.TERMINAL_STATUSES:
+            accounts.finished(task_id)
 
 async def get_task_status(data: TaskIdRequest) -> Dict[str, Any]:
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{BASE_URL}/task/{data.task_id}", headers=HEADERS)
-        return resp.json()
+    # 终态结果永久缓存，运行中状态短暂缓存，同一任务的并发查询只发一次请求
+    result = await task_cache.cache.get(data.task_id, lambda: _fetch_task_status(data.task_id))
+    _record_status(data.task_id, result)
+    return result
+
+def apply_task_callback(task_id: str) -> bool:
+    """收到任务回调时调用：回调内容不可信，只丢弃运行中状态的短期缓存，返回是否需要向上游重新查询。"""
+    cached = task_cache.cache.lookup(task_id)
+    if cached is not None and (cached.get("data") or {}).get("status") in task_cache.TERMINAL_STATUSES:
+        # 已缓存终态结果，状态不会再变化
+        return False
+    task_cache.cache.invalidate(task_id)
+    return True
+
+async def _refresh_running(task_ids) -> None:
+    await asyncio.gather(*(get_task_status(TaskIdRequest(task_id=t)) for t in task_ids), return_exceptions=True)
+
+for _key in accounts.keys:
+    _key.running.refresh = _refresh_running
+
+def get_rate_limit_stats() -> Dict[str, Any]:
+    return {"code": 0, "data": {
+        "budgets": {name: budget.stats() for name, budget in BUDGETS.items()},
+        "running_tasks": accounts.running_stats(),
+    }}
+
+def get_cache_stats() -> Dict[str, Any]:
+    return {"code": 0, "data": {
+        "task_status": task_cache.cache.stats(),
+        "upload_tokens": upload_cache.tokens.stats(),
+        "upload_queue": uploader.queue.stats(),
+        "submissions": submissions.stats(),
+        "preprocess": preprocess.images.stats(),
+    }}
+
+async def list_tasks(data: ListTasksRequest) -> Dict[str, Any]:
+    try:
+        result = await ledger.query_async(data.status, data.type, data.since, data.until, data.limit, data.offset, data.include_history)
+    except ValueError as e:
+        return {"code": 2002, "msg": f"Invalid time filter: {str(e)}"}
+    return {"code": 0, "data": result}
 
 async def upload_image(data: UploadImageRequest) -> Dict[str, Any]:
-    async with httpx.AsyncClient() as client:
-        with open(data.file_path, "rb") as f:
-            files = {"file": (os.path.basename(data.file_path), f, "image/jpeg")}
-            resp = await client.post(f"{BASE_URL}/upload", headers=HEADERS, files=files)
-        return resp.json()
+    return await _upload_file(data.file_path, preprocess_image=data.preprocess)
 
-async def get_balance() -> Dict[str, Any]:
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(f"{BASE_URL}/user/balance", headers=HEADERS)
-            result = resp.json()
-            if resp.status_code == 200 and isinstance(result, dict):
-                if "code" in result and "data" in result:
-                    return result
-                elif "balance" in result and "frozen" in result:
-                    return {"code": 0, "data": {"balance": result["balance"], "frozen": result["frozen"]}}
-                else:
-                    return {"code": 0, "data": result}
+async def _fetch_balance(api_key: PooledKey) -> Dict[str, Any]:
+    try:
+        resp = await _request("GET", f"{BASE_URL}/user/balance", "account", headers=api_key.headers)
+        result = resp.json()
+        if resp.status_code == 200 and isinstance(result, dict):
+            if "code" in result and "data" in result:
+                return result
+            elif "balance" in result and "frozen" in result:
+                return {"code": 0, "data": {"balance": result["balance"], "frozen": result["frozen"]}}
             else:
-                return {"code": 1001, "msg": "Fatal error on server side", "http_status": resp.status_code}
-        except Exception as e:
-            return {"code": 1001, "msg": f"Fatal error: {str(e)}"}
+                return {"code": 0, "data": result}
+        else:
+            return {"code": 1001, "msg": "Fatal error on server side", "http_status": resp.status_code}
+    except Exception as e:
+        return {"code": 1001, "msg": f"Fatal error: {str(e)}"}
+
+async def _refresh_balance(api_key: PooledKey) -> Dict[str, Any]:
+    result = await _fetch_balance(api_key)
+    api_key.update_balance(result)
+    return result
+
+accounts.refresh_balance = _refresh_balance
+
+async def get_balance() -> Dict[str, Any]:
+    if len(accounts.keys) == 1:
+        return await _refresh_balance(accounts.primary)
+    # 多 key 时汇总各账户余额，同时刷新路由使用的余额
+    results = await asyncio.gather(*(_refresh_balance(key) for key in accounts.keys))
+    succeeded = [r for r in results if r.get("code", 0) == 0]
+    if not succeeded:
+        return results[0]
+    keys = []
+    for key, result in zip(accounts.keys, results):
+        entry = {"id": key.id, "balance": key.balance, "frozen": key.frozen, "running": key.running.stats()["running"]}
+        if result.get("code", 0) != 0:
+            entry["msg"] = key.balance_error
+        keys.append(entry)
+    return {"code": 0, "data": {
+        "balance": sum(k["balance"] or 0 for k in keys),
+        "frozen": sum(k["frozen"] or 0 for k in keys),
+        "keys": keys,
+    }}
+
+def get_account_stats() -> Dict[str, Any]:
+    return {"code": 0, "data": accounts.stats()}
+
+# 任务类型 -> (请求模型, 创建函数)，供批量提交与流水线按类型分发
+TASK_CREATORS = {
+    "text_to_model": (TextToModelRequest, text_to_model),
+    "image_to_model": (ImageToModelRequest, image_to_model),
+    "multiview_to_model": (MultiviewToModelRequest, multiview_to_model),
+    "texture_model": (TextureModelRequest, texture_model),
+    "refine_model": (RefineModelRequest, refine_model),
+    "animate_prerigcheck": (AnimatePrerigcheckRequest, animate_prerigcheck),
+    "animate_rig": (AnimateRigRequest, animate_rig),
+    "animate_retarget": (AnimateRetargetRequest, animate_retarget),
+    "stylize_model": (StylizeModelRequest, stylize_model),
+    "convert_model": (ConvertModelRequest, convert_model),
+}
+
+# 队列深度与字节数仅在采集时读取，不增加请求路径开销
+metrics.registry.register(
+    "tripo_upload_bytes", "counter", "Image bytes uploaded to Tripo.",
+    lambda: {(): uploader.queue.bytes_sent},
+)
+metrics.registry.register(
+    "tripo_queue_depth", "gauge", "Requests waiting for a rate-limit token, upload slot or running-task slot.",
+    lambda: {
+        **{metrics.labels(queue=name): budget.queued for name, budget in BUDGETS.items()},
+        metrics.labels(queue="upload_transfer"): uploader.queue.queued,
+        metrics.labels(queue="running_task_slot"): sum(key.running.waiting for key in accounts.keys),
+    },
+)
+metrics.registry.register(
+    "tripo_in_flight", "gauge", "Upstream requests, uploads and Tripo tasks currently in progress.",
+    lambda: {
+        **{metrics.labels(kind=name): budget.in_flight for name, budget in BUDGETS.items()},
+        metrics.labels(kind="upload_transfer"): uploader.queue.active,
+        metrics.labels(kind="running_tasks"): accounts.running_stats()["running"],
+    },
+)
@@ -0,0 +1,83 @@
+import os
+import json
+import mmap
+import time
+import asyncio
+import hashlib
+from typing import Dict, Any, Optional
+
+CACHE_DIR = os.getenv("TRIPO_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "tripo-mcp"))
+UPLOAD_TOKEN_TTL = float(os.getenv("TRIPO_UPLOAD_TOKEN_TTL", "86400"))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_digest(file_path: str) -> str:
+    """对文件做 BLAKE2b 摘要；通过 mmap + memoryview 分块读取，不在 Python 堆上复制文件内容。"""
+    digest = hashlib.blake2b(digest_size=32)
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return digest.hexdigest()
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            for offset in range(0, size, HASH_CHUNK_SIZE):
+                digest.update(view[offset:offset + HASH_CHUNK_SIZE])
+        finally:
+            view.release()
+    return digest.hexdigest()
+
+async def digest_file(file_path: str) -> str:
+    # 哈希在线程池中执行（hashlib 处理大块数据时会释放 GIL），不阻塞事件循环
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, file_digest, file_path)
+
+class UploadTokenCache:
+    """文件摘要 -> image_token 的持久化映射，过期时间与 token 有效期一致。"""
+
+    def __init__(self, path: str, ttl: float = UPLOAD_TOKEN_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        now = time.time()
+        entries = {k: v for k, v in self._load().items() if v.get("expires_at", 0) > now}
+        self._entries = entries
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # 缓存写入失败不影响上传本身
+            pass
+
+    def get(self, digest: str) -> Optional[str]:
+        entry = self._load().get(digest)
+        if entry and entry.get("expires_at", 0) > time.time():
+            self.hits += 1
+            return entry.get("image_token")
+        self.misses += 1
+        return None
+
+    def put(self, digest: str, image_token: str, size: int) -> None:
+        if self.ttl <= 0:
+            return
+        self._load()[digest] = {"image_token": image_token, "size": size, "expires_at": time.time() + self.ttl}
+        self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._load())}
+
+tokens = UploadTokenCache(os.path.join(CACHE_DIR, "upload_tokens.json"))
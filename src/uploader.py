@@ -0,0 +1,200 @@
+import io
+import os
+import time
+import uuid
+import struct
+import asyncio
+from typing import Dict, Any, Optional, Tuple, AsyncIterator, Callable, Awaitable
+
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("TRIPO_UPLOAD_MAX_CONCURRENCY", "4"))
+UPLOAD_MAX_INFLIGHT_BYTES = int(os.getenv("TRIPO_UPLOAD_MAX_INFLIGHT_BYTES", str(64 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("TRIPO_UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+THROUGHPUT_MIN_BYTES = 256 * 1024
+
+# 文件头魔数 -> Tripo 支持的图片类型
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+)
+
+def sniff_image_type(file_path: str) -> Optional[str]:
+    """根据文件头识别真实图片类型，返回 jpeg/png/webp，无法识别时返回 None。"""
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(12)
+    except OSError:
+        return None
+    for signature, image_type in _SIGNATURES:
+        if head.startswith(signature):
+            return image_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+def _jpeg_size(f) -> Optional[Tuple[int, int]]:
+    # 逐个跳过标记段，直到遇到 SOFn（C4/C8/CC 不是帧头）
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        while len(marker) == 2 and marker[1] == 0xFF:
+            marker = marker[1:] + f.read(1)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] in (0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7):
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+def _read_image_size(f) -> Optional[Tuple[int, int]]:
+    head = f.read(30)
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        chunk = head[12:16]
+        if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+            width, height = struct.unpack("<HH", head[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L" and head[20] == 0x2F:
+            bits = int.from_bytes(head[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+        return None
+    if head.startswith(b"\xff\xd8"):
+        return _jpeg_size(f)
+    return None
+
+def image_size(file_path: str) -> Optional[Tuple[int, int]]:
+    """只读取文件头解析图片宽高 (width, height)，支持 jpeg/png/webp，无法解析时返回 None。"""
+    try:
+        with open(file_path, "rb") as f:
+            return _read_image_size(f)
+    except (OSError, struct.error, IndexError):
+        return None
+
+def image_size_bytes(data: bytes) -> Optional[Tuple[int, int]]:
+    """同 image_size，解析内存中的图片数据（如 GLB 内嵌贴图）。"""
+    try:
+        return _read_image_size(io.BytesIO(data))
+    except (struct.error, IndexError):
+        return None
+
+class ByteBudget:
+    """限制同时在途的上传字节数；单个超过上限的文件按上限计，避免永久阻塞。"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, size: int) -> int:
+        size = min(size, self.limit)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_use + size <= self.limit)
+            self.in_use += size
+        return size
+
+    async def release(self, size: int) -> None:
+        async with self._cond:
+            self.in_use -= size
+            self._cond.notify_all()
+
+class UploadQueue:
+    def __init__(self, max_concurrency: int = UPLOAD_MAX_CONCURRENCY,
+                 max_inflight_bytes: int = UPLOAD_MAX_INFLIGHT_BYTES, chunk_size: int = UPLOAD_CHUNK_SIZE):
+        self.max_concurrency = max_concurrency
+        self.chunk_size = chunk_size
+        self._budget = ByteBudget(max_inflight_bytes)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.bytes_sent = 0
+        # 平均吞吐（字节/秒，指数滑动平均），供预处理阶段估算节省的上传时间
+        self.throughput_ewma: Optional[float] = None
+
+    async def _read_chunks(self, file_path: str, head: bytes, tail: bytes) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        yield head
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = await loop.run_in_executor(None, f.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        yield tail
+
+    async def upload(self, send: Callable[[Dict[str, str], Callable[[], AsyncIterator[bytes]]], Awaitable[Dict[str, Any]]],
+                     file_path: str, mime_type: str) -> Dict[str, Any]:
+        """以固定大小分块从磁盘流式发送 multipart 请求体，受并发数与在途字节数双重限制。
+
+        send 负责实际发送请求并返回解析后的结果，第二个参数为请求体工厂，重试时可重新生成数据流。
+        """
+        size = os.path.getsize(file_path)
+        boundary = uuid.uuid4().hex
+        filename = os.path.basename(file_path).replace('"', "%22")
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: {mime_type}\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        request_headers = {
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "Content-Length": str(len(head) + size + len(tail)),
+        }
+
+        enqueued_at = time.monotonic()
+        waiting = True
+        self.queued += 1
+        try:
+            async with self._semaphore:
+                reserved = await self._budget.acquire(size)
+                self.queued -= 1
+                waiting = False
+                self.active += 1
+                started_at = time.monotonic()
+                try:
+                    result = await send(request_headers, lambda: self._read_chunks(file_path, head, tail))
+                finally:
+                    self.active -= 1
+                    await self._budget.release(reserved)
+        finally:
+            if waiting:
+                self.queued -= 1
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        throughput = size / elapsed
+        self.completed += 1
+        self.bytes_sent += size
+        # 小文件的耗时主要是往返延迟，不能代表带宽，不计入平均吞吐
+        if size >= THROUGHPUT_MIN_BYTES:
+            self.throughput_ewma = throughput if self.throughput_ewma is None else 0.8 * self.throughput_ewma + 0.2 * throughput
+        if isinstance(result, dict):
+            result["upload_stats"] = {
+                "bytes": size,
+                "mime_type": mime_type,
+                "queued_seconds": round(started_at - enqueued_at, 3),
+                "upload_seconds": round(elapsed, 3),
+                "throughput_mbps": round(throughput * 8 / 1_000_000, 2),
+            }
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queued,
+            "active": self.active,
+            "completed": self.completed,
+            "bytes_sent": self.bytes_sent,
+            "inflight_bytes": self._budget.in_use,
+            "avg_throughput_mbps": round(self.throughput_ewma * 8 / 1_000_000, 2) if self.throughput_ewma else None,
+        }
+
+queue = UploadQueue()
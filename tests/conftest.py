@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# 测试使用独立的缓存目录，不读写用户的台账与上传缓存；需在导入 src 下的模块之前设置
+os.environ.setdefault("TRIPO_CACHE_DIR", tempfile.mkdtemp(prefix="tripo-mcp-test-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
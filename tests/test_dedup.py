@@ -0,0 +1,66 @@
+import time
+import asyncio
+import pytest
+import dedup
+from dedup import SubmissionDedup, canonical_key, required_seeds
+from ledger import TaskLedger
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    task_ledger = TaskLedger(str(tmp_path / "ledger.sqlite3"), flush_delay=0)
+    monkeypatch.setattr(dedup, "ledger", task_ledger)
+    yield task_ledger
+    task_ledger.close()
+
+def lookup(submissions: SubmissionDedup, key: str):
+    return asyncio.run(submissions.lookup(key))
+
+def test_required_seeds_by_task_type():
+    assert required_seeds({"type": "text_to_model"}) == ("model_seed", "texture_seed")
+    assert required_seeds({"type": "image_to_model", "texture": False, "pbr": False}) == ("model_seed",)
+    assert required_seeds({"type": "texture_model"}) == ("texture_seed",)
+    assert required_seeds({"type": "animate_retarget"}) == ()
+
+def test_canonical_key_requires_all_seeds():
+    payload = {"type": "text_to_model", "prompt": "cat", "model_seed": 1}
+    assert canonical_key(payload) is None
+    assert canonical_key({**payload, "texture_seed": 2}) is not None
+    assert canonical_key({"type": "animate_retarget", "original_model_task_id": "t"}) is None
+
+def test_canonical_key_ignores_field_order():
+    a = {"type": "text_to_model", "prompt": "cat", "model_seed": 1, "texture_seed": 2}
+    b = {"texture_seed": 2, "model_seed": 1, "prompt": "cat", "type": "text_to_model"}
+    assert canonical_key(a) == canonical_key(b)
+    assert canonical_key(a) != canonical_key({**a, "prompt": "dog"})
+
+def test_lookup_returns_recent_task(ledger):
+    submissions = SubmissionDedup(ttl=60)
+    ledger.record_created("t1", "text_to_model", {}, request_hash="k")
+    assert lookup(submissions, "k") == "t1"
+    # 已记入内存后直接命中
+    assert submissions._recent["k"][0] == "t1"
+    assert lookup(submissions, "k") == "t1"
+
+def test_lookup_expires_after_ttl(ledger, monkeypatch):
+    submissions = SubmissionDedup(ttl=60)
+    ledger.record_created("t1", "text_to_model", {}, request_hash="k")
+    assert lookup(submissions, "k") == "t1"
+    now = time.time()
+    monkeypatch.setattr(dedup.time, "time", lambda: now + 120)
+    assert lookup(submissions, "k") is None
+    assert "k" not in submissions._recent
+
+@pytest.mark.parametrize("status", dedup.NON_REUSABLE_STATUSES)
+def test_lookup_skips_non_reusable_statuses(ledger, status):
+    submissions = SubmissionDedup(ttl=60)
+    ledger.record_created("t1", "text_to_model", {}, request_hash="k")
+    assert lookup(submissions, "k") == "t1"
+    ledger.record_status("t1", {"task_id": "t1", "type": "text_to_model", "status": status})
+    # 内存记录与台账查询都不应返回失败类终态的任务
+    assert lookup(submissions, "k") is None
+    assert lookup(SubmissionDedup(ttl=60), "k") is None
+
+def test_lookup_reuses_successful_task(ledger):
+    ledger.record_created("t1", "text_to_model", {}, request_hash="k")
+    ledger.record_status("t1", {"task_id": "t1", "type": "text_to_model", "status": "success", "progress": 100})
+    assert lookup(SubmissionDedup(ttl=60), "k") == "t1"
@@ -0,0 +1,149 @@
+import asyncio
+from rate_limit import RunningTaskGovernor
+
+def make_governor(limit: int = 2, **kwargs) -> RunningTaskGovernor:
+    return RunningTaskGovernor(limit, refresh_interval=0.05, stale_after=3600.0, **kwargs)
+
+def test_slot_accounting():
+    governor = make_governor()
+
+    async def scenario():
+        await governor.acquire()
+        assert governor.occupied() == 1 and governor.stats()["submitting"] == 1
+        governor.started("t1")
+        assert governor.occupied() == 1 and governor.stats()["running"] == 1
+        await governor.acquire()
+        governor.release()
+        assert governor.occupied() == 1
+        governor.finished("t1")
+        governor.finished("t1")
+        assert governor.occupied() == 0
+
+    asyncio.run(scenario())
+
+def test_acquire_waits_for_finished_task():
+    governor = make_governor(limit=1)
+
+    async def scenario():
+        await governor.acquire()
+        governor.started("t1")
+        waiter = asyncio.ensure_future(governor.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done() and governor.waiting == 1
+        governor.finished("t1")
+        await asyncio.wait_for(waiter, 1)
+        assert governor.occupied() == 1 and governor.waiting == 0
+
+    asyncio.run(scenario())
+
+def test_acquire_waits_for_released_reservation():
+    governor = make_governor(limit=1)
+
+    async def scenario():
+        await governor.acquire()
+        waiter = asyncio.ensure_future(governor.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        governor.release()
+        await asyncio.wait_for(waiter, 1)
+        assert governor.occupied() == 1
+
+    asyncio.run(scenario())
+
+def test_refresh_frees_slot():
+    governor = make_governor(limit=1)
+
+    async def refresh(task_ids):
+        for task_id in task_ids:
+            governor.finished(task_id)
+
+    governor.refresh = refresh
+
+    async def scenario():
+        await governor.acquire()
+        governor.started("t1")
+        await asyncio.wait_for(governor.acquire(), 1)
+        assert governor.stats()["running"] == 0 and governor.occupied() == 1
+
+    asyncio.run(scenario())
+
+def test_stale_tasks_expire():
+    governor = RunningTaskGovernor(1, refresh_interval=0.05, stale_after=0.0)
+
+    async def scenario():
+        await governor.acquire()
+        governor.started("t1")
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(governor.acquire(), 1)
+
+    asyncio.run(scenario())
+
+def test_rejected_learns_max_and_expires(monkeypatch):
+    governor = make_governor(limit=0, learn_ttl=10.0)
+    now = [1000.0]
+    monkeypatch.setattr("rate_limit.time.monotonic", lambda: now[0])
+    governor.rejected()
+    assert governor.learned_limit is None
+    for task_id in ("t1", "t2", "t3"):
+        governor._reserved += 1
+        governor.started(task_id)
+    governor.rejected()
+    governor.finished("t3")
+    governor.rejected()
+    assert governor.effective_limit() == 3
+    now[0] += 11
+    assert governor.effective_limit() == 0 and governor.learned_limit is None
+
+def test_explicit_limit_is_not_learned():
+    governor = make_governor(limit=5)
+    governor._reserved += 1
+    governor.started("t1")
+    governor.rejected()
+    assert governor.learned_limit is None and governor.effective_limit() == 5
+
+def test_unlimited_never_blocks():
+    governor = make_governor(limit=0)
+
+    async def scenario():
+        for _ in range(50):
+            await governor.acquire()
+        assert governor.occupied() == 50
+
+    asyncio.run(scenario())
+
+def test_waiter_resumes_when_learned_limit_expires():
+    governor = make_governor(limit=0, learn_ttl=10.0)
+
+    async def scenario():
+        await governor.acquire()
+        governor.started("t1")
+        governor.rejected()
+        assert governor.effective_limit() == 1
+        waiter = asyncio.ensure_future(governor.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        # 学到的上限过期后不再限制，等待者必须能继续
+        governor._learned_at -= 11
+        governor.finished("t1")
+        await asyncio.wait_for(waiter, 1)
+        assert governor.occupied() == 1 and governor.waiting == 0
+
+    asyncio.run(scenario())
+
+def test_waiter_resumes_after_refresh_when_limit_expires():
+    governor = make_governor(limit=0, learn_ttl=10.0)
+
+    async def refresh(task_ids):
+        # 任务仍在运行，但学到的上限已过期
+        governor._learned_at -= 11
+
+    governor.refresh = refresh
+
+    async def scenario():
+        await governor.acquire()
+        governor.started("t1")
+        governor.rejected()
+        await asyncio.wait_for(governor.acquire(), 1)
+        assert governor.occupied() == 2
+
+    asyncio.run(scenario())